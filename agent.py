@@ -1,14 +1,25 @@
 from typing import List, Dict, Any
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from tools import disease_to_treatment_tool,symptom_to_disease_tool
+from utils.metrics import stage
+from tools import (
+    disease_to_treatment_tool,
+    symptom_to_disease_tool,
+    adisease_to_treatment_tool,
+    asymptom_to_disease_tool,
+    diseases_to_treatments_tool,
+    adiseases_to_treatments_tool,
+)
 # -------------------------
 # Graph: single tools_node
 # -------------------------
 class State(dict):
     symptoms: str
+    mode: str            # "fast" (default) or "quality" (cross-encoder rerank)
     disease: str
     diseases: List[Dict]
     treatments: List[str]
+    diagnoses: List[Dict]   # diagnose graph: diseases, each with its treatments
     error: str
 
 workflow = StateGraph(State)
@@ -25,22 +36,95 @@ def tools_node(state: State):
     if "symptoms" in state and state.get("symptoms"):
         symptoms = state["symptoms"]
         # OPTIONAL: you can add preprocessing/prompts here (e.g., expand synonyms)
-        diseases = symptom_to_disease_tool(symptoms)
+        with stage("tool"):
+            diseases = symptom_to_disease_tool(symptoms, mode=state.get("mode") or "fast")
         return {"diseases": diseases}
 
     if "disease" in state and state.get("disease"):
-        disease = state["disease"]
-        # OPTIONAL: normalize disease string (map aliases to canonical name)
-        treatments = disease_to_treatment_tool(disease)
+        # aliases / disease IDs are resolved to the canonical disease by the retriever
+        with stage("tool"):
+            treatments = disease_to_treatment_tool(state["disease"])
         return {"treatments": treatments}
 
     return {"error": "Invalid input. Provide either 'symptoms' or 'disease' in the request."}
 
-workflow.add_node("tools_node", tools_node)
+async def atools_node(state: State):
+    """Async twin of tools_node, used by app.ainvoke; same routing, non-blocking retrieval."""
+    if "symptoms" in state and state.get("symptoms"):
+        with stage("tool"):
+            diseases = await asymptom_to_disease_tool(state["symptoms"], mode=state.get("mode") or "fast")
+        return {"diseases": diseases}
+
+    if "disease" in state and state.get("disease"):
+        with stage("tool"):
+            treatments = await adisease_to_treatment_tool(state["disease"])
+        return {"treatments": treatments}
+
+    return {"error": "Invalid input. Provide either 'symptoms' or 'disease' in the request."}
+
+# invoke() runs tools_node, ainvoke() runs atools_node
+workflow.add_node("tools_node", RunnableLambda(tools_node, afunc=atools_node))
 
 # single node graph: set entry point to tools_node
 workflow.set_entry_point("tools_node")
 workflow.add_edge("tools_node", END)
 
 # compile
-app = workflow.compile()
\ No newline at end of file
+app = workflow.compile()
+
+# -------------------------
+# Graph: diagnose (symptoms -> diseases -> treatments in one call)
+# -------------------------
+diagnose_workflow = StateGraph(State)
+
+def diseases_node(state: State):
+    """Symptoms -> top diseases; the same retrieval as tools_node's symptoms branch."""
+    if not state.get("symptoms"):
+        return {"error": "Invalid input. Provide 'symptoms' in the request."}
+    with stage("tool"):
+        diseases = symptom_to_disease_tool(state["symptoms"], mode=state.get("mode") or "fast")
+    return {"diseases": diseases}
+
+async def adiseases_node(state: State):
+    """Async twin of diseases_node."""
+    if not state.get("symptoms"):
+        return {"error": "Invalid input. Provide 'symptoms' in the request."}
+    with stage("tool"):
+        diseases = await asymptom_to_disease_tool(state["symptoms"], mode=state.get("mode") or "fast")
+    return {"diseases": diseases}
+
+def _attach_treatments(diseases: List[Dict], results: List[Dict]) -> List[Dict]:
+    # each disease gets "treatments", or "treatments_error" if its lookup failed
+    diagnoses = []
+    for d, res in zip(diseases, results):
+        if "error" in res:
+            diagnoses.append({**d, "treatments": [], "treatments_error": res["error"]})
+        else:
+            diagnoses.append({**d, "treatments": res["treatments"]})
+    return diagnoses
+
+def treatments_node(state: State):
+    """Treatments for all diseases at once (disease_id join + one batched search), not one call per disease."""
+    if state.get("error"):
+        return {}
+    diseases = state.get("diseases") or []
+    with stage("tool"):
+        results = diseases_to_treatments_tool(diseases) if diseases else []
+    return {"diagnoses": _attach_treatments(diseases, results)}
+
+async def atreatments_node(state: State):
+    """Async twin of treatments_node."""
+    if state.get("error"):
+        return {}
+    diseases = state.get("diseases") or []
+    with stage("tool"):
+        results = await adiseases_to_treatments_tool(diseases) if diseases else []
+    return {"diagnoses": _attach_treatments(diseases, results)}
+
+diagnose_workflow.add_node("diseases_node", RunnableLambda(diseases_node, afunc=adiseases_node))
+diagnose_workflow.add_node("treatments_node", RunnableLambda(treatments_node, afunc=atreatments_node))
+diagnose_workflow.set_entry_point("diseases_node")
+diagnose_workflow.add_edge("diseases_node", "treatments_node")
+diagnose_workflow.add_edge("treatments_node", END)
+
+diagnose_app = diagnose_workflow.compile()
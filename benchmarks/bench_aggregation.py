@@ -0,0 +1,97 @@
+"""
+Benchmark the columnar disease aggregation (rag/aggregation.py) against the
+previous per-disease Python loop at K = 40, 400 and 4000 chunk hits, and check
+that mean_top_k returns the same ranking as the loop.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_aggregation [--repeat N] [--diseases D]
+"""
+
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.common import print_table
+from rag.aggregation import AGGREGATORS, aggregate_hits
+from utils.constants import SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE, SYMPTOMS_TOP_N_DISEASES
+from utils.vector_store import LocalHit
+
+
+def legacy_aggregate(hits, top_n, top_m):
+    """The aggregation loop query_and_aggregate used before the columnar engine."""
+    agg = defaultdict(lambda: {"name": None, "scores": [], "chunks": []})
+    for hit in hits:
+        score = float(hit.distance)
+        ent = hit.entity
+        did = ent.get("disease_id")
+        agg[did]["name"] = ent.get("disease_name")
+        agg[did]["scores"].append(score)
+        agg[did]["chunks"].append((score, ent.get("chunk_index"), ent.get("chunk_text")))
+
+    disease_list = []
+    for did, info in agg.items():
+        info["chunks"].sort(key=lambda x: x[0], reverse=True)
+        sorted_scores = sorted(info["scores"], reverse=True)
+        agg_score = float(np.mean(sorted_scores[: min(5, len(sorted_scores))]))
+        disease_list.append((did, info["name"], agg_score, info["chunks"]))
+    disease_list.sort(key=lambda x: x[2], reverse=True)
+
+    out = []
+    for did, name, score, chunks in disease_list[:top_n]:
+        out.append({
+            "disease_id": did,
+            "name": name,
+            "score": score,
+            "context": "\n---\n".join(c[2] for c in chunks[:top_m]),
+            "top_chunks": [{"score": float(c[0]), "chunk_index": int(c[1]), "text": c[2]} for c in chunks[:top_m]],
+        })
+    return out
+
+
+def synthetic_hits(k: int, n_diseases: int, rng: np.random.Generator):
+    """k hits sorted by score desc, spread over diseases with a skewed distribution."""
+    scores = np.sort(rng.uniform(0.2, 0.9, size=k))[::-1]
+    diseases = rng.zipf(1.5, size=k) % n_diseases
+    return [
+        LocalHit(i, float(s), {"disease_id": f"OMIM:{d:06d}", "disease_name": f"Disease {d}",
+                               "chunk_index": i % 7, "chunk_text": f"chunk text {i}"})
+        for i, (s, d) in enumerate(zip(scores, diseases))
+    ]
+
+
+def time_call(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6  # microseconds per call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--diseases", type=int, default=2000, help="distinct diseases hits are drawn from")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    top_n, top_m = SYMPTOMS_TOP_N_DISEASES, SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE
+    rows = []
+    for k in (40, 400, 4000):
+        hits = synthetic_hits(k, args.diseases, rng)
+        expected = legacy_aggregate(hits, top_n, top_m)
+        got = aggregate_hits(hits, top_n, top_m, "mean_top_k")
+        same = [d["disease_id"] for d in expected] == [d["disease_id"] for d in got] and all(
+            abs(a["score"] - b["score"]) < 1e-9 for a, b in zip(expected, got))
+
+        row = {"K": k, "legacy_us": time_call(lambda: legacy_aggregate(hits, top_n, top_m), args.repeat),
+               "same_ranking": same}
+        for name in AGGREGATORS:
+            row[f"{name}_us"] = time_call(lambda: aggregate_hits(hits, top_n, top_m, name), args.repeat)
+        rows.append(row)
+
+    print_table(rows, ["K", "legacy_us", *(f"{n}_us" for n in AGGREGATORS), "same_ranking"])
+
+
+if __name__ == "__main__":
+    main()
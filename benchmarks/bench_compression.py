@@ -0,0 +1,207 @@
+"""
+Compressed vector representations (utils/vector_compression.py) vs the
+float32 index for `disease_kb_chunks`.
+
+The served collection's vectors (local store or Milvus, via its ingest manifest)
+are written to scratch local stores, one per local mode (none, int8, binary).
+With --milvus they are also copied into a scratch Milvus collection and indexed
+with IVF_SQ8 and IVF_PQ. Each compressed store is searched at several re-score
+factors, and for each one the benchmark reports:
+  - bytes per vector scanned by the first pass and the store size on disk
+  - chunk recall@K against exact float search, and disease-level recall
+    (hits aggregated as the retriever does, tune_index.Scorer)
+  - p50/p99 latency of one query per call
+  - peak RSS of a fresh process that opens the store and runs the queries:
+    the float store maps its whole matrix in, a compressed one its codes plus
+    the rows it re-scores.
+
+Queries are synthetic phenotype queries encoded with the retriever's model.
+With --corpus-queries they are corpus vectors plus noise instead, so no model
+is needed.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_compression [--queries N] [--top-k K] [--factors 1,2,4,8]
+        [--corpus-queries] [--milvus]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import percentile, print_table
+from benchmarks.tune_index import Scorer, encode, load_vectors, make_queries
+from utils.constants import SYMPTOMS_EMBEDDING_MODEL, SYMPTOMS_TOP_K_CHUNKS, SYMPTOMS_VECTOR_BACKEND
+from utils.vector_compression import LOCAL_MODES, MILVUS_MODES, compressed_search_params, milvus_index_params
+from utils.vector_store import LocalVectorStore, LocalVectorStoreWriter, topk_indices
+
+COLLECTION = "disease_kb_chunks"
+FIELDS = ["embedding", "disease_id"]
+INSERT_BATCH = 4096
+WARMUP_QUERIES = 10
+QUERY_NOISE = 0.05   # --corpus-queries: std of the noise added to each dimension before renormalizing
+
+
+def corpus_queries(matrix: np.ndarray, n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = matrix[rng.choice(len(matrix), size=min(n, len(matrix)), replace=False)]
+    q = q + rng.normal(scale=QUERY_NOISE, size=q.shape).astype(np.float32)
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_rows(matrix: np.ndarray, q_vecs: np.ndarray, top_k: int) -> List[np.ndarray]:
+    return [topk_indices((matrix @ q)[None, :], top_k)[0] for q in q_vecs]
+
+
+def write_store(path: str, matrix: np.ndarray, disease_ids: List[str], compression: str):
+    writer = LocalVectorStoreWriter(path, matrix.shape[1], FIELDS, compression)
+    for i in range(0, len(matrix), INSERT_BATCH):
+        writer.insert([matrix[i: i + INSERT_BATCH].tolist(), disease_ids[i: i + INSERT_BATCH]])
+    writer.close()
+
+
+def dir_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / (1 << 20)
+
+
+def bytes_per_vector(store: LocalVectorStore) -> int:
+    return store.codes.shape[1] * store.codes.itemsize if store.codes is not None else store.dim * 4
+
+
+def run_queries(store, q_vecs: np.ndarray, top_k: int):
+    """(latencies, hits per query), one query per search call as a request makes it."""
+    for q in q_vecs[:WARMUP_QUERIES]:
+        store.search(data=[q.tolist()], limit=top_k, output_fields=[])
+    latencies, results = [], []
+    for q in q_vecs:
+        t = time.perf_counter()
+        hits = store.search(data=[q.tolist()], limit=top_k, output_fields=[])[0]
+        latencies.append(time.perf_counter() - t)
+        results.append(list(hits))
+    return latencies, results
+
+
+def score(results, latencies, truth_rows, truth_diseases, scorer: Scorer, top_k: int) -> Dict:
+    chunk, disease = [], []
+    for hits, want_rows, want in zip(results, truth_rows, truth_diseases):
+        rows = [h.id for h in hits]
+        chunk.append(len(set(rows) & set(want_rows.tolist())) / max(len(want_rows), 1))
+        disease.append(scorer.recall(scorer.diseases(rows, [h.distance for h in hits]), want))
+    return {f"recall@{top_k}": float(np.mean(chunk)), "disease_recall": float(np.mean(disease)),
+            "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000}
+
+
+def measure_rss(path: str, factor: int, q_vecs: np.ndarray, top_k: int) -> float:
+    """Open the store and run the queries in a fresh interpreter, so its RSS is the store's own."""
+    code = (
+        "import json, sys\n"
+        "from benchmarks.common import peak_rss_mb\n"
+        "from utils.vector_store import LocalVectorStore\n"
+        "path, factor, queries, top_k = json.loads(sys.stdin.read())\n"
+        "store = LocalVectorStore(path, factor)\n"
+        "for q in queries:\n"
+        "    store.search(data=[q], limit=top_k, output_fields=[])\n"
+        "print(json.dumps({'peak_rss_mb': peak_rss_mb()}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], input=json.dumps([path, factor, q_vecs.tolist(), top_k]),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])["peak_rss_mb"]
+
+
+def bench_local(matrix, disease_ids, q_vecs, truth_rows, truth_diseases, scorer, top_k, factors) -> List[Dict]:
+    rows = []
+    scratch = tempfile.mkdtemp(prefix="bench_compression_")
+    try:
+        for mode in LOCAL_MODES:
+            path = os.path.join(scratch, mode)
+            t0 = time.perf_counter()
+            write_store(path, matrix, disease_ids, mode)
+            build_s = time.perf_counter() - t0
+            store = LocalVectorStore(path)
+            for factor in ([1] if mode == "none" else factors):
+                store.rescore_factor = factor
+                latencies, results = run_queries(store, q_vecs, top_k)
+                rows.append({"backend": "local", "mode": mode, "rescore": factor if mode != "none" else "",
+                             "bytes/vec": bytes_per_vector(store), "disk_mb": dir_mb(path), "build_s": build_s,
+                             **score(results, latencies, truth_rows, truth_diseases, scorer, top_k),
+                             "peak_rss_mb": measure_rss(path, factor, q_vecs, top_k)})
+            print(f"local [{mode}] done")
+            del store
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return rows
+
+
+def bench_milvus(matrix, q_vecs, truth_rows, truth_diseases, scorer, top_k, factors) -> List[Dict]:
+    from pymilvus import connections, utility
+
+    from benchmarks.tune_index import build_index, create_scratch
+    from utils.config import MILVUS_HOST, MILVUS_PORT
+    from utils.milvus_utils import MilvusVectorStore
+
+    connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
+    collection = create_scratch(f"{COLLECTION}_compression", matrix)
+    rows = []
+    try:
+        for mode in MILVUS_MODES:
+            if mode == "none":
+                continue   # the float index is the reference; tune_index.py sweeps the float indexes
+            index_params = milvus_index_params(mode, {}, len(matrix))
+            build_s = build_index(collection, index_params)
+            search_params = compressed_search_params(index_params["index_type"])
+            code_bytes = index_params["params"].get("m", matrix.shape[1])   # PQ: one byte per sub-quantizer
+            for factor in factors:
+                store = MilvusVectorStore(collection, search_params, factor)
+                latencies, results = run_queries(store, q_vecs, top_k)
+                rows.append({"backend": "milvus", "mode": f"{mode} ({index_params['index_type']})",
+                             "rescore": factor, "bytes/vec": code_bytes, "build_s": build_s,
+                             **score(results, latencies, truth_rows, truth_diseases, scorer, top_k)})
+            print(f"milvus [{mode}] done")
+    finally:
+        utility.drop_collection(collection.name)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=SYMPTOMS_TOP_K_CHUNKS)
+    parser.add_argument("--factors", default="1,2,4,8", help="re-score factors to sweep")
+    parser.add_argument("--corpus-queries", action="store_true",
+                        help="noisy corpus vectors as queries instead of encoded synthetic queries")
+    parser.add_argument("--milvus", action="store_true", help="also sweep Milvus IVF_SQ8 / IVF_PQ (needs Milvus)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    factors = [int(f) for f in args.factors.split(",")]
+
+    t0 = time.perf_counter()
+    matrix, disease_ids = load_vectors(COLLECTION, SYMPTOMS_VECTOR_BACKEND)
+    print(f"{COLLECTION}: {len(matrix)} vectors loaded in {time.perf_counter() - t0:.1f}s")
+    if args.corpus_queries:
+        q_vecs = corpus_queries(matrix, args.queries, args.seed)
+    else:
+        q_vecs = encode(SYMPTOMS_EMBEDDING_MODEL, make_queries(COLLECTION, args.queries, args.seed))
+
+    scorer = Scorer(COLLECTION, disease_ids)
+    truth_rows = exact_rows(matrix, q_vecs, args.top_k)
+    truth_diseases = [scorer.diseases(r.tolist(), (matrix[r] @ q).tolist()) for r, q in zip(truth_rows, q_vecs)]
+
+    rows = bench_local(matrix, disease_ids, q_vecs, truth_rows, truth_diseases, scorer, args.top_k, factors)
+    if args.milvus:
+        rows += bench_milvus(matrix, q_vecs, truth_rows, truth_diseases, scorer, args.top_k, factors)
+
+    columns = ["backend", "mode", "rescore", "bytes/vec", "disk_mb", f"recall@{args.top_k}", "disease_recall",
+               "p50_ms", "p99_ms", "build_s", "peak_rss_mb"]
+    print()
+    print_table([{c: r.get(c, "") for c in columns} for r in rows], columns)
+
+
+if __name__ == "__main__":
+    main()
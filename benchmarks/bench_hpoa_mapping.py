@@ -0,0 +1,118 @@
+"""
+Time the streaming HPOA -> JSONL mapper (map_diseases_symptoms.py) against the
+previous pandas implementation (read_csv + groupby().apply(list) + iterrows) on
+the full phenotype.hpoa, and check both produce the same diseases and the same
+phenotypes once the old output's repeated HPO ids are collapsed.
+
+The pandas baseline needs pandas installed; it is skipped otherwise.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_hpoa_mapping [--hpoa PATH] [--shards N] [--skip-pandas]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from utils.config import REPO_ROOT
+
+MAPPER_SCRIPT = os.path.join(REPO_ROOT, "milvus-data-ingestion", "symptoms-disease", "map_diseases_symptoms.py")
+
+
+def load_mapper_module():
+    spec = importlib.util.spec_from_file_location("map_diseases_symptoms", MAPPER_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def pandas_baseline(hpoa_path: str, terms_path: str, out_path: str) -> int:
+    """The mapping step as it was before the streaming rewrite."""
+    import pandas as pd
+
+    with open(terms_path, "r", encoding="utf-8") as f:
+        hpo_terms = json.load(f)
+    df = pd.read_csv(hpoa_path, sep="\t", comment="#", dtype=str).fillna("")
+    grouped = df.groupby(["database_id", "disease_name"])["hpo_id"].apply(list).reset_index()
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as f:
+        for _, row in grouped.iterrows():
+            symptoms_expanded = []
+            for hpo_id in row["hpo_id"]:
+                if hpo_id in hpo_terms:
+                    term = hpo_terms[hpo_id]
+                    symptoms_expanded.append(f"{term['name']}: {term['definition']}")
+                else:
+                    symptoms_expanded.append(hpo_id)
+            entry = {
+                "disease_id": row["database_id"],
+                "name": row["disease_name"],
+                "symptoms": symptoms_expanded,
+                "text": f"{row['disease_name']} is associated with symptoms: {', '.join(symptoms_expanded)}"
+            }
+            f.write(json.dumps(entry) + "\n")
+            count += 1
+    return count
+
+
+def read_symptoms(paths):
+    out = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                obj = json.loads(line)
+                out[(obj["disease_id"], obj["name"])] = obj["symptoms"]
+    return out
+
+
+def total_bytes(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def main():
+    mapper = load_mapper_module()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hpoa", default=mapper.HPOA_FILE)
+    parser.add_argument("--terms", default=mapper.HPO_DICT_FILE)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--skip-pandas", action="store_true")
+    args = parser.parse_args()
+    if not os.path.exists(args.hpoa):
+        raise SystemExit(f"HPOA file not found: {args.hpoa} (download phenotype.hpoa from the HPO site)")
+
+    tmp = tempfile.mkdtemp(prefix="bench_hpoa_")
+    rows = []
+
+    out = os.path.join(tmp, "streaming.jsonl")
+    t0 = time.perf_counter()
+    count = mapper.map_diseases(args.hpoa, args.terms, out, args.shards)
+    stream_paths = mapper.shard_paths(out, args.shards)
+    rows.append({"impl": f"streaming (shards={args.shards})", "diseases": count,
+                 "seconds": time.perf_counter() - t0, "out_mb": total_bytes(stream_paths) / 1e6})
+
+    if not args.skip_pandas:
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            print("pandas not installed; skipping the pandas baseline\n")
+        else:
+            legacy_out = os.path.join(tmp, "pandas.jsonl")
+            t0 = time.perf_counter()
+            count = pandas_baseline(args.hpoa, args.terms, legacy_out)
+            rows.append({"impl": "pandas (previous)", "diseases": count,
+                         "seconds": time.perf_counter() - t0, "out_mb": total_bytes([legacy_out]) / 1e6})
+
+            new, old = read_symptoms(stream_paths), read_symptoms([legacy_out])
+            same = new.keys() == old.keys() and all(new[k] == list(dict.fromkeys(old[k])) for k in new)
+            dupes = sum(len(v) for v in old.values()) - sum(len(v) for v in new.values())
+            print(f"same diseases and deduplicated phenotypes: {same}; repeated phenotypes removed: {dupes}\n")
+
+    print_table(rows, ["impl", "diseases", "seconds", "out_mb"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark the symptoms ingestion pipeline over the real symptoms2disease.jsonl
+against the previous serial loop (decode per window, np.vstack of per-row norms,
+batches of 256). Both write to an in-memory sink, so Milvus is not needed and
+the numbers isolate chunking + encoding throughput.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_ingest_symptoms [--limit N] [--workers W] [--skip-serial]
+"""
+
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from transformers import AutoTokenizer
+
+from utils.chunking import record_text
+from utils.config import REPO_ROOT
+
+INGEST_SCRIPT = os.path.join(REPO_ROOT, "milvus-data-ingestion", "symptoms-disease", "ingest-symptoms-diseases.py")
+
+
+def load_ingest_module():
+    # the script name has hyphens, so load it by path
+    spec = importlib.util.spec_from_file_location("ingest_symptoms_diseases", INGEST_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CountingSink:
+    """Stands in for a Milvus collection: counts inserted rows."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def insert(self, columns):
+        self.rows += len(columns[0])
+
+    def flush(self):
+        pass
+
+
+def serial_baseline(jsonl_path, ing, embedder, batch_size=256):
+    """The pre-pipeline ingest loop, minus the Milvus calls."""
+    tokenizer = AutoTokenizer.from_pretrained(ing.TOKENIZER_NAME, use_fast=True)
+    sink = CountingSink()
+    t_chunk = t_encode = 0.0
+    texts = []
+
+    def encode_batch(batch):
+        vecs = embedder.encode(batch, convert_to_numpy=True, show_progress_bar=False)
+        vecs = np.vstack([v / np.linalg.norm(v) if np.linalg.norm(v) else v for v in vecs]).astype(np.float32)
+        sink.insert([vecs.tolist()])
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            t0 = time.perf_counter()
+            text = record_text(json.loads(line))
+            ids = tokenizer.encode(text, add_special_tokens=False) if text else []
+            if ids:
+                stride = ing.MAX_TOKENS - ing.OVERLAP_TOKENS
+                starts = [0] if len(ids) <= ing.MAX_TOKENS else range(0, len(ids), stride)
+                for s in starts:
+                    texts.append(tokenizer.decode(ids[s: s + ing.MAX_TOKENS], skip_special_tokens=True,
+                                                  clean_up_tokenization_spaces=True))
+            t_chunk += time.perf_counter() - t0
+            if len(texts) >= batch_size:
+                t0 = time.perf_counter()
+                encode_batch(texts)
+                t_encode += time.perf_counter() - t0
+                texts = []
+    if texts:
+        t0 = time.perf_counter()
+        encode_batch(texts)
+        t_encode += time.perf_counter() - t0
+    return sink.rows, t_chunk, t_encode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=None, help="JSONL input (default: the ingest script's INPUT_JSONL)")
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N diseases (0 = all)")
+    parser.add_argument("--workers", type=int, default=None, help="chunking processes")
+    parser.add_argument("--skip-serial", action="store_true")
+    args = parser.parse_args()
+
+    ing = load_ingest_module()
+    path = args.input or ing.INPUT_JSONL
+    if args.limit:
+        with open(path, "r", encoding="utf-8") as src, \
+                tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as dst:
+            dst.writelines(itertools.islice(src, args.limit))
+        path = dst.name
+
+    embedder = SentenceTransformer(ing.EMBEDDING_MODEL)
+    embedder.encode(["warm up"], show_progress_bar=False)
+
+    if not args.skip_serial:
+        t0 = time.perf_counter()
+        rows, t_chunk, t_encode = serial_baseline(path, ing, embedder)
+        wall = time.perf_counter() - t0
+        print("== serial (previous ingest loop) ==")
+        print(f"chunk   {rows:>8} rows  busy {t_chunk:7.1f}s  {rows / t_chunk if t_chunk else 0:9.0f} rows/s")
+        print(f"encode  {rows:>8} rows  busy {t_encode:7.1f}s  {rows / t_encode if t_encode else 0:9.0f} rows/s")
+        print(f"total   {rows:>8} rows  wall {wall:7.1f}s  {rows / wall:9.0f} rows/s\n")
+
+    sink = CountingSink()
+    t0 = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as lines:
+        stats = ing.run_pipeline(lines, sink, embedder, workers=args.workers or ing.CHUNK_WORKERS)
+    wall = time.perf_counter() - t0
+    print("== pipelined ==")
+    for st in stats.values():
+        print(st)
+    print(f"total   {sink.rows:>8} rows  wall {wall:7.1f}s  {sink.rows / wall:9.0f} rows/s")
+
+    if args.limit:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
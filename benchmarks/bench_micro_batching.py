@@ -0,0 +1,67 @@
+"""
+Compare per-request encoding (batch of one) against the micro-batching encoder
+at 1, 8 and 64 concurrent clients. Reports p50/p99 latency and QPS.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_micro_batching [--model MODEL] [--queries N]
+"""
+
+import argparse
+
+from sentence_transformers import SentenceTransformer
+
+from benchmarks.common import print_table, run_concurrent
+from utils.batching_encoder import MicroBatchEncoder
+from utils.constants import SYMPTOMS_EMBEDDING_MODEL, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_WAIT_MS
+
+SAMPLE_SYMPTOMS = [
+    "recurrent seizures and developmental delay",
+    "muscle weakness with elevated creatine kinase",
+    "short stature and delayed bone age",
+    "progressive hearing loss in childhood",
+    "hepatosplenomegaly with anemia and bone pain",
+    "intellectual disability, hypotonia and feeding difficulties",
+    "recurrent kidney stones and hematuria",
+    "night blindness and constricted visual fields",
+]
+
+
+def make_queries(n: int):
+    # unique strings so nothing is served from any cache
+    return [f"{SAMPLE_SYMPTOMS[i % len(SAMPLE_SYMPTOMS)]} (case {i})" for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=SYMPTOMS_EMBEDDING_MODEL)
+    parser.add_argument("--queries", type=int, default=512, help="queries per run")
+    parser.add_argument("--max-batch-size", type=int, default=EMBEDDING_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBEDDING_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model)
+    batcher = MicroBatchEncoder(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    def direct(q):
+        return model.encode([q], convert_to_numpy=True, show_progress_bar=False)[0]
+
+    def coalesced(q):
+        return batcher.encode([q], convert_to_numpy=True)[0]
+
+    # warm up both paths (first forward pass allocates buffers)
+    direct("warm up")
+    coalesced("warm up")
+
+    rows = []
+    for clients in (1, 8, 64):
+        queries = make_queries(args.queries)
+        for name, fn in (("direct", direct), ("micro-batch", coalesced)):
+            res = run_concurrent(fn, queries, clients)
+            rows.append({"mode": name, "clients": clients, **res})
+
+    print_table(rows, ["mode", "clients", "calls", "qps", "p50_ms", "p99_ms"])
+    print("micro-batch stats:", batcher.stats())
+
+
+if __name__ == "__main__":
+    main()
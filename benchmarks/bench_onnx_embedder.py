@@ -0,0 +1,152 @@
+"""
+Compare the query-embedder inference backends (EMBEDDING_BACKEND) on CPU:
+  torch       SentenceTransformer (PyTorch, fp32)
+  onnx-fp32   exported graph on ONNX Runtime
+  onnx-int8   the same graph with dynamically int8-quantized weights
+
+For each model (symptoms and treatment embedders):
+  - parity vs torch: cosine similarity of the embeddings (mean / min), and for
+    the symptoms model the overlap of the top-K `disease_kb_chunks` hits and
+    top-N diseases found with each backend's query vectors (needs the
+    collection, on Milvus or the local backend)
+  - latency: one query per call (p50/p99, as a request encodes) and texts/s
+    at batch 32
+  - peak RSS and load time, each backend in a fresh interpreter
+
+Queries are synthetic (benchmarks/common.py). The ONNX models are exported on
+first use to data-files/onnx-models/ (needs `pip install .[onnx]`).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_onnx_embedder [--queries N] [--threads T] [--skip-search]
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import percentile, print_table, symptom_queries, treatment_queries
+from utils.config import ONNX_MODEL_DIR, SYMPTOMS_JSONL, TREATMENTS_JSON
+from utils.constants import (EMBEDDING_ONNX_THREADS, SYMPTOMS_EMBEDDING_MODEL, SYMPTOMS_TOP_K_CHUNKS,
+                             TREATMENT_EMBEDDING_MODEL)
+
+BACKENDS = ("torch", "onnx-fp32", "onnx-int8")
+BATCH = 32
+
+
+def make_encoder(backend: str, model_name: str, threads: int):
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name, device="cpu")
+    from utils.onnx_embedder import OnnxEmbedder
+
+    return OnnxEmbedder.open(model_name, ONNX_MODEL_DIR, quantized=backend == "onnx-int8", threads=threads)
+
+
+def measure_rss(backend: str, model_name: str, threads: int, queries: List[str]) -> Dict[str, float]:
+    """Load + encode in a fresh interpreter, so each backend's RSS is its own."""
+    code = (
+        "import json, sys, time\n"
+        "from benchmarks.bench_onnx_embedder import make_encoder\n"
+        "from benchmarks.common import peak_rss_mb\n"
+        "backend, model, threads, queries = json.loads(sys.stdin.read())\n"
+        "t0 = time.perf_counter()\n"
+        "enc = make_encoder(backend, model, threads)\n"
+        "load_s = time.perf_counter() - t0\n"
+        "for q in queries:\n"
+        "    enc.encode([q], convert_to_numpy=True, normalize_embeddings=True)\n"
+        "print(json.dumps({'load_s': load_s, 'peak_rss_mb': peak_rss_mb()}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], input=json.dumps([backend, model_name, threads, queries]),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def encode_all(encoder, queries: List[str]) -> np.ndarray:
+    return np.asarray(encoder.encode(queries, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+
+
+def latency(encoder, queries: List[str]) -> Dict[str, float]:
+    single = []
+    for q in queries:
+        t = time.perf_counter()
+        encoder.encode([q], convert_to_numpy=True, normalize_embeddings=True)
+        single.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    for i in range(0, len(queries), BATCH):
+        encoder.encode(queries[i: i + BATCH], convert_to_numpy=True, normalize_embeddings=True)
+    batch_s = time.perf_counter() - t
+    return {"p50_ms": percentile(single, 50) * 1000, "p99_ms": percentile(single, 99) * 1000,
+            "batch_texts_s": len(queries) / batch_s if batch_s else 0.0}
+
+
+def search_overlap(reference: np.ndarray, vecs: np.ndarray, top_k: int) -> Dict[str, float]:
+    """Mean overlap of top-K chunk ids and top-N diseases between two sets of query vectors."""
+    from rag import symptoms2disease_retriever as s2d
+
+    store = s2d.store.get()
+    fields = s2d.CHUNK_OUTPUT_FIELDS
+    want = store.search(data=reference.tolist(), limit=top_k, output_fields=fields)
+    got = store.search(data=vecs.tolist(), limit=top_k, output_fields=fields)
+    chunks, diseases = [], []
+    for w, g in zip(want, got):
+        chunks.append(len({h.id for h in w} & {h.id for h in g}) / max(len(w), 1))
+        top_w = {d["disease_id"] for d in s2d._aggregate(w)}
+        top_g = {d["disease_id"] for d in s2d._aggregate(g)}
+        diseases.append(len(top_w & top_g) / max(len(top_w), 1))
+    return {f"chunk_overlap@{top_k}": float(np.mean(chunks)), "disease_overlap": float(np.mean(diseases))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=EMBEDDING_ONNX_THREADS,
+                        help="ONNX Runtime intra-op threads (0 = all cores)")
+    parser.add_argument("--top-k", type=int, default=SYMPTOMS_TOP_K_CHUNKS)
+    parser.add_argument("--skip-search", action="store_true", help="skip the disease_kb_chunks overlap check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(SYMPTOMS_JSONL, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    with open(TREATMENTS_JSON, "r", encoding="utf-8") as f:
+        treatments = json.load(f)
+    models = {
+        SYMPTOMS_EMBEDDING_MODEL: [q for q, _ in symptom_queries(lines, args.queries, rng)],
+        TREATMENT_EMBEDDING_MODEL: treatment_queries(treatments, args.queries, rng),
+    }
+
+    rows = []
+    for model_name, queries in models.items():
+        reference = None
+        for backend in BACKENDS:
+            encoder = make_encoder(backend, model_name, args.threads)
+            vecs = encode_all(encoder, queries)
+            row = {"model": model_name.split("/")[-1], "backend": backend, **latency(encoder, queries)}
+            if reference is None:
+                reference = vecs
+            cos = np.sum(reference * vecs, axis=1)
+            row.update(cos_mean=f"{cos.mean():.5f}", cos_min=f"{cos.min():.5f}")
+            if model_name == SYMPTOMS_EMBEDDING_MODEL and not args.skip_search:
+                row.update({k: f"{v:.3f}" for k, v in search_overlap(reference, vecs, args.top_k).items()})
+            row.update(measure_rss(backend, model_name, args.threads, queries[:50]))
+            rows.append(row)
+            print(f"{model_name} [{backend}] done")
+
+    columns = ["model", "backend", "p50_ms", "p99_ms", "batch_texts_s", "cos_mean", "cos_min"]
+    if not args.skip_search:
+        columns += [f"chunk_overlap@{args.top_k}", "disease_overlap"]
+    print()
+    print_table([{c: r.get(c, "") for c in columns + ["load_s", "peak_rss_mb"]} for r in rows],
+                columns + ["load_s", "peak_rss_mb"])
+
+
+if __name__ == "__main__":
+    main()
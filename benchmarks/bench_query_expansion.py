@@ -0,0 +1,92 @@
+"""
+Time the neighbour lookup of ontology query expansion (rag/query_expansion.py),
+which reads parents and children from the precomputed is_a closure, against a
+breadth-first walk of the is_a graph per matched term, at several depths, and
+check both find the same expansion terms. Phrase matching, the same for both,
+is timed separately.
+
+Queries are built from random HPO term names, so every query matches a term.
+Needs hp.obo (or its compiled ontology, see map_symptoms_explanations.py).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_query_expansion [--queries N]
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.common import percentile, print_table
+from rag.query_expansion import OntologyQueryExpander
+from utils.config import HPO_OBO, HPO_ONTOLOGY_DIR
+
+
+def walk_rows(parents: List[List[int]], children: List[List[int]], row: int, up: int, down: int) -> set:
+    """Rows within `down` steps below and `up` steps above row, found by BFS."""
+    out = set()
+    for edges, depth in ((children, down), (parents, up)):
+        frontier, seen = [row], {row}
+        for _ in range(depth):
+            frontier = [n for r in frontier for n in edges[r] if n not in seen]
+            seen.update(frontier)
+        out.update(seen - {row})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    expander = OntologyQueryExpander.from_files(HPO_OBO, HPO_ONTOLOGY_DIR, max_terms=1 << 30)
+    onto = expander.ontology
+    if onto is None:
+        raise SystemExit("No ontology; run milvus-data-ingestion/symptoms-disease/map_symptoms_explanations.py")
+    print(f"ontology + phrase index loaded in {time.perf_counter() - t0:.2f}s ({len(onto)} terms, "
+          f"{len(onto.anc_idx)} closure pairs)\n")
+
+    parents = [onto.parent_rows(r).tolist() for r in range(len(onto))]
+    children: List[List[int]] = [[] for _ in range(len(onto))]
+    for c, ps in enumerate(parents):
+        for p in ps:
+            children[p].append(c)
+
+    rng = random.Random(0)
+    live = np.flatnonzero(~np.asarray(onto.obsolete)).tolist()
+    queries = [f"patient presents with {expander.names[rng.choice(live)].lower()}" for _ in range(args.queries)]
+    matching, matched = [], []
+    for q in queries:
+        t = time.perf_counter()
+        matched.append(expander.matched_rows(q))
+        matching.append(time.perf_counter() - t)
+    print(f"phrase matching: p50 {percentile(matching, 50) * 1e6:.1f} us, p99 {percentile(matching, 99) * 1e6:.1f} us\n")
+
+    rows, mismatches = [], 0
+    for up, down in ((1, 1), (2, 2), (3, 5)):
+        expander.up, expander.down = up, down
+        closure, walked = [], []
+        for m in matched:
+            t = time.perf_counter()
+            got = expander.neighbour_rows(m)
+            closure.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            found = set()
+            for r in m:
+                found |= walk_rows(parents, children, r, up, down)
+            want = {r for r in found - set(m) if expander._usable[r]}
+            walked.append(time.perf_counter() - t)
+            mismatches += set(got) != want
+        for name, lat in (("closure (precomputed)", closure), ("graph walk", walked)):
+            rows.append({"up/down": f"{up}/{down}", "impl": name,
+                         "p50_us": percentile(lat, 50) * 1e6, "p99_us": percentile(lat, 99) * 1e6})
+    print_table(rows, ["up/down", "impl", "p50_us", "p99_us"])
+    print(f"\nsame expansion terms: {mismatches == 0} ({mismatches} mismatches)")
+
+
+if __name__ == "__main__":
+    main()
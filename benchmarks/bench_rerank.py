@@ -0,0 +1,55 @@
+"""
+Latency added by the "quality" mode (cross-encoder rerank) over "fast" in
+query_and_aggregate, against the configured vector store. Reports p50/p95/p99
+per mode and the reranker's skip count under SYMPTOMS_RERANK_BUDGET_MS.
+The symptoms response cache is off, so every call is retrieved and reranked.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_rerank [--queries N] [--clients C]
+"""
+
+import argparse
+
+from benchmarks.bench_micro_batching import make_queries
+from benchmarks.common import disable_response_caches, print_table, run_concurrent
+from rag import symptoms2disease_retriever as s2d
+from utils.constants import SYMPTOMS_RERANK_BUDGET_MS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="queries per mode")
+    parser.add_argument("--clients", type=int, default=1, help="concurrent clients")
+    args = parser.parse_args()
+
+    if not s2d.RERANK_ENABLED:
+        raise SystemExit("SYMPTOMS_RERANK_ENABLED is False; nothing to compare")
+
+    disable_response_caches(s2d)
+    s2d.warm_up()
+    # first forward passes allocate buffers and calibrate the reranker's cost estimate
+    s2d.query_and_aggregate("warm up", mode="quality")
+
+    rows = []
+    for mode in s2d.MODES:
+        before = s2d.reranker.stats()
+        # fresh strings per mode so the query embedding cache doesn't favour the second run
+        queries = [f"{q} [{mode}]" for q in make_queries(args.queries)]
+        res = run_concurrent(lambda q: s2d.query_and_aggregate(q, mode=mode), queries, args.clients)
+        after = s2d.reranker.stats()
+        rows.append({"mode": mode, "clients": args.clients, **res,
+                     "reranked": after["reranked"] - before["reranked"],
+                     "skipped": after["skipped"] - before["skipped"]})
+
+    fast = rows[0]
+    for row in rows:
+        row["added_p50_ms"] = row["p50_ms"] - fast["p50_ms"]
+        row["added_p99_ms"] = row["p99_ms"] - fast["p99_ms"]
+
+    print(f"rerank budget {SYMPTOMS_RERANK_BUDGET_MS} ms, ~{s2d.reranker.stats()['ms_per_pair']:.2f} ms/pair\n")
+    print_table(rows, ["mode", "clients", "qps", "p50_ms", "p95_ms", "p99_ms",
+                       "added_p50_ms", "added_p99_ms", "reranked", "skipped"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Reproducible offline benchmark and load test for the retrieval stack.
+
+Builds a local vector-store stand-in from a seeded sample of
+symptoms2disease.jsonl and disease2treatements.json (same chunking, embedding
+and centroid pooling as the ingestion scripts, written as LocalVectorStore
+directories), so neither Milvus nor the network is needed, and points the
+retrievers at it. It then drives, at each client concurrency:
+  - query_and_aggregate   symptoms retriever, in-process
+  - retrieve_treatments   treatment retriever, in-process
+  - POST /get_diseases    the FastAPI app, in-process over ASGI (httpx)
+and reports QPS, p50/p95/p99 latency and peak RSS. The response caches are
+off and the query embedding cache is cleared before every run, so each call
+pays for its encode, search and aggregation.
+
+Queries are synthetic: each picks a sampled disease and joins 2-4 of its
+phenotype names, so the source disease is the expected answer. Quality is
+measured against an exact-search baseline (brute force over the same vectors):
+  - chunk_recall@K    first-stage hits vs the exact top-K chunks
+                      (below 1 with coarse-to-fine or approximate indexes)
+  - disease_recall@N  returned diseases vs exact search + the same aggregation
+                      (also moved by hybrid search, expansion and reranking)
+  - hit@N             queries whose source disease is among the N returned
+
+Each run writes a JSON file (all of utils/constants.py, corpus, latency,
+quality, RSS) to benchmarks/results/; --compare OLD.json prints the change
+against an earlier run.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_retrieval [--diseases N] [--queries Q] [--clients 1,8]
+        [--mode fast|quality] [--coarse-to-fine] [--out PATH] [--compare OLD.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import httpx
+
+import main as api
+import utils.constants as constants
+from benchmarks.bench_ingest_symptoms import load_ingest_module
+from benchmarks.common import (disable_response_caches, peak_rss_mb, print_table, run_concurrent,
+                               run_concurrent_async, symptom_queries, treatment_queries)
+from rag import disease2treatement_retriever as d2t
+from rag import symptoms2disease_retriever as s2d
+from rag.aggregation import aggregate_hits
+from rag.disease_alias_index import DiseaseAliasIndex
+from rag.hpo_index import HpoPhenotypeIndex
+from utils.centroids import CentroidAccumulator, CentroidTrackingSink
+from utils.config import (DIM, DISEASE_ALIASES_JSON, EMBEDDING_STORE_PATH, HPO_OBO, HPO_ONTOLOGY_DIR, HPO_TERMS_JSON,
+                          REPO_ROOT, SYMPTOMS_JSONL, TREATMENTS_JSON)
+from utils.embedding_store import EmbeddingStore, StoreBackedEmbedder
+from utils.embedding_utils import query_embedding_cache
+from utils.hpo_ontology import load_hpo_terms
+from utils.lazy import LazyResource
+from utils.vector_store import LocalVectorStore, LocalVectorStoreWriter
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+TREATMENT_FIELDS = ["disease_id", "name", "embedding", "treatments"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---------- corpus + stand-in stores ----------
+def sample_lines(path: str, n: int, rng: random.Random) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return lines if n >= len(lines) else rng.sample(lines, n)
+
+
+def sample_treatments(path: str, n: int, rng: random.Random) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    return rows if n >= len(rows) else rng.sample(rows, n)
+
+
+def _embedder(model_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    # reuse vectors from ingestion / earlier runs, so rebuilding the stand-in is cheap
+    return StoreBackedEmbedder(lambda: SentenceTransformer(model_name), model_name,
+                               EmbeddingStore(EMBEDDING_STORE_PATH))
+
+
+def build_symptom_stores(lines: List[str], out_dir: str, workers: int) -> Dict[str, object]:
+    """Chunk + embed + pool exactly as ingest-symptoms-diseases.py does, into local stores."""
+    ing = load_ingest_module()
+    chunks_path = os.path.join(out_dir, s2d.COLLECTION_NAME)
+    centroids_path = os.path.join(out_dir, s2d.CENTROID_COLLECTION_NAME)
+    writer = LocalVectorStoreWriter(chunks_path, DIM, ing.INSERT_FIELDS)
+    acc = CentroidAccumulator(DIM, constants.SYMPTOMS_CENTROID_POOLING)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # the pipeline prints every inserted batch
+        ing.run_pipeline(iter(lines), CentroidTrackingSink(writer, ing.INSERT_FIELDS, acc),
+                         _embedder(ing.EMBEDDING_MODEL), workers)
+    writer.close()
+
+    ids, names, centroids, counts = acc.finalize()
+    cwriter = LocalVectorStoreWriter(centroids_path, DIM, ing.CENTROID_FIELDS)
+    cwriter.insert([centroids.tolist(), ids, names, counts.tolist()])
+    cwriter.close()
+
+    jsonl_path = os.path.join(out_dir, "symptoms2disease.sample.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return {"chunks": chunks_path, "centroids": centroids_path, "jsonl": jsonl_path,
+            "n_chunks": writer.count, "seconds": time.perf_counter() - t0}
+
+
+def build_treatment_store(rows: List[dict], out_dir: str) -> Dict[str, object]:
+    """Name embeddings, as ingest-diseases-treatements.py writes them."""
+    path = os.path.join(out_dir, d2t.COLLECTION_NAME)
+    t0 = time.perf_counter()
+    names = [r["name"] for r in rows]
+    vecs = _embedder(d2t.EMBEDDING_MODEL).encode(names, normalize_embeddings=True, convert_to_numpy=True)
+    writer = LocalVectorStoreWriter(path, DIM, TREATMENT_FIELDS)
+    writer.insert([[r["disease_id"] for r in rows], names, vecs.tolist(), [json.dumps(r["treatments"]) for r in rows]])
+    writer.close()
+    json_path = os.path.join(out_dir, "disease2treatements.sample.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+    return {"store": path, "json": json_path, "seconds": time.perf_counter() - t0}
+
+
+def point_at(resource: LazyResource, name: str, factory):
+    # swap the loader in place: warm_up() and the retrievers hold these objects
+    resource.name, resource._factory = name, factory
+
+
+def use_stand_ins(sym: Dict[str, object], treat: Dict[str, object]):
+    point_at(s2d.store, "bench chunks (local stand-in)", lambda: LocalVectorStore(sym["chunks"]))
+    point_at(s2d.centroid_store, "bench centroids (local stand-in)", lambda: LocalVectorStore(sym["centroids"]))
+    point_at(s2d.hpo_index, "bench HPO index", lambda: HpoPhenotypeIndex.from_jsonl(
+        sym["jsonl"], load_hpo_terms(HPO_OBO, HPO_ONTOLOGY_DIR, HPO_TERMS_JSON)))
+    point_at(d2t.store, "bench treatments (local stand-in)", lambda: LocalVectorStore(treat["store"]))
+    point_at(d2t.alias_index, "bench alias index", lambda: DiseaseAliasIndex.from_files(
+        treat["json"], DISEASE_ALIASES_JSON))
+    # the load test replays the quality run's queries, and each client count the previous one's
+    disable_response_caches(s2d, d2t)
+
+
+# ---------- quality ----------
+def measure_quality(queries: List[Tuple[str, str]], exact: LocalVectorStore, top_k: int, mode: str,
+                    coarse_to_fine: bool) -> Dict[str, float]:
+    top_n = s2d.TOP_N_DISEASES
+    chunk_recall, disease_recall, hits = [], [], 0
+    q_vecs = s2d._encode_queries([q for q, _ in queries])
+    system_hits = s2d._search_many(q_vecs, top_k, coarse_to_fine)
+    exact_hits = exact.search(data=q_vecs, limit=top_k, output_fields=s2d.CHUNK_OUTPUT_FIELDS)
+    for (query, source), got, want in zip(queries, system_hits, exact_hits):
+        want_ids = {h.id for h in want}
+        chunk_recall.append(len({h.id for h in got} & want_ids) / max(len(want_ids), 1))
+
+        returned = [d["disease_id"] for d in s2d.query_and_aggregate(query, top_k, mode=mode,
+                                                                     coarse_to_fine=coarse_to_fine)]
+        baseline = [d["disease_id"] for d in aggregate_hits(want, top_n, s2d.TOP_M_CHUNKS_PER_DISEASE,
+                                                             s2d.AGGREGATOR, s2d.AGGREGATOR_TOP_K)]
+        disease_recall.append(len(set(returned) & set(baseline)) / max(len(baseline), 1))
+        hits += source in returned
+    return {
+        f"chunk_recall@{top_k}": sum(chunk_recall) / len(chunk_recall),
+        f"disease_recall@{top_n}": sum(disease_recall) / len(disease_recall),
+        f"hit@{top_n}": hits / len(queries),
+    }
+
+
+# ---------- load ----------
+def measure_latency(sym_queries: List[str], treat_queries: List[str], clients: List[int], top_k: int,
+                    mode: str, coarse_to_fine: bool) -> List[Dict]:
+    rows = []
+
+    async def api_run(c: int):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def post(q):
+                r = await client.post("/get_diseases", json={"symptoms": q, "mode": mode})
+                r.raise_for_status()
+            return await run_concurrent_async(post, sym_queries, c)
+
+    for c in clients:
+        targets = (
+            ("query_and_aggregate",
+             lambda: run_concurrent(lambda q: s2d.query_and_aggregate(q, top_k, mode=mode,
+                                                                      coarse_to_fine=coarse_to_fine),
+                                    sym_queries, c)),
+            ("retrieve_treatments", lambda: run_concurrent(d2t.retrieve_treatments, treat_queries, c)),
+            ("api /get_diseases", lambda: asyncio.run(api_run(c))),
+        )
+        for name, run in targets:
+            query_embedding_cache.clear()  # every run pays for its encodes
+            res = run()
+            rows.append({"target": name, "clients": c, **res, "peak_rss_mb": peak_rss_mb()})
+    return rows
+
+
+# ---------- compare ----------
+def compare(old_path: str, new: Dict):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\nvs {old_path} (commit {old['meta'].get('commit')}):")
+    old_rows = {(r["target"], r["clients"]): r for r in old.get("latency", [])}
+    rows = []
+    for r in new["latency"]:
+        o = old_rows.get((r["target"], r["clients"]))
+        if o is None:
+            continue
+        rows.append({"target": r["target"], "clients": r["clients"],
+                     "qps": f"{o['qps']:.1f} -> {r['qps']:.1f} ({(r['qps'] / o['qps'] - 1) * 100:+.0f}%)" if o["qps"] else "",
+                     "p50_ms": f"{o['p50_ms']:.1f} -> {r['p50_ms']:.1f}",
+                     "p99_ms": f"{o['p99_ms']:.1f} -> {r['p99_ms']:.1f}"})
+    if rows:
+        print_table(rows, ["target", "clients", "qps", "p50_ms", "p99_ms"])
+    else:
+        print("no runs with the same target and client count")
+    for key, value in new["quality"].items():
+        if key in old.get("quality", {}):
+            print(f"{key}: {old['quality'][key]:.3f} -> {value:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jsonl", default=SYMPTOMS_JSONL)
+    parser.add_argument("--treatments", default=TREATMENTS_JSON)
+    parser.add_argument("--diseases", type=int, default=2000, help="diseases sampled into the stand-in stores")
+    parser.add_argument("--queries", type=int, default=200, help="queries per run")
+    parser.add_argument("--clients", default="1,8", help="comma-separated client counts")
+    parser.add_argument("--top-k", type=int, default=s2d.TOP_K_CHUNKS)
+    parser.add_argument("--mode", choices=s2d.MODES, default="fast")
+    parser.add_argument("--coarse-to-fine", action="store_true", default=s2d.COARSE_TO_FINE)
+    parser.add_argument("--workers", type=int, default=2, help="chunking processes for the stand-in build")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="result JSON (default: benchmarks/results/retrieval-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result JSON to diff against")
+    args = parser.parse_args()
+    clients = [int(c) for c in args.clients.split(",") if c]
+    for path in (args.jsonl, args.treatments):
+        if not os.path.exists(path):
+            raise SystemExit(f"{path} not found (see milvus-data-ingestion/README.md)")
+
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    lines = sample_lines(args.jsonl, args.diseases, rng)
+    treatment_rows = sample_treatments(args.treatments, args.diseases, rng)
+    sym = build_symptom_stores(lines, work_dir, args.workers)
+    treat = build_treatment_store(treatment_rows, work_dir)
+    use_stand_ins(sym, treat)
+    print(f"stand-in: {len(lines)} diseases, {sym['n_chunks']} chunks ({sym['seconds']:.1f}s), "
+          f"{len(treatment_rows)} treatment rows ({treat['seconds']:.1f}s) in {work_dir}")
+
+    s2d.warm_up()
+    d2t.warm_up()
+    rss_loaded = peak_rss_mb()
+
+    sym_q = symptom_queries(lines, args.queries, rng)
+    treat_q = treatment_queries(treatment_rows, args.queries, rng)
+    t0 = time.perf_counter()
+    quality = measure_quality(sym_q, LocalVectorStore(sym["chunks"]), args.top_k, args.mode, args.coarse_to_fine)
+    print(f"quality over {len(sym_q)} queries ({time.perf_counter() - t0:.1f}s): "
+          + ", ".join(f"{k}={v:.3f}" for k, v in quality.items()) + "\n")
+
+    latency = measure_latency([q for q, _ in sym_q], treat_q, clients, args.top_k, args.mode, args.coarse_to_fine)
+    print_table(latency, ["target", "clients", "calls", "qps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"])
+
+    result = {
+        "meta": {"time": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                 "python": platform.python_version(), "platform": platform.platform(), "args": vars(args),
+                 "search_params": {"symptoms": s2d.SEARCH_PARAMS, "treatments": d2t.SEARCH_PARAMS},
+                 "response_caches": "disabled", "query_embedding_cache": "cleared per run"},
+        "config": {k: v for k, v in vars(constants).items() if k.isupper()},
+        "corpus": {"diseases": len(lines), "chunks": sym["n_chunks"], "treatment_rows": len(treatment_rows)},
+        "rss_mb": {"after_load": rss_loaded, "peak": peak_rss_mb()},
+        "quality": quality,
+        "latency": latency,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwrote {out}")
+    if args.compare:
+        compare(args.compare, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Measure API startup cost against STARTUP_TIME_BUDGET_SECONDS:
+  1. `import main` in a fresh interpreter (should not load models or touch Milvus)
+  2. parallel warm-up of both embedders and both Milvus collections
+
+Usage (from the repo root, Milvus running for step 2):
+    python -m benchmarks.bench_startup [--skip-warmup]
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+from utils.constants import STARTUP_TIME_BUDGET_SECONDS
+
+
+def measure_import(module: str = "main") -> float:
+    code = f"import time; t0 = time.perf_counter(); import {module}; print(time.perf_counter() - t0)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip-warmup", action="store_true", help="only measure the import")
+    args = parser.parse_args()
+
+    import_s = measure_import()
+    print(f"import main:      {import_s:.2f}s")
+    if args.skip_warmup:
+        return
+
+    import main as api
+
+    t0 = time.perf_counter()
+    asyncio.run(api.warm_up())
+    total = time.perf_counter() - t0
+    for r in api.RESOURCES:
+        status = f"{r.load_seconds:.2f}s" if r.loaded else f"FAILED ({r.last_error})"
+        print(f"  {r.name}: {status}")
+    print(f"parallel warm-up: {total:.2f}s")
+    verdict = "OK" if import_s + total <= STARTUP_TIME_BUDGET_SECONDS else "OVER BUDGET"
+    print(f"startup total:    {import_s + total:.2f}s / budget {STARTUP_TIME_BUDGET_SECONDS}s -> {verdict}")
+
+
+if __name__ == "__main__":
+    main()
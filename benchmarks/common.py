@@ -0,0 +1,139 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+Run benchmarks from the repository root, e.g. `python -m benchmarks.bench_micro_batching`.
+"""
+
+import asyncio
+import json
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """q-th percentile (0-100) of samples, 0.0 for an empty list."""
+    if not samples:
+        return 0.0
+    return float(np.percentile(np.asarray(samples, dtype=np.float64), q))
+
+
+def latency_summary(latencies_s: Sequence[float], wall_s: float) -> Dict[str, float]:
+    """Summarize per-call latencies (seconds) into ms percentiles and QPS."""
+    return {
+        "calls": len(latencies_s),
+        "qps": len(latencies_s) / wall_s if wall_s > 0 else 0.0,
+        "p50_ms": percentile(latencies_s, 50) * 1000,
+        "p95_ms": percentile(latencies_s, 95) * 1000,
+        "p99_ms": percentile(latencies_s, 99) * 1000,
+    }
+
+
+def run_concurrent(fn: Callable[[str], object], queries: List[str], clients: int) -> Dict[str, float]:
+    """
+    Call fn(query) for every query from `clients` threads at once and
+    return the latency summary. Queries are split round-robin between clients.
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients)
+
+    def client(worker_queries: List[str]):
+        local = []
+        start_barrier.wait()
+        for q in worker_queries:
+            t0 = time.perf_counter()
+            fn(q)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    shards = [queries[i::clients] for i in range(clients)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, shards))
+    wall = time.perf_counter() - t0
+    return latency_summary(latencies, wall)
+
+
+async def run_concurrent_async(fn: Callable[[str], Awaitable[object]], queries: List[str],
+                               clients: int) -> Dict[str, float]:
+    """Async run_concurrent: `clients` coroutines on one event loop, each awaiting fn(query) in turn."""
+    latencies: List[float] = []
+
+    async def client(worker_queries: List[str]):
+        for q in worker_queries:
+            t0 = time.perf_counter()
+            await fn(q)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(queries[i::clients]) for i in range(clients)))
+    return latency_summary(latencies, time.perf_counter() - t0)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB."""
+    # Linux: VmHWM starts over at exec, while ru_maxrss keeps the forking parent's peak
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def disable_response_caches(*retrievers):
+    """
+    Turn off the response cache of each retriever module (size 0: every get()
+    misses, put() is a no-op), so replayed queries measure retrieval, not a
+    cache lookup.
+    """
+    for module in retrievers:
+        module.response_cache.clear()
+        module.response_cache.max_size = 0
+
+
+# ---------- synthetic queries ----------
+def symptom_queries(lines: List[str], n: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """(query, source disease_id): 2-4 phenotype names of one sampled disease."""
+    records = []
+    for line in lines:
+        obj = json.loads(line)
+        names = list(dict.fromkeys(s.split(":")[0].strip() for s in obj.get("symptoms") or [] if s))
+        if names:
+            records.append((obj["disease_id"], names))
+    out = []
+    for _ in range(n):
+        did, names = rng.choice(records)
+        picked = rng.sample(names, min(len(names), rng.randint(2, 4)))
+        out.append((", ".join(p.lower() for p in picked), did))
+    return out
+
+
+def treatment_queries(rows: List[dict], n: int, rng: random.Random) -> List[str]:
+    # phrased so the exact name/alias fast path misses and the vector search runs
+    return [f"treatment for {rng.choice(rows)['name'].lower()}" for _ in range(n)]
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """Print a list of dicts as a fixed-width table."""
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        return f"{v:.2f}"
+    return str(v)
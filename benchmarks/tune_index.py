@@ -0,0 +1,277 @@
+"""
+Tune the Milvus index of a collection against exact search and write the
+fastest configuration that meets a recall target to data-files/index-tuning.json
+(INDEX_TUNING_JSON), which utils/constants.py loads at startup.
+
+For one collection (disease_kb_chunks or disease_treatments):
+  1. read every vector and its disease_id from the serving collection (or the
+     local store) and copy them into a scratch Milvus collection `<name>_tune`,
+  2. build held-out synthetic queries with a fixed seed (symptoms: 2-4
+     phenotype names of a random disease; treatments: "treatment for <name>")
+     and encode them with the retriever's model,
+  3. ground truth: exact inner-product search in NumPy over the same vectors;
+     for chunks, the exact top --reference-top-k hits aggregated to the top
+     SYMPTOMS_TOP_N_DISEASES diseases exactly as the retriever does,
+  4. for each index candidate (FLAT, HNSW at several M, IVF_FLAT / IVF_SQ8) build
+     the index, then for each search param (ef / nprobe) and, for chunks, each
+     top-K candidate: run every query on its own, as a request does, and record
+     p50/p99 latency and disease-level recall vs the ground truth,
+  5. keep the lowest-p50 row with recall >= --target (FLAT always qualifies),
+     write it and drop the scratch collection.
+
+The ingestion scripts build the collection's index from the same settings, and
+record them in the manifest: re-run the collection's ingestion script after
+tuning and it rebuilds the index even if the corpus is unchanged. An IVF nlist
+is written as null and sized to the row count at every index build
+(utils.vector_compression.resolve_nlist), so it follows the corpus as it grows
+or shrinks; `rows` only records the size the latencies were measured at.
+
+Usage (from the repo root, Milvus running):
+    python -m benchmarks.tune_index [--collection disease_kb_chunks|disease_treatments]
+        [--queries N] [--target 0.98] [--dry-run]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from benchmarks.common import percentile, print_table, symptom_queries, treatment_queries
+from rag.aggregation import aggregate_hits
+from utils.config import DIM, INDEX_TUNING_JSON, MILVUS_HOST, MILVUS_PORT, SYMPTOMS_JSONL, TREATMENTS_JSON
+from utils.constants import (INDEX_TUNING_TARGET_RECALL, SYMPTOMS_AGGREGATOR, SYMPTOMS_AGGREGATOR_TOP_K,
+                             SYMPTOMS_EMBEDDING_MODEL, SYMPTOMS_TOP_N_DISEASES, SYMPTOMS_VECTOR_BACKEND,
+                             TREATMENT_EMBEDDING_MODEL, TREATMENT_TOP_K, TREATMENT_VECTOR_BACKEND)
+from utils.index_tuning import SEARCH_PARAM_NAMES, save_index_tuning, search_params_for
+from utils.ingest_utils import IngestManifest, iter_disease_rows
+from utils.milvus_utils import local_store_path
+from utils.vector_compression import resolve_nlist
+from utils.vector_store import LocalHit, LocalVectorStore, topk_indices
+
+# nlist None = about 4 * sqrt(rows), the usual IVF starting point
+INDEX_CANDIDATES = [
+    {"index_type": "FLAT", "params": {}},
+    {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 200}},
+    {"index_type": "HNSW", "params": {"M": 32, "efConstruction": 200}},
+    {"index_type": "HNSW", "params": {"M": 48, "efConstruction": 200}},
+    {"index_type": "IVF_FLAT", "params": {"nlist": None}},
+    {"index_type": "IVF_SQ8", "params": {"nlist": None}},
+]
+SEARCH_VALUES = {"HNSW": (16, 32, 64, 128, 256), "IVF_FLAT": (8, 16, 32, 64, 128), "IVF_SQ8": (8, 16, 32, 64, 128)}
+CHUNK_TOP_K_CANDIDATES = (20, 30, 40, 60)
+INSERT_BATCH = 1024
+WARMUP_QUERIES = 10
+
+COLLECTIONS = {
+    "disease_kb_chunks": {"model": SYMPTOMS_EMBEDDING_MODEL, "backend": SYMPTOMS_VECTOR_BACKEND},
+    "disease_treatments": {"model": TREATMENT_EMBEDDING_MODEL, "backend": TREATMENT_VECTOR_BACKEND},
+}
+
+
+# ---------- data ----------
+def load_vectors(collection_name: str, backend: str):
+    """(float32 matrix, disease_id per row) of the served collection, read via its manifest's disease ids."""
+    manifest = IngestManifest.load(collection_name)
+    if not manifest.diseases:
+        raise SystemExit(f"No ingest manifest for {collection_name}; run its ingestion script first")
+    if backend == "local":
+        source = LocalVectorStore(local_store_path(collection_name))
+    else:
+        source = Collection(collection_name)
+        source.load()
+    vecs, disease_ids = [], []
+    for rows in iter_disease_rows(source, manifest.diseases, ["embedding", "disease_id"]):
+        vecs.extend(np.asarray(r["embedding"], dtype=np.float32) for r in rows)
+        disease_ids.extend(r["disease_id"] for r in rows)
+    return np.vstack(vecs), disease_ids
+
+
+def make_queries(collection_name: str, n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    if collection_name == "disease_kb_chunks":
+        with open(SYMPTOMS_JSONL, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        return [q for q, _ in symptom_queries(lines, n, rng)]
+    with open(TREATMENTS_JSON, "r", encoding="utf-8") as f:
+        return treatment_queries(json.load(f), n, rng)
+
+
+def encode(model_name: str, queries: List[str]) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    return np.asarray(SentenceTransformer(model_name).encode(queries, normalize_embeddings=True,
+                                                             convert_to_numpy=True), dtype=np.float32)
+
+
+# ---------- scoring ----------
+class Scorer:
+    """Top diseases of a hit list, as the collection's retriever would return them."""
+
+    def __init__(self, collection_name: str, disease_ids: List[str]):
+        self.chunks = collection_name == "disease_kb_chunks"
+        self.disease_ids = disease_ids
+        self.top_n = SYMPTOMS_TOP_N_DISEASES if self.chunks else TREATMENT_TOP_K
+
+    def diseases(self, rows: List[int], scores: List[float]) -> List[str]:
+        if not self.chunks:
+            # one row per disease: the retriever returns the top rows as they are
+            return [self.disease_ids[r] for r in rows[: self.top_n]]
+        hits = [LocalHit(r, s, {"disease_id": self.disease_ids[r], "chunk_index": 0, "chunk_text": ""})
+                for r, s in zip(rows, scores)]
+        ranked = aggregate_hits(hits, self.top_n, 1, SYMPTOMS_AGGREGATOR, SYMPTOMS_AGGREGATOR_TOP_K)
+        return [d["disease_id"] for d in ranked]
+
+    def recall(self, got: List[str], want: List[str]) -> float:
+        return len(set(got) & set(want)) / max(len(want), 1)
+
+
+def ground_truth(matrix: np.ndarray, q_vecs: np.ndarray, scorer: Scorer, top_k: int) -> List[List[str]]:
+    out = []
+    for q in q_vecs:
+        scores = matrix @ q
+        rows = topk_indices(scores[None, :], top_k)[0]
+        out.append(scorer.diseases(rows.tolist(), scores[rows].tolist()))
+    return out
+
+
+# ---------- Milvus scratch collection ----------
+def create_scratch(name: str, matrix: np.ndarray) -> Collection:
+    fields = [
+        FieldSchema(name="row", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
+    ]
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    collection = Collection(name, CollectionSchema(fields, description="Index tuning scratch copy"))
+    for i in range(0, len(matrix), INSERT_BATCH):
+        collection.insert([list(range(i, min(i + INSERT_BATCH, len(matrix)))), matrix[i: i + INSERT_BATCH].tolist()])
+    collection.flush()
+    return collection
+
+
+def build_index(collection: Collection, index_params: dict) -> float:
+    collection.release()
+    if collection.has_index():
+        collection.drop_index()
+    t0 = time.perf_counter()
+    collection.create_index(field_name="embedding", index_params=index_params)
+    collection.load()
+    return time.perf_counter() - t0
+
+
+def unresolved(candidate: dict) -> dict:
+    return {"index_type": candidate["index_type"], "metric_type": "IP", "params": dict(candidate["params"])}
+
+
+def resolve(candidate: dict, n_rows: int) -> dict:
+    # the same sizing ingestion applies to the stored (nlist None) settings at build time
+    return resolve_nlist(unresolved(candidate), n_rows)
+
+
+def search_values(index_params: dict, top_k: int) -> list:
+    kind = index_params["index_type"]
+    if SEARCH_PARAM_NAMES.get(kind) is None:
+        return [None]
+    if kind == "HNSW":
+        return [ef for ef in SEARCH_VALUES[kind] if ef >= top_k]  # Milvus rejects ef < limit
+    return [p for p in SEARCH_VALUES[kind] if p <= index_params["params"]["nlist"]]
+
+
+def sweep(collection: Collection, q_vecs: np.ndarray, truth: List[List[str]], scorer: Scorer,
+          top_ks: List[int]) -> List[Dict]:
+    rows = []
+    for candidate in INDEX_CANDIDATES:
+        index_params = resolve(candidate, collection.num_entities)
+        build_s = build_index(collection, index_params)
+        label = f"{index_params['index_type']} {index_params['params']}" if index_params["params"] else "FLAT"
+        print(f"built {label} in {build_s:.1f}s")
+        for top_k in top_ks:
+            for value in search_values(index_params, top_k):
+                search_params = search_params_for(index_params["index_type"], value)
+                for q in q_vecs[:WARMUP_QUERIES]:
+                    collection.search(data=[q.tolist()], anns_field="embedding", param=search_params, limit=top_k)
+                latencies, recalls = [], []
+                for q, want in zip(q_vecs, truth):
+                    t = time.perf_counter()
+                    hits = collection.search(data=[q.tolist()], anns_field="embedding", param=search_params,
+                                             limit=top_k)[0]
+                    latencies.append(time.perf_counter() - t)
+                    got = scorer.diseases([h.id for h in hits], [h.distance for h in hits])
+                    recalls.append(scorer.recall(got, want))
+                rows.append({
+                    "index": label, "search": search_params["params"] or "", "top_k": top_k,
+                    "recall": sum(recalls) / len(recalls),
+                    "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000,
+                    "build_s": build_s, "index_params": index_params, "search_params": search_params,
+                    "tuned_params": unresolved(candidate),
+                })
+    return rows
+
+
+def pick(rows: List[Dict], target: float) -> Dict:
+    ok = [r for r in rows if r["recall"] >= target]
+    if not ok:
+        # only possible if FLAT itself was left out of INDEX_CANDIDATES
+        return max(rows, key=lambda r: (r["recall"], -r["p50_ms"]))
+    return min(ok, key=lambda r: (r["p50_ms"], -r["recall"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", choices=sorted(COLLECTIONS), default="disease_kb_chunks")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--target", type=float, default=INDEX_TUNING_TARGET_RECALL,
+                        help="disease-level recall vs exact search to reach")
+    parser.add_argument("--reference-top-k", type=int, default=40,
+                        help="exact chunk hits behind the ground-truth disease ranking (chunks only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="print the choice, don't write it")
+    args = parser.parse_args()
+    cfg = COLLECTIONS[args.collection]
+
+    connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
+    t0 = time.perf_counter()
+    matrix, disease_ids = load_vectors(args.collection, cfg["backend"])
+    print(f"{args.collection}: {len(matrix)} vectors loaded in {time.perf_counter() - t0:.1f}s")
+
+    q_vecs = encode(cfg["model"], make_queries(args.collection, args.queries, args.seed))
+    scorer = Scorer(args.collection, disease_ids)
+    reference_k = args.reference_top_k if scorer.chunks else scorer.top_n
+    truth = ground_truth(matrix, q_vecs, scorer, reference_k)
+    # the reference top-K is always swept, so FLAT at it reaches recall 1
+    top_ks = sorted(set(CHUNK_TOP_K_CANDIDATES) | {reference_k}) if scorer.chunks else [scorer.top_n]
+
+    scratch = create_scratch(f"{args.collection}_tune", matrix)
+    try:
+        rows = sweep(scratch, q_vecs, truth, scorer, top_ks)
+    finally:
+        utility.drop_collection(scratch.name)
+
+    print()
+    print_table(rows, ["index", "search", "top_k", "recall", "p50_ms", "p99_ms"])
+    best = pick(rows, args.target)
+    print(f"\nchosen: {best['index']} search {best['search_params']['params']} top_k {best['top_k']} "
+          f"(recall {best['recall']:.3f}, p50 {best['p50_ms']:.2f} ms; target {args.target})")
+    if args.dry_run:
+        return
+
+    entry = {
+        # nlist stays null: ingestion sizes it to the row count it actually builds with
+        "index_params": best["tuned_params"], "search_params": best["search_params"],
+        "recall": round(best["recall"], 4), "recall_target": args.target,
+        "p50_ms": round(best["p50_ms"], 3), "p99_ms": round(best["p99_ms"], 3),
+        "queries": len(q_vecs), "rows": len(matrix), "tuned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    if scorer.chunks:
+        entry["top_k"] = best["top_k"]
+    save_index_tuning(INDEX_TUNING_JSON, args.collection, entry)
+    print(f"wrote {INDEX_TUNING_JSON}; re-run the ingestion script for {args.collection} to rebuild its index")
+
+
+if __name__ == "__main__":
+    main()
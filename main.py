@@ -10,19 +10,95 @@ logger = logging.getLogger(__name__)
 """  
 FastAPI layer that routes UI calls to the single LangGraph tools_node.
 Two endpoints kept for UI simplicity:
-  - POST /get_diseases   { "symptoms": "..." }
+  - POST /get_diseases   { "symptoms": "...", "mode": "fast" | "quality" }
   - POST /get_treatments { "disease": "..." }
 Both endpoints call the same graph node; the graph decides which underlying tool to call.
+  - POST /diagnose       { "symptoms": "...", "mode": "fast" | "quality" }
+runs the two-node diagnose graph (diseases_node -> treatments_node) and returns the
+top diseases with their treatments in one response; treatments are joined on
+disease_id, with a single batched search for any disease not matched by id.
+Batch variants for offline jobs skip the graph and call the batch tools directly:
+  - POST /get_diseases:batch   { "symptoms": ["...", ...], "mode": "fast" | "quality" }
+  - POST /get_treatments:batch { "diseases": ["...", ...] }
+Retrievers load lazily; the lifespan hook warms them up in the background
+(models and Milvus connections in parallel) and GET /ready reports when they are loaded.
+"quality" mode reranks the top chunks with a cross-encoder within a latency budget;
+"fast" (the default) skips that stage.
+Endpoints are async and use lg_app.ainvoke, so encoding and Milvus search run on
+bounded executors and the event loop stays free for other requests.
+GET /metrics serves Prometheus-format metrics (request and per-stage latency,
+hit counts, result sizes, cache and batching gauges; see utils/metrics.py).
+A request sent with `X-Debug-Timing: 1` gets its stage breakdown back in the
+X-Debug-Timing response header, e.g. "encode;dur=3.10, search;dur=5.20, ..., total;dur=12.00"
+(ms; graph_overhead = LangGraph time outside the tool call).
 """
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
-
-from agent import app as lg_app  # compiled LangGraph app
+from typing import List, Dict, Any, Literal
+
+from agent import app as lg_app, diagnose_app  # compiled LangGraph apps
+from tools import asymptom_to_disease_batch_tool, adisease_to_treatment_batch_tool
+from utils.constants import BATCH_MAX_QUERIES, STARTUP_TIME_BUDGET_SECONDS
+from rag import symptoms2disease_retriever, disease2treatement_retriever
+from utils.metrics import (REGISTRY, REQUEST_SECONDS, RESPONSE_BYTES, RESULT_ITEMS, end_trace, format_trace,
+                           stage, start_trace)
 # (agent_graph also exports call_tools_node if you want to call directly)
 
-app = FastAPI(title="Disease Agent API (single tools node)")
+# ---------- Warm-up ----------
+RESOURCES = [*symptoms2disease_retriever.resources, *disease2treatement_retriever.resources]
+warmup_state = {"done": False, "seconds": None}
+
+async def warm_up():
+    """Load both embedders and both Milvus collections in parallel; failures are logged, not fatal."""
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(asyncio.to_thread(r.get) for r in RESOURCES), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    warmup_state.update(done=True, seconds=elapsed)
+    for r, res in zip(RESOURCES, results):
+        if isinstance(res, Exception):
+            logger.error("Warm-up failed for %s: %s", r.name, r.last_error)
+    if elapsed > STARTUP_TIME_BUDGET_SECONDS:
+        logger.warning("Warm-up took %.1fs, over the %.0fs startup budget", elapsed, STARTUP_TIME_BUDGET_SECONDS)
+    else:
+        logger.info("Warm-up finished in %.1fs (budget %.0fs)", elapsed, STARTUP_TIME_BUDGET_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm up in the background so the server (and /health) is up immediately
+    task = asyncio.create_task(warm_up())
+    yield
+    task.cancel()
+
+app = FastAPI(title="Disease Agent API (single tools node)", lifespan=lifespan)
+
+DEBUG_TIMING_HEADER = "X-Debug-Timing"
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    # request latency for every endpoint; stage breakdown only when asked for
+    debug = request.headers.get(DEBUG_TIMING_HEADER, "").lower() in ("1", "true", "yes", "on")
+    token = start_trace() if debug else None
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - t0
+        endpoint = getattr(request.scope.get("route"), "path", None) or "other"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, status=str(status))
+        trace = end_trace(token) if token is not None else None
+    if trace is not None:
+        if "graph" in trace and "tool" in trace:
+            trace["graph_overhead"] = trace["graph"] - trace["tool"]
+        trace["total"] = elapsed
+        response.headers[DEBUG_TIMING_HEADER] = format_trace(trace)
+    return response
 
 # Enable CORS for UI
 app.add_middleware(
@@ -31,22 +107,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[DEBUG_TIMING_HEADER],
 )
 
 # ---------- Request models ----------
+Mode = Literal["fast", "quality"]
+
 class SymptomsIn(BaseModel):
     symptoms: str
+    mode: Mode = "fast"
 
 class DiseaseIn(BaseModel):
     disease: str
 
+class SymptomsBatchIn(BaseModel):
+    symptoms: List[str]
+    mode: Mode = "fast"
+
+class DiseaseBatchIn(BaseModel):
+    diseases: List[str]
+
 # ---------- Endpoints ----------
+def _respond(endpoint: str, body: Dict[str, Any], items) -> JSONResponse:
+    RESULT_ITEMS.observe(len(items) if isinstance(items, list) else 0, endpoint=endpoint)
+    with stage("serialize"):
+        response = JSONResponse(body)
+    RESPONSE_BYTES.observe(len(response.body), endpoint=endpoint)
+    return response
+
 @app.post("/get_diseases")
-def get_diseases(req: SymptomsIn):
-    state = {"symptoms": req.symptoms}
+async def get_diseases(req: SymptomsIn):
+    state = {"symptoms": req.symptoms, "mode": req.mode}
     # invoke the compiled graph — entry point is tools_node
     try:
-        res = lg_app.invoke(state)
+        with stage("graph"):
+            res = await lg_app.ainvoke(state)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     if res is None:
@@ -55,14 +150,15 @@ def get_diseases(req: SymptomsIn):
         raise HTTPException(status_code=400, detail=res["error"])
     # res should contain 'diseases'
     diseases = res.get("diseases", [])
-    return {"diseases": diseases}
+    return _respond("/get_diseases", {"diseases": diseases}, diseases)
 
 
 @app.post("/get_treatments")
-def get_treatments(req: DiseaseIn):
+async def get_treatments(req: DiseaseIn):
     state = {"disease": req.disease}
     try:
-        res = lg_app.invoke(state)
+        with stage("graph"):
+            res = await lg_app.ainvoke(state)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     if res is None:
@@ -70,15 +166,80 @@ def get_treatments(req: DiseaseIn):
     if "error" in res:
         raise HTTPException(status_code=400, detail=res["error"])
     treatments = res.get("treatments", [])
-    return {"treatments": treatments}
+    return _respond("/get_treatments", {"treatments": treatments}, treatments)
+
+
+@app.post("/diagnose")
+async def diagnose(req: SymptomsIn):
+    # diseases[i] is the /get_diseases item plus "treatments" (and "treatments_error" on failure)
+    state = {"symptoms": req.symptoms, "mode": req.mode}
+    try:
+        with stage("graph"):
+            res = await diagnose_app.ainvoke(state)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if res is None:
+        raise HTTPException(status_code=500, detail="Graph returned no result")
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    diagnoses = res.get("diagnoses", [])
+    return _respond("/diagnose", {"diseases": diagnoses}, diagnoses)
 
 
-# Optional health endpoint
+def _check_batch_size(items: List[str]):
+    if len(items) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(items)} items (max {BATCH_MAX_QUERIES})")
+
+
+@app.post("/get_diseases:batch")
+async def get_diseases_batch(req: SymptomsBatchIn):
+    # results[i] is {"diseases": [...]} or {"error": "..."} for req.symptoms[i]
+    _check_batch_size(req.symptoms)
+    try:
+        results = await asymptom_to_disease_batch_tool(req.symptoms, mode=req.mode)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return _respond("/get_diseases:batch", {"results": results}, results)
+
+
+@app.post("/get_treatments:batch")
+async def get_treatments_batch(req: DiseaseBatchIn):
+    # results[i] is {"treatments": [...]} or {"error": "..."} for req.diseases[i]
+    _check_batch_size(req.diseases)
+    try:
+        results = await adisease_to_treatment_batch_tool(req.diseases)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return _respond("/get_treatments:batch", {"results": results}, results)
+
+
+# Optional health endpoint (liveness: the process is up)
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+# Readiness: models and Milvus collections are loaded
+@app.get("/ready")
+def ready():
+    ready = all(r.loaded for r in RESOURCES)
+    seconds = warmup_state["seconds"]
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "warmup_seconds": seconds,
+        "startup_budget_seconds": STARTUP_TIME_BUDGET_SECONDS,
+        "within_budget": seconds is not None and seconds <= STARTUP_TIME_BUDGET_SECONDS,
+        "resources": [r.status() for r in RESOURCES],
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Mount a "static" directory for frontend files
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
 
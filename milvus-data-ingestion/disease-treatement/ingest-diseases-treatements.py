@@ -1,70 +1,166 @@
 # pip install sentence-transformers pymilvus
 
+"""
+Ingest disease2treatements.json into the `disease_treatments` collection.
+
+Re-ingestion is incremental: a manifest keeps a content hash per disease
+(name + treatments). Only new/changed diseases are re-embedded; rows of
+unchanged diseases are copied into a fresh shadow collection, removed diseases
+are left out, and the serving alias is swapped to the shadow collection once it
+is fully built (see utils/ingest_utils.py).
+"""
+
 from sentence_transformers import SentenceTransformer
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 
 import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for utils/
+from utils.config import TREATMENTS_JSON, EMBEDDING_STORE_PATH
+from utils.embedding_store import EmbeddingStore, StoreBackedEmbedder
+from utils.constants import TREATMENT_VECTOR_BACKEND, TREATMENT_INDEX_PARAMS
+from utils.ingest_utils import (
+    IngestManifest,
+    content_hash,
+    copy_disease_rows,
+    plan_ingest,
+    prune_shadow_collections,
+    shadow_collection_name,
+    swap_alias,
+)
+from utils.milvus_utils import local_store_path
+from utils.vector_compression import resolve_nlist
+from utils.vector_store import LocalVectorStore, LocalVectorStoreWriter
 
 # --------------------------
 # Config
 # --------------------------
 MODEL_NAME = "BAAI/bge-small-en-v1.5"   # Embedding model
 EMB_DIM = 384                           # Dim of above model
-COLLECTION_NAME = "disease_treatments"
+COLLECTION_NAME = "disease_treatments"  # serving alias (Milvus) / store name (local)
+INPUT_JSON = TREATMENTS_JSON
+USE_EMBEDDING_STORE = True              # reuse name embeddings from earlier runs
 
-# --------------------------
-# Load model
-# --------------------------
-model = SentenceTransformer(MODEL_NAME)
+INSERT_FIELDS = ["disease_id", "name", "embedding", "treatments"]
 
 # --------------------------
-# Connect to Milvus
-# --------------------------
-connections.connect(alias="default", host="127.0.0.1", port="19530")
+# Target: Milvus shadow collection or local vector store (TREATMENT_VECTOR_BACKEND)
+# --------------------------
+def create_milvus_collection(name: str) -> Collection:
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="disease_id", dtype=DataType.VARCHAR, max_length=100),
+        FieldSchema(name="name", dtype=DataType.VARCHAR, max_length=512),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMB_DIM),
+        FieldSchema(name="treatments", dtype=DataType.VARCHAR, max_length=5000),
+    ]
+    schema = CollectionSchema(fields, description="Disease → Treatments mapping")
+    # a leftover shadow from an interrupted run is never served, so it is safe to drop
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    return Collection(name=name, schema=schema)
 
-# --------------------------
-# Drop collection if exists
-# --------------------------
-if utility.has_collection(COLLECTION_NAME):
-    utility.drop_collection(COLLECTION_NAME)
+def open_previous(manifest: IngestManifest):
+    """Currently served collection/store to copy unchanged rows from (None on first run)."""
+    if manifest.version == 0:
+        return None
+    if TREATMENT_VECTOR_BACKEND == "local":
+        path = local_store_path(COLLECTION_NAME)
+        return LocalVectorStore(path) if os.path.exists(path) else None
+    previous = Collection(manifest.physical_collection)
+    previous.load()
+    return previous
 
-# --------------------------
-# Define schema
-# --------------------------
-fields = [
-    FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-    FieldSchema(name="disease_id", dtype=DataType.VARCHAR, max_length=100),
-    FieldSchema(name="name", dtype=DataType.VARCHAR, max_length=512),
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMB_DIM),
-    FieldSchema(name="treatments", dtype=DataType.VARCHAR, max_length=5000),
-]
-schema = CollectionSchema(fields, description="Disease → Treatments mapping")
+def main():
+    with open(INPUT_JSON, "r") as f:
+        data = json.load(f)
 
-collection = Collection(name=COLLECTION_NAME, schema=schema)
+    hashes = {d["disease_id"]: content_hash(d["name"], d["treatments"]) for d in data}
+    # "treatments": storage format of the treatments field; a change rebuilds every row
+    fingerprint = {"model": MODEL_NAME, "backend": TREATMENT_VECTOR_BACKEND, "treatments": "json"}
 
-# --------------------------
-# Load dataset (your JSON file)
-# --------------------------
-with open("../../data-files/disease-treatement/disease2treatements.json", "r") as f:
-    data = json.load(f)
+    if TREATMENT_VECTOR_BACKEND != "local":
+        connections.connect(alias="default", host="127.0.0.1", port="19530")
 
-# --------------------------
-# Build embeddings (only disease name)
-# --------------------------
-names = [d["name"] for d in data]
-embeddings = model.encode(names, normalize_embeddings=True)
+    manifest = IngestManifest.load(COLLECTION_NAME)
+    plan = plan_ingest(manifest, fingerprint, hashes)
+    print(f"[{COLLECTION_NAME}] {plan}")
+    # the local store has no index; Milvus needs a new shadow collection for new index params
+    index_params = None if TREATMENT_VECTOR_BACKEND == "local" else TREATMENT_INDEX_PARAMS
+    reindex = manifest.version > 0 and manifest.index_params != index_params
+    if not plan.full_rebuild and not plan.changed and not plan.removed:
+        if not reindex:
+            print("✅ Nothing to do, corpus unchanged.")
+            return
+        print(f"Corpus unchanged; rebuilding with index {index_params}")
 
-# --------------------------
-# Insert into Milvus
-# --------------------------
-entities = [
-    [d["disease_id"] for d in data],
-    names,
-    embeddings.tolist(),
-    [", ".join(d["treatments"]) for d in data],
-]
+    version = manifest.version + 1
+    previous = None if plan.full_rebuild else open_previous(manifest)
+    if previous is None and plan.unchanged:
+        # nothing to copy from (e.g. store deleted by hand): re-embed everything
+        plan.changed |= plan.unchanged
+        plan.unchanged = set()
+
+    if TREATMENT_VECTOR_BACKEND == "local":
+        physical = COLLECTION_NAME
+        collection = LocalVectorStoreWriter(local_store_path(COLLECTION_NAME), EMB_DIM, INSERT_FIELDS)
+    else:
+        physical = shadow_collection_name(COLLECTION_NAME, version)
+        collection = create_milvus_collection(physical)
+
+    # --------------------------
+    # Copy unchanged rows (no re-embedding)
+    # --------------------------
+    copied = copy_disease_rows(previous, collection, INSERT_FIELDS, plan.unchanged) if plan.unchanged else 0
+
+    # --------------------------
+    # Build embeddings (only disease name) for changed/new diseases
+    # --------------------------
+    todo = [d for d in data if d["disease_id"] in plan.changed]
+    if todo:
+        if USE_EMBEDDING_STORE:
+            model = StoreBackedEmbedder(lambda: SentenceTransformer(MODEL_NAME), MODEL_NAME,
+                                        EmbeddingStore(EMBEDDING_STORE_PATH))
+        else:
+            model = SentenceTransformer(MODEL_NAME)
+        names = [d["name"] for d in todo]
+        embeddings = model.encode(names, normalize_embeddings=True)
+
+        # --------------------------
+        # Insert into Milvus (or the local store)
+        # --------------------------
+        entities = [
+            [d["disease_id"] for d in todo],
+            names,
+            embeddings.tolist(),
+            [json.dumps(d["treatments"]) for d in todo],
+        ]
+        collection.insert(entities)
+    collection.flush()
+
+    # --------------------------
+    # Publish: move the store into place (local) / save the manifest the retriever
+    # follows, then swap the serving alias (Milvus)
+    # --------------------------
+    if TREATMENT_VECTOR_BACKEND == "local":
+        previous = None  # release the memory map before the old store is replaced
+        collection.close()
+    else:
+        # same index type/params the retriever searches with (utils/constants.py); a
+        # tuned IVF index is sized (nlist) to the rows actually inserted
+        collection.create_index(field_name="embedding", index_params=resolve_nlist(index_params, copied + len(todo)))
+        collection.load()
 
-collection.insert(entities)
-collection.flush()
+    IngestManifest(COLLECTION_NAME, version, physical, fingerprint, hashes, index_params).save()
+    if TREATMENT_VECTOR_BACKEND != "local":
+        # the previous collection stays for servers that have not seen the new manifest yet
+        swap_alias(COLLECTION_NAME, physical, manifest.physical_collection, drop_old=False)
+        prune_shadow_collections(COLLECTION_NAME, keep=(version, manifest.version))
+    print(f"✅ {COLLECTION_NAME} v{version}: embedded {len(todo)}, copied {copied}, "
+          f"removed {len(plan.removed)} diseases ({TREATMENT_VECTOR_BACKEND})")
 
-print(f"✅ Inserted {len(data)} diseases into Milvus")
+if __name__ == "__main__":
+    main()
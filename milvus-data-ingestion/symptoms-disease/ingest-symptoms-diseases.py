@@ -1,4 +1,3 @@
-
 """
 Ingest a JSONL disease KB where each line is a disease dict with fields:
   - disease_id
@@ -11,13 +10,51 @@ This script:
  - encodes each chunk to embeddings (batching)
  - normalizes embeddings (L2) so IP ~ cosine
  - inserts rows into Milvus, where each row = one chunk
+
+The work runs as a pipeline of three overlapping stages connected by bounded queues:
+  chunk  (multiprocessing pool, one tokenizer per worker)
+    -> encode (large batches, normalize_embeddings=True)
+    -> insert (no per-batch flush; one flush at the end)
+Each stage reports its rows/s when the run finishes.
+
+Re-ingestion is incremental (see utils/ingest_utils.py): only diseases whose
+content hash changed are re-chunked and re-embedded; rows of unchanged diseases
+are copied into a shadow collection, removed diseases are dropped, and once it
+is built the manifest naming it is saved and the `disease_kb_chunks` alias is
+swapped to it. The previous shadow collection is kept for servers still on the
+previous manifest; older ones are dropped.
+
+Every inserted chunk (copied or re-embedded) is also pooled into a per-disease
+centroid; the centroids are written to a small `disease_centroids` collection
+(or local store) that the retriever's coarse-to-fine mode searches first.
+The HPO term index used by hybrid search (rag/hpo_index.py) is rebuilt from the
+same JSONL on every run.
+
+Every inserted chunk's text is also written to a local memory-mapped chunk text
+store (utils/chunk_text_store.py), one directory per ingest version. The
+retriever searches the collection the manifest names and reads the texts of
+the same manifest version, so it can search for ids only and fetch just the
+winning texts.
+
+`--compression` (default SYMPTOMS_VECTOR_COMPRESSION) picks a compressed
+vector representation (utils/vector_compression.py): int8 or pq builds a
+Milvus IVF_SQ8 / IVF_PQ index; on the local backend int8 or binary writes
+compressed codes next to the float matrix. The retriever re-scores the
+compressed first pass with the float vectors. Changing it rebuilds the
+collection from the previous one without re-embedding.
 """
 
+import argparse
 import json
-import math
+import multiprocessing as mp
 import os
+import queue
+import sys
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
 
 import numpy as np
 from pymilvus import (
@@ -29,12 +66,35 @@ from pymilvus import (
     utility,
 )
 from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for utils/
+from utils.centroids import CentroidAccumulator, CentroidTrackingSink
+from utils.chunk_text_store import ChunkTextStoreWriter, ChunkTextTrackingSink, prune_versions, version_dir
+from utils.chunking import chunk_record, init_worker, record_text
+from rag.hpo_index import HpoPhenotypeIndex
+from utils.config import REPO_ROOT, CHUNK_TEXT_STORE_DIR, EMBEDDING_STORE_PATH, HPO_INDEX_PATH, HPO_TERMS_JSON, HPO_OBO, HPO_ONTOLOGY_DIR
+from utils.hpo_ontology import load_hpo_terms
+from utils.embedding_store import EmbeddingStore, StoreBackedEmbedder
+from utils.constants import (SYMPTOMS_VECTOR_BACKEND, SYMPTOMS_CENTROID_POOLING, SYMPTOMS_INDEX_PARAMS,
+                             SYMPTOMS_VECTOR_COMPRESSION)
+from utils.ingest_utils import (
+    IngestManifest,
+    content_hash,
+    copy_disease_rows,
+    plan_ingest,
+    prune_shadow_collections,
+    shadow_collection_name,
+    swap_alias,
+)
+from utils.milvus_utils import local_store_path
+from utils.vector_compression import COMPRESSION_MODES, check_mode, milvus_index_params
+from utils.vector_store import LocalVectorStore, LocalVectorStoreWriter
 
 # CONFIG
 MILVUS_HOST = "127.0.0.1"
 MILVUS_PORT = "19530"
 COLLECTION_NAME = "disease_kb_chunks"
+CENTROID_COLLECTION_NAME = "disease_centroids"
 
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"   # 384 dim
 TOKENIZER_NAME = EMBEDDING_MODEL
@@ -43,146 +103,356 @@ DIM = 384
 # chunking params (tokens)
 MAX_TOKENS = 256        # tokens per chunk (safe for CPU)
 OVERLAP_TOKENS = 48     # overlap between consecutive chunks
-BATCH_SIZE = 256        # number of chunks to encode/insert per batch
 CHUNK_TEXT_MAX_LENGTH = 65535  # VARCHAR max_length in Milvus (set large)
 
-INPUT_JSONL = "../../data-files/symptoms-disease/symptoms2disease.jsonl"   # file you showed
-assert Path(INPUT_JSONL).exists(), f"Put your JSONL at: {INPUT_JSONL}"
-
-# Connect
-connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
-
-# Schema: chunk_id (auto primary), embedding, disease_id, disease_name, chunk_index, chunk_text
-fields = [
-    FieldSchema(name="chunk_id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-    FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
-    FieldSchema(name="disease_id", dtype=DataType.VARCHAR, max_length=128),
-    FieldSchema(name="disease_name", dtype=DataType.VARCHAR, max_length=512),
-    FieldSchema(name="chunk_index", dtype=DataType.INT64),
-    FieldSchema(name="chunk_text", dtype=DataType.VARCHAR, max_length=CHUNK_TEXT_MAX_LENGTH),
-]
-schema = CollectionSchema(fields, description="Chunked disease KB")
-# Drop and recreate
-if utility.has_collection(COLLECTION_NAME):
-    print("Dropping existing collection...")
-    utility.drop_collection(COLLECTION_NAME)
-
-collection = Collection(COLLECTION_NAME, schema)
-print("Created collection:", COLLECTION_NAME)
-
-# Models
-tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME, use_fast=True)
-embedder = SentenceTransformer(EMBEDDING_MODEL)
-
-def token_chunker(text: str, max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS):
+# pipeline params
+CHUNK_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # tokenizer processes
+CHUNK_POOL_CHUNKSIZE = 64   # JSONL lines handed to a worker at a time
+ENCODE_BATCH_SIZE = 1024    # chunks per encode call / insert call
+ENCODE_MICRO_BATCH = 128    # forward-pass batch size inside one encode call
+QUEUE_DEPTH = 4             # batches buffered between stages
+USE_EMBEDDING_STORE = True  # reuse chunk embeddings from earlier runs (keyed by model + chunk text hash)
+
+INPUT_JSONL = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "symptoms2disease.jsonl")
+
+INSERT_FIELDS = ["embedding", "disease_id", "disease_name", "chunk_index", "chunk_text"]
+CENTROID_FIELDS = ["embedding", "disease_id", "disease_name", "n_chunks"]
+# one vector per disease (thousands of rows), so exact FLAT search is cheap
+CENTROID_INDEX_PARAMS = {"metric_type": "IP", "index_type": "FLAT", "params": {}}
+
+def create_milvus_collection(name: str) -> Collection:
+    # Schema: chunk_id (auto primary), embedding, disease_id, disease_name, chunk_index, chunk_text
+    fields = [
+        FieldSchema(name="chunk_id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
+        FieldSchema(name="disease_id", dtype=DataType.VARCHAR, max_length=128),
+        FieldSchema(name="disease_name", dtype=DataType.VARCHAR, max_length=512),
+        FieldSchema(name="chunk_index", dtype=DataType.INT64),
+        FieldSchema(name="chunk_text", dtype=DataType.VARCHAR, max_length=CHUNK_TEXT_MAX_LENGTH),
+    ]
+    schema = CollectionSchema(fields, description="Chunked disease KB")
+    # a leftover shadow from an interrupted run is never served, so it is safe to drop
+    if utility.has_collection(name):
+        print("Dropping stale shadow collection...")
+        utility.drop_collection(name)
+
+    collection = Collection(name, schema)
+    print("Created collection:", name)
+    return collection
+
+def create_centroid_collection(name: str) -> Collection:
+    # Schema (in CENTROID_FIELDS order): embedding (pooled chunk embeddings), disease_id (primary), disease_name, n_chunks
+    fields = [
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=DIM),
+        FieldSchema(name="disease_id", dtype=DataType.VARCHAR, max_length=128, is_primary=True),
+        FieldSchema(name="disease_name", dtype=DataType.VARCHAR, max_length=512),
+        FieldSchema(name="n_chunks", dtype=DataType.INT64),
+    ]
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    return Collection(name, CollectionSchema(fields, description="Disease centroids of chunk embeddings"))
+
+def write_centroids(acc: CentroidAccumulator, version: int, old_version: int):
+    """Write one pooled vector per disease and point the centroid alias (or local store) at it."""
+    ids, names, centroids, counts = acc.finalize()
+    columns = [centroids.tolist(), ids, names, counts.tolist()]
+    if SYMPTOMS_VECTOR_BACKEND == "local":
+        writer = LocalVectorStoreWriter(local_store_path(CENTROID_COLLECTION_NAME), DIM, CENTROID_FIELDS)
+        writer.insert(columns)
+        writer.close()
+    else:
+        physical = shadow_collection_name(CENTROID_COLLECTION_NAME, version)
+        collection = create_centroid_collection(physical)
+        for i in range(0, len(ids), ENCODE_BATCH_SIZE):
+            collection.insert([col[i: i + ENCODE_BATCH_SIZE] for col in columns])
+        collection.flush()
+        collection.create_index(field_name="embedding", index_params=CENTROID_INDEX_PARAMS)
+        collection.load()
+        old = shadow_collection_name(CENTROID_COLLECTION_NAME, old_version) if old_version else None
+        # first run with centroids on an existing deployment: there is no previous alias target
+        swap_alias(CENTROID_COLLECTION_NAME, physical, old if old and utility.has_collection(old) else None)
+    print(f"Wrote {len(ids)} disease centroids ({SYMPTOMS_CENTROID_POOLING} pooling) to {CENTROID_COLLECTION_NAME}")
+
+def open_previous(manifest: IngestManifest):
+    """Currently served collection/store to copy unchanged rows from (None on first run)."""
+    if manifest.version == 0:
+        return None
+    if SYMPTOMS_VECTOR_BACKEND == "local":
+        path = local_store_path(COLLECTION_NAME)
+        return LocalVectorStore(path) if os.path.exists(path) else None
+    previous = Collection(manifest.physical_collection)
+    previous.load()
+    return previous
+
+# --------------------------
+# Pipeline
+# --------------------------
+_DONE = object()  # end-of-stream marker passed down the queues
+
+class StageStats:
+    """Rows processed and busy time (excluding waits on the queues) of one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.busy = 0.0
+
+    def add(self, rows: int, seconds: float):
+        self.rows += rows
+        self.busy += seconds
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.busy if self.busy > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.name:<7} {self.rows:>8} rows  busy {self.busy:7.1f}s  {self.rows_per_s:9.0f} rows/s"
+
+def _put(q: "queue.Queue", item, stop: threading.Event):
+    # bounded put that gives up once another stage has failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def _chunk_stage(lines: Iterable[str], out_q, stats: StageStats, workers: int, stop: threading.Event):
+    work = partial(chunk_record, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, max_chars=CHUNK_TEXT_MAX_LENGTH)
+    batch: List[Tuple[str, str, int, str]] = []
+    with mp.Pool(workers, initializer=init_worker, initargs=(TOKENIZER_NAME,)) as pool:
+        t0 = time.perf_counter()
+        for rows in pool.imap(work, lines, chunksize=CHUNK_POOL_CHUNKSIZE):
+            if stop.is_set():
+                return
+            batch.extend(rows)
+            if len(batch) >= ENCODE_BATCH_SIZE:
+                stats.add(len(batch), time.perf_counter() - t0)
+                _put(out_q, batch, stop)
+                batch = []
+                t0 = time.perf_counter()
+        if batch:
+            stats.add(len(batch), time.perf_counter() - t0)
+            _put(out_q, batch, stop)
+
+def _encode_stage(embedder, in_q, out_q, stats: StageStats, stop: threading.Event):
+    while not stop.is_set():
+        batch = in_q.get()
+        if batch is _DONE:
+            return
+        t0 = time.perf_counter()
+        vecs = embedder.encode(
+            [row[3] for row in batch],
+            batch_size=ENCODE_MICRO_BATCH,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+        stats.add(len(batch), time.perf_counter() - t0)
+        _put(out_q, (vecs, batch), stop)
+
+def _run_stage(target, out_q, errors: list, stop: threading.Event, *args):
+    try:
+        target(*args)
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        # always unblock the next stage, even after a failure
+        try:
+            out_q.put(_DONE, timeout=5)
+        except queue.Full:
+            pass
+
+def run_pipeline(lines: Iterable[str], sink, embedder, workers: int = CHUNK_WORKERS) -> Dict[str, StageStats]:
     """
-    Token-based sliding window chunker.
-    Yields (chunk_text, chunk_index).
+    Chunk, encode and insert every JSONL record in `lines` into `sink`
+    (anything with a Milvus-style insert(columns) method). Returns per-stage stats.
     """
-    if not text:
-        return
-    token_ids = tokenizer.encode(text, add_special_tokens=False)
-    if len(token_ids) == 0:
-        return
-
-    stride = max_tokens - overlap
-    # if text shorter than a chunk, yield it once
-    if len(token_ids) <= max_tokens:
-        chunk_text = tokenizer.decode(token_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True)
-        yield chunk_text, 0
-        return
-
-    idx = 0
-    chunk_idx = 0
-    while idx < len(token_ids):
-        window = token_ids[idx: idx + max_tokens]
-        chunk_text = tokenizer.decode(window, skip_special_tokens=True, clean_up_tokenization_spaces=True)
-        yield chunk_text, chunk_idx
-        chunk_idx += 1
-        idx += stride
-
-def norm_np(v: np.ndarray):
-    norm = np.linalg.norm(v)
-    if norm == 0:
-        return v
-    return v / norm
-
-# Ingest
-def ingest(jsonl_path: str):
-    embeddings_batch = []
-    disease_ids_batch = []
-    disease_names_batch = []
-    chunk_indices_batch = []
-    chunk_texts_batch = []
-    total_chunks = 0
-
-    def flush_batch():
-        nonlocal embeddings_batch, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch, total_chunks
-        if not embeddings_batch:
+    chunks_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    vectors_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    stats = {name: StageStats(name) for name in ("chunk", "encode", "insert")}
+    errors: list = []
+    stop = threading.Event()
+
+    threads = [
+        threading.Thread(target=_run_stage, daemon=True,
+                         args=(_chunk_stage, chunks_q, errors, stop, lines, chunks_q, stats["chunk"], workers, stop)),
+        threading.Thread(target=_run_stage, daemon=True,
+                         args=(_encode_stage, vectors_q, errors, stop, embedder, chunks_q, vectors_q, stats["encode"], stop)),
+    ]
+    for t in threads:
+        t.start()
+
+    # insert stage runs on the calling thread
+    try:
+        while True:
+            item = vectors_q.get()
+            if item is _DONE:
+                break
+            vecs, rows = item
+            t0 = time.perf_counter()
+            sink.insert([
+                vecs.tolist(),
+                [r[0] for r in rows],
+                [r[1] for r in rows],
+                [r[2] for r in rows],
+                [r[3] for r in rows],
+            ])
+            stats["insert"].add(len(rows), time.perf_counter() - t0)
+            print(f"Inserted batch of {len(rows)} chunks (total {stats['insert'].rows})")
+    except BaseException:
+        stop.set()
+        raise
+
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+# --------------------------
+# Incremental ingest
+# --------------------------
+def iter_jsonl(jsonl_paths: List[str]) -> Iterator[str]:
+    # the mapper can shard its output (map_diseases_symptoms.py --shards N); read shards in order
+    for path in jsonl_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from f
+
+def corpus_hashes(jsonl_paths: List[str]) -> Dict[str, str]:
+    """Content hash per disease over exactly what gets chunked and embedded."""
+    hashes = {}
+    for line in iter_jsonl(jsonl_paths):
+        obj = json.loads(line)
+        hashes[obj.get("disease_id", "UNKNOWN")] = content_hash(obj.get("name", "") or "", record_text(obj))
+    return hashes
+
+def iter_lines_for(jsonl_paths: List[str], disease_ids: Set[str]) -> Iterator[str]:
+    for line in iter_jsonl(jsonl_paths):
+        if json.loads(line).get("disease_id", "UNKNOWN") in disease_ids:
+            yield line
+
+def build_hpo_index(jsonl_paths: List[str]):
+    # cheap (no embeddings), so it is always rebuilt from the current corpus
+    index = HpoPhenotypeIndex.from_jsonl(jsonl_paths, load_hpo_terms(HPO_OBO, HPO_ONTOLOGY_DIR, HPO_TERMS_JSON))
+    index.save(HPO_INDEX_PATH)
+    print(f"HPO term index: {len(index)} diseases, {len(index.term_ids)} terms, "
+          f"{len(index.postings)} postings -> {HPO_INDEX_PATH}")
+
+def ingest(jsonl_paths, compression: str = SYMPTOMS_VECTOR_COMPRESSION):
+    """Ingest one JSONL file or a list of shards of one corpus."""
+    jsonl_paths = [jsonl_paths] if isinstance(jsonl_paths, str) else list(jsonl_paths)
+    for path in jsonl_paths:
+        assert Path(path).exists(), f"Put your JSONL at: {path}"
+    check_mode(compression, SYMPTOMS_VECTOR_BACKEND)
+    build_hpo_index(jsonl_paths)
+    hashes = corpus_hashes(jsonl_paths)
+    # anything that changes the vectors of *unchanged* text forces a full rebuild
+    fingerprint = {
+        "model": EMBEDDING_MODEL,
+        "max_tokens": MAX_TOKENS,
+        "overlap_tokens": OVERLAP_TOKENS,
+        "chunk_text_max_length": CHUNK_TEXT_MAX_LENGTH,
+        "backend": SYMPTOMS_VECTOR_BACKEND,
+        "centroid_pooling": SYMPTOMS_CENTROID_POOLING,
+    }
+
+    if SYMPTOMS_VECTOR_BACKEND != "local":
+        connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
+
+    manifest = IngestManifest.load(COLLECTION_NAME)
+    plan = plan_ingest(manifest, fingerprint, hashes)
+    print(f"[{COLLECTION_NAME}] {plan}")
+    # the local store has no index (only optional compressed codes); Milvus needs a new shadow
+    # collection for new index params, the local store a rewrite for a new compression mode
+    index_params = None if SYMPTOMS_VECTOR_BACKEND == "local" else milvus_index_params(compression, SYMPTOMS_INDEX_PARAMS)
+    reindex = manifest.version > 0 and (manifest.index_params != index_params or manifest.compression != compression)
+    text_store_root = os.path.join(CHUNK_TEXT_STORE_DIR, COLLECTION_NAME)
+    texts_missing = not os.path.exists(os.path.join(version_dir(text_store_root, manifest.version), "meta.json"))
+    if not plan.full_rebuild and not plan.changed and not plan.removed:
+        if not reindex and not texts_missing:
+            print("✅ Nothing to do, corpus unchanged.")
             return
-        # insert: since chunk_id is auto_id, we omit it from insert lists.
-        collection.insert([embeddings_batch, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch])
-        collection.flush()
-        total_chunks += len(embeddings_batch)
-        print(f"Inserted batch of {len(embeddings_batch)} chunks (total {total_chunks})")
-        embeddings_batch, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch = [], [], [], [], []
-
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            obj = json.loads(line)
-            disease_id = obj.get("disease_id", "UNKNOWN")
-            disease_name = obj.get("name", "") or ""
-            text = obj.get("text", "") or obj.get("description", "") or " ".join(obj.get("symptoms", []))
-
-            # create chunks
-            for chunk_text, chunk_index in token_chunker(text, MAX_TOKENS, OVERLAP_TOKENS):
-                # guard chunk_text length to Milvus varchar max
-                if len(chunk_text) > CHUNK_TEXT_MAX_LENGTH:
-                    chunk_text = chunk_text[:CHUNK_TEXT_MAX_LENGTH]
-
-                # encode & normalize (we'll batch encode below for efficiency)
-                embeddings_batch.append(chunk_text)    # temp store text; will encode a batch of texts
-                # store metadata parallel lists
-                disease_ids_batch.append(disease_id)
-                disease_names_batch.append(disease_name)
-                chunk_indices_batch.append(chunk_index)
-                chunk_texts_batch.append(chunk_text)
-
-                # if we reached batch size, encode the text-batch to vectors and replace strings with vectors
-                if len(embeddings_batch) >= BATCH_SIZE:
-                    # embeddings_batch currently holds chunk_texts -> encode and normalize
-                    texts_to_encode = embeddings_batch
-                    vecs = embedder.encode(texts_to_encode, convert_to_numpy=True, show_progress_bar=False)
-                    # normalize each vector inplace
-                    vecs = np.vstack([norm_np(v) for v in vecs]).astype(np.float32)
-                    # convert to python list lists (Milvus expects lists)
-                    vecs_list = vecs.tolist()
-
-                    # perform insert with vector lists
-                    collection.insert([vecs_list, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch])
-                    collection.flush()
-                    total_chunks += len(vecs_list)
-                    print(f"Inserted batch of {len(vecs_list)} chunks (total {total_chunks})")
-
-                    # reset
-                    embeddings_batch, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch = [], [], [], [], []
-
-    # flush final small batch
-    if embeddings_batch:
-        texts_to_encode = embeddings_batch
-        vecs = embedder.encode(texts_to_encode, convert_to_numpy=True, show_progress_bar=False)
-        vecs = np.vstack([norm_np(v) for v in vecs]).astype(np.float32)
-        vecs_list = vecs.tolist()
-        collection.insert([vecs_list, disease_ids_batch, disease_names_batch, chunk_indices_batch, chunk_texts_batch])
-        collection.flush()
-        total_chunks += len(vecs_list)
-        print(f"Inserted final batch of {len(vecs_list)} chunks (total {total_chunks})")
+        if reindex:
+            print(f"Corpus unchanged; rebuilding with index {index_params}, {compression} compression")
+        else:
+            print("Corpus unchanged; rebuilding to write the chunk text store")
+
+    version = manifest.version + 1
+    previous = None if plan.full_rebuild else open_previous(manifest)
+    if previous is None and plan.unchanged:
+        # nothing to copy from (e.g. store deleted by hand): re-embed everything
+        plan.changed |= plan.unchanged
+        plan.unchanged = set()
+
+    # Target: Milvus shadow collection, or the local vector store (written to <path>.tmp, moved on close)
+    if SYMPTOMS_VECTOR_BACKEND == "local":
+        physical = COLLECTION_NAME
+        collection = LocalVectorStoreWriter(local_store_path(COLLECTION_NAME), DIM, INSERT_FIELDS, compression)
+        print(f"Writing local vector store ({compression} compression):", local_store_path(COLLECTION_NAME))
+    else:
+        physical = shadow_collection_name(COLLECTION_NAME, version)
+        collection = create_milvus_collection(physical)
+    # pools every row inserted below (copied or re-embedded) into its disease centroid
+    centroids = CentroidAccumulator(DIM, SYMPTOMS_CENTROID_POOLING)
+    # ... and writes its text to the chunk text store for this version
+    texts = ChunkTextStoreWriter(text_store_root, COLLECTION_NAME, version)
+    sink = ChunkTextTrackingSink(CentroidTrackingSink(collection, INSERT_FIELDS, centroids), INSERT_FIELDS, texts)
+
+    t0 = time.perf_counter()
+    copied = copy_disease_rows(previous, sink, INSERT_FIELDS, plan.unchanged) if plan.unchanged else 0
+    print(f"Copied {copied} chunks of {len(plan.unchanged)} unchanged diseases")
+
+    if USE_EMBEDDING_STORE:
+        embedder = StoreBackedEmbedder(lambda: SentenceTransformer(EMBEDDING_MODEL), EMBEDDING_MODEL,
+                                       EmbeddingStore(EMBEDDING_STORE_PATH))
+    else:
+        embedder = SentenceTransformer(EMBEDDING_MODEL)
+    stats = run_pipeline(iter_lines_for(jsonl_paths, plan.changed), sink, embedder)
+    if USE_EMBEDDING_STORE:
+        print("Embedding store:", embedder.stats())
+    # single flush for the whole run instead of one per batch
+    collection.flush()
+    total_chunks = copied + stats["insert"].rows
+    # a new v<version> directory; the retriever switches to it when the manifest below is saved
+    texts.close()
+    print(f"Wrote {len(texts)} chunk texts to {texts.path}")
+
+    if SYMPTOMS_VECTOR_BACKEND == "local":
+        # local store is exact search over the raw matrix (or its codes); no index to build
+        previous = None  # release the memory map before the old store is replaced
+        collection.close()
+    else:
+        # Create index and load collection for searching, then swap the serving alias to it
+        # same index type/params the retriever searches with (utils/constants.py); an
+        # IVF index (compressed or tuned) is sized (nlist) to the rows actually inserted
+        built_params = milvus_index_params(compression, SYMPTOMS_INDEX_PARAMS, total_chunks)
+        collection.create_index(field_name="embedding", index_params=built_params)
+        collection.load()
+    write_centroids(centroids, version, manifest.version)
+
+    # publish: the retriever searches the collection this manifest names and reads
+    # the chunk texts of its version, so both switch over together
+    IngestManifest(COLLECTION_NAME, version, physical, fingerprint, hashes, index_params, compression).save()
+    if SYMPTOMS_VECTOR_BACKEND != "local":
+        swap_alias(COLLECTION_NAME, physical, manifest.physical_collection, drop_old=False)
+        prune_shadow_collections(COLLECTION_NAME, keep=(version, manifest.version))
+    # the previous version may still be open in a server that has not seen the new manifest yet
+    prune_versions(text_store_root, keep=(version, manifest.version))
 
-    # Create index and load collection for searching
-    index_params = {"metric_type": "IP", "index_type": "IVF_FLAT", "params": {"nlist": 1024}}
-    collection.create_index(field_name="embedding", index_params=index_params)
-    collection.load()
-    print("✅ Done ingesting. Total chunks:", total_chunks)
+    for st in stats.values():
+        print(st)
+    wall = time.perf_counter() - t0
+    print(f"total   {total_chunks:>8} rows  wall {wall:7.1f}s  {total_chunks / wall if wall else 0:9.0f} rows/s")
+    print(f"✅ Done ingesting {COLLECTION_NAME} v{version}. Total chunks: {total_chunks} "
+          f"(re-embedded {len(plan.changed)} diseases, removed {len(plan.removed)})")
 
 if __name__ == "__main__":
-    ingest(INPUT_JSONL)
+    parser = argparse.ArgumentParser(description="Ingest the symptoms/disease JSONL into disease_kb_chunks")
+    # optional args: shard files written by map_diseases_symptoms.py --shards N
+    parser.add_argument("paths", nargs="*", help=f"JSONL file or shards (default {INPUT_JSONL})")
+    parser.add_argument("--compression", choices=COMPRESSION_MODES, default=SYMPTOMS_VECTOR_COMPRESSION,
+                        help="compressed vector representation (int8/pq on Milvus, int8/binary locally)")
+    args = parser.parse_args()
+    ingest(args.paths or INPUT_JSONL, args.compression)
@@ -3,56 +3,140 @@ This script enriches disease data by mapping HPO (Human Phenotype Ontology) term
 
 - Input:
   1. phenotype.hpoa: A file containing disease-to-symptom mappings.
-  2. hpo_terms.json: A JSON file with HPO term details (names and definitions).
+  2. HPO term details (names and definitions): the compiled ontology from map_symptoms_explanations.py
+     (utils/hpo_ontology.py), or hpo_terms.json when it is not available.
 - Output:
-  disease_kb_mapped.jsonl: A JSONL file with enriched disease data, including expanded symptom descriptions.
+  symptoms2disease.jsonl: A JSONL file with enriched disease data, including expanded symptom descriptions
+  and the structured `hpo_ids` list (used to build the HPO term index, rag/hpo_index.py).
 
 Steps:
-1. Load HPO term details from the JSON file.
-2. Read and process the phenotype.hpoa file to group diseases and their associated symptoms.
-3. Map HPO IDs to their names and definitions, expanding symptom descriptions.
-4. Save the enriched disease data to a JSONL file.
+1. Load HPO term details once into a compact table of pre-rendered, pre-JSON-escaped
+   "name: definition" strings, so each term is formatted and escaped once, not per disease.
+2. Stream phenotype.hpoa in a single csv pass, grouping HPO ids per (disease_id, disease_name);
+   repeated HPO ids of a disease (one per reference/evidence line) are kept once, in first-seen order.
+3. Write one JSONL line per disease (sorted by disease_id, disease_name) through buffered writers,
+   optionally split into N shards by a stable hash of disease_id (--shards N).
 
 Usage:
-Run this script directly to process the input files and generate the output file.
+    python map_diseases_symptoms.py [--hpoa PATH] [--terms PATH] [--out PATH] [--shards N]
 """
 # 03_expand_diseases.py
+import argparse
+import csv
 import json
-import pandas as pd
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for utils/
+from utils.config import HPO_OBO, HPO_ONTOLOGY_DIR
+from utils.hpo_ontology import load_hpo_terms
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data-files" / "symptoms-disease"
+HPOA_FILE = str(DATA_DIR / "phenotype.hpoa")
+HPO_DICT_FILE = str(DATA_DIR / "hpo_terms.json")
+OUT_FILE = str(DATA_DIR / "symptoms2disease.jsonl")
+
+WRITE_BUFFER_BYTES = 1 << 20
+
+DiseaseKey = Tuple[str, str]  # (database_id, disease_name)
+
+
+def _escape(text: str) -> str:
+    # body of a JSON string literal, exactly as json.dumps writes it
+    return json.dumps(text)[1:-1]
+
+
+def load_term_table(path: str) -> Dict[str, str]:
+    """HPO id -> JSON-escaped expanded symptom string, rendered once instead of per annotation."""
+    terms = load_hpo_terms(HPO_OBO, HPO_ONTOLOGY_DIR, path)
+    return {hpo_id: _escape(f"{t['name']}: {t['definition']}") for hpo_id, t in terms.items()}
+
+
+def read_annotations(hpoa_path: str) -> Dict[DiseaseKey, Dict[str, None]]:
+    """Single pass over the HPOA TSV: (database_id, disease_name) -> ordered set of hpo_ids."""
+    groups: Dict[DiseaseKey, Dict[str, None]] = {}
+    with open(hpoa_path, "r", encoding="utf-8", newline="") as f:
+        lines = (line for line in f if not line.startswith("#"))
+        reader = csv.reader(lines, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = next(reader)
+        di, ni, hi = header.index("database_id"), header.index("disease_name"), header.index("hpo_id")
+        width = max(di, ni, hi)
+        for row in reader:
+            if len(row) <= width:
+                continue
+            groups.setdefault((row[di], row[ni]), {})[row[hi]] = None
+    return groups
+
+
+def shard_of(disease_id: str, shards: int) -> int:
+    # stable across runs, so a disease always lands in the same shard
+    return zlib.crc32(disease_id.encode("utf-8")) % shards
+
+
+def shard_paths(out_path: str, shards: int) -> List[str]:
+    if shards == 1:
+        return [out_path]
+    base, ext = os.path.splitext(out_path)
+    return [f"{base}.part-{i:03d}-of-{shards:03d}{ext}" for i in range(shards)]
+
+
+def _string_list(escaped: List[str]) -> str:
+    return "[" + ", ".join('"' + e + '"' for e in escaped) + "]"
+
+
+def make_line(disease_id: str, name: str, hpo_ids: List[str], term_table: Dict[str, str]) -> str:
+    """
+    One JSONL line, byte-identical to json.dumps of
+    {"disease_id", "name", "hpo_ids", "symptoms", "text"}; JSON escaping is per
+    character, so the pre-escaped term strings can be joined as they are.
+    """
+    ids = [_escape(h) for h in hpo_ids]
+    symptoms = [term_table.get(h) or e for h, e in zip(hpo_ids, ids)]
+    text = _escape(f"{name} is associated with symptoms: ") + ", ".join(symptoms)
+    return (
+        '{"disease_id": ' + json.dumps(disease_id) + ', "name": ' + json.dumps(name)
+        + ', "hpo_ids": ' + _string_list(ids) + ', "symptoms": ' + _string_list(symptoms)
+        + ', "text": "' + text + '"}\n'
+    )
+
+
+def write_jsonl(groups: Dict[DiseaseKey, Dict[str, None]], term_table: Dict[str, str],
+                out_path: str, shards: int = 1) -> int:
+    paths = shard_paths(out_path, shards)
+    files = [open(p, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) for p in paths]
+    try:
+        for disease_id, name in sorted(groups):
+            line = make_line(disease_id, name, list(groups[(disease_id, name)]), term_table)
+            files[shard_of(disease_id, shards)].write(line)
+    finally:
+        for f in files:
+            f.close()
+    return len(groups)
+
+
+def map_diseases(hpoa_path: str, terms_path: str, out_path: str, shards: int = 1) -> int:
+    term_table = load_term_table(terms_path)
+    groups = read_annotations(hpoa_path)
+    return write_jsonl(groups, term_table, out_path, shards)
 
-HPOA_FILE = "../../data-files/symptoms-disease/phenotype.hpoa"
-HPO_DICT_FILE = "../../data-files/symptoms-disease/hpo_terms.json"
-OUT_FILE = "../../data-files/symptoms-disease/symptoms2disease.jsonl"
 
 def main():
-    with open(HPO_DICT_FILE, "r", encoding="utf-8") as f:
-        hpo_terms = json.load(f)
-
-    df = pd.read_csv(HPOA_FILE, sep="\t", comment="#", dtype=str).fillna("")
-
-    grouped = df.groupby(["database_id", "disease_name"])["hpo_id"].apply(list).reset_index()
-
-    count = 0
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
-        for _, row in grouped.iterrows():
-            symptoms_expanded = []
-            for hpo_id in row["hpo_id"]:
-                if hpo_id in hpo_terms:
-                    term = hpo_terms[hpo_id]
-                    symptoms_expanded.append(f"{term['name']}: {term['definition']}")
-                else:
-                    symptoms_expanded.append(hpo_id)
-
-            entry = {
-                "disease_id": row["database_id"],
-                "name": row["disease_name"],
-                "symptoms": symptoms_expanded,
-                "text": f"{row['disease_name']} is associated with symptoms: {', '.join(symptoms_expanded)}"
-            }
-            f.write(json.dumps(entry) + "\n")
-            count += 1
-
-    print(f"✅ Saved {count} enriched diseases to {OUT_FILE}")
+    parser = argparse.ArgumentParser(description="Map phenotype.hpoa annotations to a disease JSONL.")
+    parser.add_argument("--hpoa", default=HPOA_FILE)
+    parser.add_argument("--terms", default=HPO_DICT_FILE)
+    parser.add_argument("--out", default=OUT_FILE)
+    parser.add_argument("--shards", type=int, default=1, help="split the output into N files by disease_id")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    count = map_diseases(args.hpoa, args.terms, args.out, args.shards)
+    where = args.out if args.shards == 1 else f"{args.shards} shards of {args.out}"
+    print(f"✅ Saved {count} enriched diseases to {where} in {time.perf_counter() - t0:.1f}s")
+
 
 if __name__ == "__main__":
     main()
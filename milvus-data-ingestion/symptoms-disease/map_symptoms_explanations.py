@@ -2,36 +2,40 @@
 This script processes the Human Phenotype Ontology (HPO) file to extract terms and their details, saving them in a JSON file.
 
 - Input: hp.obo file (ontology file containing HPO terms and definitions).
-- Output: hpo_terms.json file with HPO term IDs, names, and definitions.
+- Output:
+  1. hpo-ontology/: the compiled, memory-mappable ontology (utils/hpo_ontology.py) that
+     downstream steps and the API read directly.
+  2. hpo_terms.json file with HPO term IDs, names, definitions and synonyms (compact JSON,
+     kept for tools that want plain JSON).
 
 Steps:
-1. Load the HPO ontology file using the `pronto` library.
-2. Extract terms starting with "HP:", along with their names and definitions.
-3. Save the extracted data to a JSON file in a structured format.
+1. Compile hp.obo into the binary ontology; this is skipped when the .obo checksum is unchanged.
+2. Write every "HP:" term with its name, definition and synonyms to a JSON file.
 
 Usage:
-Run this script directly to process the input file and generate the output file.
+Run this script directly to process the input file and generate the output files.
 """
 
-import pronto
 import json
+import sys
+import time
+from pathlib import Path
 
-ONTO_PATH = "../../data-files/symptoms-disease/hp.obo"
-OUT_JSON = "../../data-files/symptoms-disease/hpo_terms.json"
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for utils/
+from utils.config import HPO_OBO, HPO_ONTOLOGY_DIR, HPO_TERMS_JSON
+from utils.hpo_ontology import HpoOntology
 
-def main():
-    ontology = pronto.Ontology(ONTO_PATH)
-    hpo_dict = {}
+ONTO_PATH = HPO_OBO
+OUT_JSON = HPO_TERMS_JSON
 
-    for term in ontology.terms():
-        if term.id.startswith("HP:"):
-            hpo_dict[term.id] = {
-                "name": term.name,
-                "definition": term.definition
-            }
+def main():
+    t0 = time.perf_counter()
+    ontology = HpoOntology.open(ONTO_PATH, HPO_ONTOLOGY_DIR)
+    print(f"Compiled ontology: {len(ontology)} terms in {HPO_ONTOLOGY_DIR} ({time.perf_counter() - t0:.2f}s)")
 
+    hpo_dict = ontology.term_dict()
     with open(OUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(hpo_dict, f, indent=2)
+        json.dump(hpo_dict, f, separators=(",", ":"))
     print(f"Saved {len(hpo_dict)} HPO terms to {OUT_JSON}")
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""
+Columnar aggregation of chunk hits into ranked diseases.
+
+Hits are flattened once into NumPy arrays (score, disease group), grouped by
+factorizing disease ids + a stable np.lexsort, and reduced per disease with
+segmented reductions (bincount / reduceat) instead of per-disease Python lists.
+
+Aggregators (score of one disease from its chunk scores):
+  - mean_top_k:     mean of its k best chunk scores (the original behaviour)
+  - max:            best chunk score
+  - softmax_sum:    temperature-scaled log-sum-exp of all its chunk scores
+  - count_weighted: mean_top_k * log1p(hits) / log1p(k), rewarding diseases
+                    that match many chunks
+Ties are broken by first appearance in the hit list, as before.
+
+reciprocal_rank_fusion merges disease rankings from different retrievers
+(vector chunks, HPO term matches) by rank alone, so their scores need not be
+comparable.
+
+Chunk texts are read from the hit entities, or, when the search skipped
+`chunk_text`, looked up in one fetch_texts call for just the winning chunks.
+
+merge_hits combines the chunk hits of several query vectors (a query and its
+ontology expansions) into one hit list before aggregation.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.vector_store import LocalHit
+
+
+class GroupedHits:
+    """Hit scores sorted by (disease group, score desc), with segment boundaries."""
+
+    def __init__(self, scores: np.ndarray, groups: np.ndarray, n_groups: int):
+        self.order = np.lexsort((-scores, groups))  # stable: equal scores keep hit order
+        self.scores = scores[self.order]
+        self.groups = groups[self.order]
+        self.counts = np.bincount(groups, minlength=n_groups)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        # rank of each sorted hit inside its disease (0 = best chunk)
+        self.rank = np.arange(len(self.scores)) - np.repeat(self.starts, self.counts)
+
+
+def _mean_top_k(g: GroupedHits, k: int, temperature: float) -> np.ndarray:
+    mask = g.rank < k
+    sums = np.bincount(g.groups[mask], weights=g.scores[mask], minlength=len(g.counts))
+    return sums / np.minimum(g.counts, k)
+
+
+def _max(g: GroupedHits, k: int, temperature: float) -> np.ndarray:
+    return g.scores[g.starts]
+
+
+def _softmax_sum(g: GroupedHits, k: int, temperature: float) -> np.ndarray:
+    shift = g.scores.max()
+    sums = np.add.reduceat(np.exp((g.scores - shift) / temperature), g.starts)
+    return shift + temperature * np.log(sums)
+
+
+def _count_weighted(g: GroupedHits, k: int, temperature: float) -> np.ndarray:
+    return _mean_top_k(g, k, temperature) * np.log1p(g.counts) / np.log1p(k)
+
+
+AGGREGATORS: Dict[str, Callable[[GroupedHits, int, float], np.ndarray]] = {
+    "mean_top_k": _mean_top_k,
+    "max": _max,
+    "softmax_sum": _softmax_sum,
+    "count_weighted": _count_weighted,
+}
+
+
+def aggregate_hits(hits, top_n: int, top_m: int, aggregator: str = "mean_top_k",
+                   k: int = 5, temperature: float = 0.05,
+                   fetch_texts: Optional[Callable[[list], List[str]]] = None) -> List[Dict]:
+    """
+    Rank diseases from chunk hits (pymilvus or LocalHit objects) and return the
+    top_n with their top_m chunks, in query_and_aggregate's output format.
+    fetch_texts(entities) -> texts replaces reading "chunk_text" from the entities.
+    """
+    try:
+        agg_fn = AGGREGATORS[aggregator]
+    except KeyError:
+        raise ValueError(f"Unknown aggregator {aggregator!r}; choose from {sorted(AGGREGATORS)}")
+
+    n = len(hits)
+    if n == 0:
+        return []
+
+    entities = [hit.entity for hit in hits]
+    scores = np.fromiter((hit.distance for hit in hits), dtype=np.float64, count=n)
+    # factorize disease ids in first-seen order (cheaper than np.unique on strings),
+    # so group number doubles as the first-appearance tie-breaker
+    group_of: Dict[str, int] = {}
+    groups = np.fromiter((group_of.setdefault(e.get("disease_id"), len(group_of)) for e in entities),
+                         dtype=np.int64, count=n)
+    uniq = list(group_of)
+
+    g = GroupedHits(scores, groups, len(uniq))
+    agg_scores = agg_fn(g, k, temperature)
+    ranking = np.lexsort((np.arange(len(uniq)), -agg_scores))[:top_n]
+
+    tops = [g.order[g.starts[gi]: g.starts[gi] + min(int(g.counts[gi]), top_m)] for gi in ranking]
+    winners = [int(i) for top in tops for i in top]
+    if fetch_texts is None:
+        texts = [entities[i].get("chunk_text") for i in winners]
+    else:
+        texts = fetch_texts([entities[i] for i in winners])
+    text_of = dict(zip(winners, texts))
+
+    results_out = []
+    for gi, top in zip(ranking, tops):
+        chunks = [
+            {"score": float(scores[i]), "chunk_index": int(entities[i].get("chunk_index")),
+             "text": text_of[int(i)]}
+            for i in top
+        ]
+        results_out.append({
+            "disease_id": uniq[gi],
+            "name": entities[top[0]].get("disease_name"),
+            "score": float(agg_scores[gi]),
+            "context": "\n---\n".join(c["text"] for c in chunks),
+            "top_chunks": chunks,
+        })
+    return results_out
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum over rankings of 1 / (k + rank), rank from 1.
+    Returns (id, score) best first; ties keep first appearance across the rankings.
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def merge_hits(hit_lists: Sequence[Sequence], weights: Sequence[float], limit: int) -> List[LocalHit]:
+    """
+    Union of several hit lists, scaling each list's scores by its weight; a chunk
+    found by several lists keeps its best weighted score. Best `limit` first.
+    """
+    best: Dict[object, LocalHit] = {}
+    for hits, w in zip(hit_lists, weights):
+        for hit in hits:
+            score = hit.distance * w
+            cur = best.get(hit.id)
+            if cur is None or score > cur.distance:
+                best[hit.id] = LocalHit(hit.id, score, hit.entity)
+    return sorted(best.values(), key=lambda h: h.distance, reverse=True)[:limit]
@@ -1,73 +1,266 @@
 """
 Query Milvus for treatments given a disease name.
 Each disease is one row (no chunking needed).
+The vector store (Milvus or local, per TREATMENT_VECTOR_BACKEND) and the
+embedder are loaded lazily (see warm_up()).
+
+Exact disease names, aliases and IDs are answered from an in-memory index
+(rag/disease_alias_index.py) first; vector search is the fallback for fuzzy input.
+Each query is resolved against the index once: a match is either the answer
+(top_k=1) or, by its canonical name, the text that is searched.
+Repeated fuzzy queries are answered from a response cache keyed on the
+normalized query text (utils/response_cache.py), dropped whenever the
+ingestion script publishes a new collection version. The key is exact, not an
+embedding match: "... type 1" and "... type 2" embed almost identically but
+are different diseases.
+
+treatments_for_diseases() serves /diagnose: the symptom retriever's diseases
+are joined on disease_id, and only unmatched ones go through a batched search.
 """
 
-from typing import List, Dict
+import json
+import time
+from typing import List, Dict, Optional, Tuple
 import numpy as np
-from pymilvus import Collection
-from utils.config import MILVUS_HOST, MILVUS_PORT, DIM
+from utils.config import DIM, TREATMENTS_JSON, DISEASE_ALIASES_JSON
 from utils.vector_utils import norm_vec
-from utils.milvus_utils import connect_to_milvus, get_or_create_collection
+from utils.milvus_utils import open_vector_store
 from utils.embedding_utils import load_embedder
-from utils.constants import TREATMENT_EMBEDDING_MODEL, TREATMENT_TOP_K
+from utils.async_utils import aload, run_encode, run_search
+from utils.ingest_utils import ManifestVersion
+from utils.response_cache import ExactResponseCache
+from utils.lazy import LazyResource
+from utils.metrics import GAUGES, SEARCH_HITS, timed
+from utils.constants import TREATMENT_EMBEDDING_MODEL, TREATMENT_TOP_K, TREATMENT_VECTOR_BACKEND, TREATMENT_EXACT_MATCH
+from utils.constants import TREATMENT_INDEX_PARAMS, TREATMENT_SEARCH_PARAMS
+from utils.constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_VERSION_CHECK_SECONDS
+from rag.disease_alias_index import DiseaseAliasIndex, normalize_disease_name
 
 # --------------------
 # CONFIG
 # --------------------
 COLLECTION_NAME = "disease_treatments"
+VECTOR_BACKEND = TREATMENT_VECTOR_BACKEND   # "milvus" or "local"
 
 EMBEDDING_MODEL = TREATMENT_EMBEDDING_MODEL
 TOP_K = TREATMENT_TOP_K   # how many diseases to return
 
 # --------------------
-# Connect + Load
+# Connect + Load (lazy)
 # --------------------
-connect_to_milvus(MILVUS_HOST, MILVUS_PORT)
-
-# Load collection
-collection = get_or_create_collection(
-    collection_name="disease_treatments",
-    dim=DIM,
-    index_params={
-        "index_type": "HNSW",
-        "metric_type": "IP",
-        "params": {"M": 48, "efConstruction": 200}
-    }
-)
-
-# Load embedder
-embedder = load_embedder(EMBEDDING_MODEL)
+# same index as the ingestion script builds; tuned by benchmarks/tune_index.py
+INDEX_PARAMS = TREATMENT_INDEX_PARAMS
+SEARCH_PARAMS = TREATMENT_SEARCH_PARAMS
+
+def _load_store():
+    # Milvus collection (connect + index + load) or local in-process index, per config
+    return open_vector_store(COLLECTION_NAME, VECTOR_BACKEND, DIM, INDEX_PARAMS, SEARCH_PARAMS,
+                             version=manifest_version)
+
+manifest_version = ManifestVersion(COLLECTION_NAME, RESPONSE_CACHE_VERSION_CHECK_SECONDS)
+store = LazyResource(f"{COLLECTION_NAME} vector store ({VECTOR_BACKEND})", _load_store)
+embedder = LazyResource(f"treatment embedder ({EMBEDDING_MODEL})", lambda: load_embedder(EMBEDDING_MODEL))
+alias_index = LazyResource("disease alias index", lambda: DiseaseAliasIndex.from_files(TREATMENTS_JSON, DISEASE_ALIASES_JSON))
+resources = (store, embedder, alias_index)
+response_cache = ExactResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS,
+                                    version=manifest_version)
+for _field in ("size", "hits", "misses", "hit_rate", "saved_seconds", "invalidations"):
+    GAUGES.set_function(lambda f=_field: response_cache.stats()[f], component=f"response_cache:{COLLECTION_NAME}",
+                        field=_field)
+
+def warm_up():
+    """Load the embedder and the vector store now instead of on the first query."""
+    for r in resources:
+        r.get()
 
 # --------------------
 # Query function
 # --------------------
-def retrieve_treatments(query: str, top_k: int = TOP_K) -> List[Dict]:
-    # Encode query
-    q_vec = embedder.encode([query], convert_to_numpy=True)[0]
-    q_vec = norm_vec(q_vec).astype(np.float32).tolist()
+@timed("encode")
+def _encode_queries(queries: List[str]) -> List[List[float]]:
+    q_vecs = embedder.get().encode(queries, convert_to_numpy=True)
+    return [norm_vec(v).astype(np.float32).tolist() for v in q_vecs]
 
-    # Run vector search
-    results = collection.search(
-        data=[q_vec],
-        anns_field="embedding",
-        param={"metric_type": "IP", "params": {"ef": 64}},
+def _encode_query(query: str) -> List[float]:
+    return _encode_queries([query])[0]
+
+@timed("search")
+def _search_many(q_vecs: List[List[float]], top_k: int):
+    results = store.get().search(
+        data=q_vecs,
         limit=top_k,
         output_fields=["disease_id", "name", "treatments"],
     )
+    for hits in results:
+        SEARCH_HITS.observe(len(hits), collection=COLLECTION_NAME)
+    return results
+
+def _search(q_vec: List[float], top_k: int):
+    return _search_many([q_vec], top_k)[0]
 
-    hits = results[0]
+def _parse_treatments(stored: str) -> List[str]:
+    # stored as a JSON list (a treatment may contain ", "); stores ingested before that hold ", "-joined text
+    try:
+        treatments = json.loads(stored)
+    except ValueError:
+        treatments = None
+    return treatments if isinstance(treatments, list) else stored.split(", ")
+
+@timed("format")
+def _format_hits(hits) -> List[Dict]:
     output = []
     for hit in hits:
         ent = hit.entity
         output.append({
             "disease_id": ent.get("disease_id"),
             "name": ent.get("name"),
-            "treatments": ent.get("treatments").split(", "),
+            "treatments": _parse_treatments(ent.get("treatments")),
             "score": float(hit.distance)
         })
     return output
 
+@timed("exact_match")
+def _resolve(query: str, top_k: int) -> Tuple[Optional[List[Dict]], str]:
+    """(exact result or None, text to search): one alias-index lookup per query."""
+    row = alias_index.get().resolve(query)
+    if row is None:
+        return None, query
+    # exact name/alias/ID short-circuits single-result lookups; otherwise search by the canonical name
+    if TREATMENT_EXACT_MATCH and top_k == 1:
+        return [DiseaseAliasIndex.format_row(row)], row["name"]
+    return None, row["name"]
+
+@timed("response_cache")
+def _cache_get(query: str, top_k: int) -> Optional[List[Dict]]:
+    return response_cache.get(top_k, normalize_disease_name(query))
+
+def _cache_put(query: str, top_k: int, treatments: List[Dict], started: float):
+    response_cache.put(top_k, normalize_disease_name(query), treatments, time.perf_counter() - started)
+
+def retrieve_treatments(query: str, top_k: int = TOP_K) -> List[Dict]:
+    exact, query = _resolve(query, top_k)
+    if exact is not None:
+        return exact
+    cached = _cache_get(query, top_k)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    # Encode query
+    q_vec = _encode_query(query)
+    # Run vector search
+    hits = _search(q_vec, top_k)
+    treatments = _format_hits(hits)
+    _cache_put(query, top_k, treatments, started)
+    return treatments
+
+async def aretrieve_treatments(query: str, top_k: int = TOP_K) -> List[Dict]:
+    """Async retrieve_treatments: encoding and Milvus search run on bounded executors."""
+    await aload(alias_index)   # after the first load, exact matching is a dict lookup
+    exact, query = _resolve(query, top_k)
+    if exact is not None:
+        return exact
+    cached = _cache_get(query, top_k)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    q_vec = await run_encode(_encode_query, query)
+    hits = await run_search(_search, q_vec, top_k)
+    treatments = _format_hits(hits)
+    _cache_put(query, top_k, treatments, started)
+    return treatments
+
+def _split_batch(queries: List[str], top_k: int):
+    """
+    Pre-fill errors and exact matches; return (results, indices still needing
+    vector search, the text to search for each of them).
+    """
+    results: List[Dict] = [None] * len(queries)
+    valid, texts = [], []
+    for i, q in enumerate(queries):
+        if not (q and q.strip()):
+            results[i] = {"error": "Empty disease name."}
+            continue
+        exact, text = _resolve(q, top_k)
+        if exact is not None:
+            results[i] = {"treatments": exact}
+        else:
+            valid.append(i)
+            texts.append(text)
+    return results, valid, texts
+
+def _fill_batch(results: List[Dict], valid: List[int], queries: List[str], batch_hits) -> List[Dict]:
+    for i, hits in zip(valid, batch_hits):
+        try:
+            treatments = _format_hits(hits)
+        except Exception as e:
+            results[i] = {"error": str(e)}
+            continue
+        if treatments:
+            results[i] = {"treatments": treatments}
+        else:
+            results[i] = {"error": f"No treatments found for {queries[i]}."}
+    return results
+
+def retrieve_treatments_batch(queries: List[str], top_k: int = TOP_K) -> List[Dict]:
+    """
+    Batch version of retrieve_treatments: one encode call and one multi-vector
+    Milvus search. Returns one item per input, in input order, either
+    {"treatments": [...]} or {"error": "..."}.
+    """
+    results, valid, texts = _split_batch(queries, top_k)
+    if not valid:
+        return results
+    q_vecs = _encode_queries(texts)
+    batch_hits = _search_many(q_vecs, top_k)
+    return _fill_batch(results, valid, queries, batch_hits)
+
+async def aretrieve_treatments_batch(queries: List[str], top_k: int = TOP_K) -> List[Dict]:
+    """Async retrieve_treatments_batch."""
+    await aload(alias_index)
+    results, valid, texts = _split_batch(queries, top_k)
+    if not valid:
+        return results
+    q_vecs = await run_encode(_encode_queries, texts)
+    batch_hits = await run_search(_search_many, q_vecs, top_k)
+    return _fill_batch(results, valid, queries, batch_hits)
+
+def _join_by_id(diseases: List[Dict], top_k: int):
+    """Treatments joined on disease_id; returns (results, indices still needing a lookup by name)."""
+    index = alias_index.get()
+    results: List[Dict] = [None] * len(diseases)
+    by_name = []
+    for i, d in enumerate(diseases):
+        row = index.lookup_id(d.get("disease_id")) if top_k == 1 else None
+        if row is not None:
+            results[i] = {"treatments": [row]}
+        else:
+            by_name.append(i)
+    return results, by_name
+
+def treatments_for_diseases(diseases: List[Dict], top_k: int = TOP_K) -> List[Dict]:
+    """
+    Treatments for diseases returned by the symptom retriever, in input order,
+    each {"treatments": [...]} or {"error": "..."}. Diseases are joined on
+    disease_id in memory; the rest are looked up by name in one batch (one
+    encode call, one multi-vector search), never one search per disease.
+    """
+    results, by_name = _join_by_id(diseases, top_k)
+    if by_name:
+        looked_up = retrieve_treatments_batch([diseases[i].get("name") or "" for i in by_name], top_k)
+        for i, res in zip(by_name, looked_up):
+            results[i] = res
+    return results
+
+async def atreatments_for_diseases(diseases: List[Dict], top_k: int = TOP_K) -> List[Dict]:
+    """Async treatments_for_diseases."""
+    await aload(alias_index)
+    results, by_name = _join_by_id(diseases, top_k)
+    if by_name:
+        looked_up = await aretrieve_treatments_batch([diseases[i].get("name") or "" for i in by_name], top_k)
+        for i, res in zip(by_name, looked_up):
+            results[i] = res
+    return results
+
 
 # --------------------
 # Example usage
@@ -0,0 +1,110 @@
+"""
+Exact-name fast path for disease → treatment lookup.
+
+Builds an in-memory dict from normalized disease names, aliases and IDs to the
+treatment rows in disease2treatements.json, so exact inputs (e.g. a disease name
+the UI passes back) are answered without embedding or vector search.
+
+Keys per disease:
+  - the name and the disease_id ("OMIM:619340" -> "omim 619340")
+  - the name without a trailing parenthetical, and the parenthetical itself
+    ("Phenylketonuria (PKU)" -> "phenylketonuria", "pku")
+  - any aliases listed in the optional aliases file ({disease_id: [alias, ...]})
+Names and IDs always win over aliases; an alias shared by several diseases is dropped.
+lookup_id() joins on the stored disease_id (e.g. diseases returned by the
+symptom retriever) without any normalization.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_TRAILING_PAREN = re.compile(r"^(.*?)\s*\(([^()]*)\)\s*$")
+
+
+def normalize_disease_name(text: str) -> str:
+    """Lowercase, turn punctuation/dashes into spaces and collapse whitespace."""
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+class DiseaseAliasIndex:
+    def __init__(self, rows: List[Dict], aliases: Optional[Dict[str, List[str]]] = None):
+        self.rows = rows
+        self._ids: Dict[str, int] = {}
+        self._exact: Dict[str, int] = {}
+        alias_targets: Dict[str, set] = {}
+
+        for i, row in enumerate(rows):
+            self._ids.setdefault(row["disease_id"], i)
+            for key in (row["name"], row["disease_id"]):
+                self._exact.setdefault(normalize_disease_name(key), i)
+
+            derived = []
+            m = _TRAILING_PAREN.match(row["name"])
+            if m:
+                derived += [m.group(1), m.group(2)]
+            derived += (aliases or {}).get(row["disease_id"], [])
+            for alias in derived:
+                key = normalize_disease_name(alias)
+                if key:
+                    alias_targets.setdefault(key, set()).add(i)
+
+        self._aliases: Dict[str, int] = {
+            key: next(iter(targets))
+            for key, targets in alias_targets.items()
+            if len(targets) == 1 and key not in self._exact
+        }
+
+    @classmethod
+    def from_files(cls, treatments_json: str, aliases_json: Optional[str] = None) -> "DiseaseAliasIndex":
+        if not os.path.exists(treatments_json):
+            logger.warning("Treatments file %s not found; exact-name fast path disabled", treatments_json)
+            return cls([])
+        with open(treatments_json, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        aliases = None
+        if aliases_json and os.path.exists(aliases_json):
+            with open(aliases_json, "r", encoding="utf-8") as f:
+                aliases = json.load(f)
+        return cls(rows, aliases)
+
+    def __len__(self):
+        return len(self._exact) + len(self._aliases)
+
+    def resolve(self, query: str) -> Optional[Dict]:
+        """Stored row (treatments as a list) for an exact name/alias/ID match, or None."""
+        key = normalize_disease_name(query)
+        i = self._exact.get(key)
+        if i is None:
+            i = self._aliases.get(key)
+        return None if i is None else self.rows[i]
+
+    @staticmethod
+    def format_row(row: Dict) -> Dict:
+        """A resolved row in retrieve_treatments' output format."""
+        return {
+            "disease_id": row["disease_id"],
+            "name": row["name"],
+            "treatments": list(row["treatments"]),
+            "score": 1.0,
+        }
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """Treatment row for an exact name/alias/ID match, in retrieve_treatments' output format."""
+        row = self.resolve(query)
+        return None if row is None else self.format_row(row)
+
+    def lookup_id(self, disease_id: str) -> Optional[Dict]:
+        """Treatment row for a disease_id exactly as stored (a join key, not user input)."""
+        i = self._ids.get(disease_id)
+        return None if i is None else self.format_row(self.rows[i])
+
+    def canonical_name(self, query: str) -> Optional[str]:
+        """Canonical disease name for a name/alias/ID, or None if unknown."""
+        row = self.resolve(query)
+        return None if row is None else row["name"]
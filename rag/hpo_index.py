@@ -0,0 +1,208 @@
+"""
+Structured HPO phenotype index for symptom → disease lookup.
+
+An inverted index from HPO terms to the diseases annotated with them, stored as
+CSR integer arrays (term t's diseases are postings[indptr[t]:indptr[t+1]]).
+Queries are matched against it by:
+  - explicit HPO ids ("HP:0001250"), and
+  - term names / synonyms (from the compiled ontology, utils/hpo_ontology.py,
+    or hpo_terms.json), as greedy longest token phrases.
+Matched terms are scored per disease with BM25 (each term occurs at most once
+per disease, so tf = 1 and only idf and the disease's term count matter).
+The retriever fuses this ranking with the vector ranking (see
+rag/aggregation.py: reciprocal_rank_fusion).
+
+The index is built from the `hpo_ids` lists map_diseases_symptoms.py writes into
+symptoms2disease.jsonl and saved as one .npz (strings packed as UTF-8 blobs),
+so loading it is a handful of array reads.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.packed_strings import PackedStrings, pack_strings
+
+logger = logging.getLogger(__name__)
+
+HPO_ID_RE = re.compile(r"\bHP[:_]?(\d{7})\b", re.I)
+_TOKEN = re.compile(r"[0-9a-z]+")
+MAX_PHRASE_TOKENS = 10  # longer names/synonyms are only matched by id
+
+
+def phrase_tokens(text: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN.findall(text.lower()))
+
+
+class PhraseMatcher:
+    """Greedy longest-phrase matcher from query tokens to term numbers."""
+
+    def __init__(self, phrases: Iterable[str], terms: Iterable[int]):
+        self._index: Dict[Tuple[str, ...], List[int]] = {}
+        for phrase, term in zip(phrases, terms):
+            key = phrase_tokens(phrase)
+            if 0 < len(key) <= MAX_PHRASE_TOKENS:
+                targets = self._index.setdefault(key, [])
+                if term not in targets:
+                    targets.append(term)
+        self._max_phrase = max((len(k) for k in self._index), default=0)
+
+    def match(self, text: str) -> List[int]:
+        """Term numbers of the phrases in text, longest match first at each position, in order."""
+        found: Dict[int, None] = {}
+        toks = phrase_tokens(text)
+        i = 0
+        while i < len(toks):
+            for n in range(min(self._max_phrase, len(toks) - i), 0, -1):
+                targets = self._index.get(toks[i: i + n])
+                if targets:
+                    found.update(dict.fromkeys(targets))
+                    i += n
+                    break
+            else:
+                i += 1
+        return list(found)
+
+
+class HpoPhenotypeIndex:
+    def __init__(self, disease_ids: List[str], disease_names: List[str], term_ids: List[str],
+                 indptr: np.ndarray, postings: np.ndarray, phrases: List[str], phrase_terms: np.ndarray,
+                 k1: float = 1.2, b: float = 0.75):
+        self.disease_ids = disease_ids
+        self.disease_names = disease_names
+        self.term_ids = term_ids
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.int32)
+        self.phrases = phrases
+        self.phrase_terms = np.asarray(phrase_terms, dtype=np.int32)
+        self.k1 = k1
+        self.b = b
+
+        self._term_index: Dict[str, int] = {t: i for i, t in enumerate(term_ids)}
+        self._phrases = PhraseMatcher(phrases, self.phrase_terms.tolist())
+
+        n_diseases = len(disease_ids)
+        df = np.diff(self.indptr)
+        self.idf = np.log1p((n_diseases - df + 0.5) / (df + 0.5))
+        doc_len = np.bincount(self.postings, minlength=n_diseases).astype(np.float64)
+        avgdl = doc_len.mean() if n_diseases and doc_len.mean() > 0 else 1.0
+        # BM25 with tf = 1: score(d) = sum_t idf(t) * (k1 + 1) / (1 + k1 * (1 - b + b * |d| / avgdl))
+        self._doc_factor = (k1 + 1) / (1 + k1 * (1 - b + b * doc_len / avgdl))
+
+    def __len__(self):
+        return len(self.disease_ids)
+
+    # ---------- build / persist ----------
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str, List[str]]],
+              terms: Dict[str, dict]) -> "HpoPhenotypeIndex":
+        """records: (disease_id, name, hpo_ids); terms: hpo_terms.json ({id: {name, synonyms?}})."""
+        disease_ids, disease_names = [], []
+        term_index: Dict[str, int] = {}
+        pairs_t, pairs_d = [], []
+        for did, name, hpo_ids in records:
+            d = len(disease_ids)
+            disease_ids.append(did)
+            disease_names.append(name)
+            for hpo_id in dict.fromkeys(hpo_ids):  # dedupe, keep order
+                pairs_t.append(term_index.setdefault(hpo_id, len(term_index)))
+                pairs_d.append(d)
+
+        term_ids = list(term_index)
+        t = np.asarray(pairs_t, dtype=np.int64)
+        d = np.asarray(pairs_d, dtype=np.int32)
+        order = np.argsort(t, kind="stable")
+        indptr = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(t, minlength=len(term_ids)), out=indptr[1:])
+
+        # only terms that annotate some disease are worth matching in queries
+        phrases, phrase_terms = [], []
+        for i, hpo_id in enumerate(term_ids):
+            info = terms.get(hpo_id) or {}
+            for phrase in [info.get("name")] + list(info.get("synonyms") or []):
+                if phrase:
+                    phrases.append(phrase)
+                    phrase_terms.append(i)
+        return cls(disease_ids, disease_names, term_ids, indptr, d[order], phrases,
+                   np.asarray(phrase_terms, dtype=np.int32))
+
+    @classmethod
+    def from_jsonl(cls, jsonl_path: Union[str, List[str]], terms: Optional[Dict[str, dict]] = None) -> "HpoPhenotypeIndex":
+        """Build from one symptoms JSONL or a list of its shards; terms as from load_hpo_terms()."""
+        paths = [jsonl_path] if isinstance(jsonl_path, str) else list(jsonl_path)
+
+        def records():
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        obj = json.loads(line)
+                        yield obj.get("disease_id", "UNKNOWN"), obj.get("name", ""), obj.get("hpo_ids") or []
+
+        return cls.build(records(), terms or {})
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        arrays = {"indptr": self.indptr, "postings": self.postings, "phrase_terms": self.phrase_terms}
+        for name in ("disease_ids", "disease_names", "term_ids", "phrases"):
+            arrays[f"{name}_blob"], arrays[f"{name}_offsets"] = pack_strings(getattr(self, name))
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HpoPhenotypeIndex":
+        with np.load(path, allow_pickle=False) as z:
+            strings = {name: PackedStrings(z[f"{name}_blob"], z[f"{name}_offsets"]).tolist()
+                       for name in ("disease_ids", "disease_names", "term_ids", "phrases")}
+            return cls(strings["disease_ids"], strings["disease_names"], strings["term_ids"],
+                       z["indptr"], z["postings"], strings["phrases"], z["phrase_terms"])
+
+    @classmethod
+    def from_files(cls, index_path: str, jsonl_path: str,
+                   load_terms: Callable[[], Dict[str, dict]] = dict) -> "HpoPhenotypeIndex":
+        """Load the saved index, or build it from the JSONL if it was never saved."""
+        if os.path.exists(index_path):
+            return cls.load(index_path)
+        if not os.path.exists(jsonl_path):
+            logger.warning("Neither %s nor %s found; HPO term matching disabled", index_path, jsonl_path)
+            return cls.build([], {})
+        index = cls.from_jsonl(jsonl_path, load_terms())
+        if not index.term_ids:
+            logger.warning("%s has no hpo_ids; re-run map_diseases_symptoms.py to enable HPO term matching",
+                           jsonl_path)
+        return index
+
+    # ---------- query ----------
+    def match_terms(self, query: str) -> List[int]:
+        """Term numbers mentioned in the query (explicit ids, then longest name/synonym phrases)."""
+        found: Dict[int, None] = {}
+        for digits in HPO_ID_RE.findall(query):
+            t = self._term_index.get(f"HP:{digits}")
+            if t is not None:
+                found[t] = None
+        found.update(dict.fromkeys(self._phrases.match(query)))
+        return list(found)
+
+    def search(self, query: str, top_n: int) -> List[Dict]:
+        """BM25-ranked diseases for the HPO terms in the query, best first ([] if none match)."""
+        terms = self.match_terms(query)
+        if not terms:
+            return []
+        starts, ends = self.indptr[terms], self.indptr[np.asarray(terms) + 1]
+        rows = np.concatenate([self.postings[s:e] for s, e in zip(starts, ends)])
+        weights = np.repeat(self.idf[terms], ends - starts)
+        scores = np.bincount(rows, weights=weights, minlength=len(self.disease_ids)) * self._doc_factor
+
+        touched = np.unique(rows)
+        top = touched[np.lexsort((touched, -scores[touched]))][:top_n]
+        out = []
+        for d in top.tolist():
+            matched = [self.term_ids[t] for t, s, e in zip(terms, starts, ends)
+                       if np.any(self.postings[s:e] == d)]
+            out.append({"disease_id": self.disease_ids[d], "name": self.disease_names[d],
+                        "score": float(scores[d]), "matched_hpo": matched})
+        return out
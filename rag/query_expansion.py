@@ -0,0 +1,94 @@
+"""
+Ontology-aware query expansion for symptom search.
+
+Patients name symptoms in general terms ("seizures") while the disease chunks
+hold specific HPO phenotypes ("Focal-onset seizure"). The expander matches HPO
+ids, term names and synonyms in the query (same greedy phrase matching as
+rag/hpo_index.py, over the whole ontology) and returns the names of their
+parents and children, which the retriever encodes together with the query in
+one batch and searches alongside it.
+
+Parents/children come from the transitive closure precomputed when hp.obo is
+compiled (utils/hpo_ontology.py), so expanding a query is a few array slices,
+not a graph walk.
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from rag.hpo_index import HPO_ID_RE, PhraseMatcher
+from utils.hpo_ontology import HpoOntology
+
+logger = logging.getLogger(__name__)
+
+# ancestors this close to the root ("All", "Phenotypic abnormality", organ-system
+# headings) say nothing about the query and are never added
+MIN_ANCESTOR_DEPTH = 2
+
+
+class OntologyQueryExpander:
+    def __init__(self, ontology: Optional[HpoOntology], up: int = 1, down: int = 1, max_terms: int = 8):
+        self.ontology = ontology
+        self.up = up
+        self.down = down
+        self.max_terms = max_terms
+        if ontology is None:
+            self.names: List[str] = []
+            self._phrases = PhraseMatcher([], [])
+            return
+
+        self.names = ontology.names.tolist()
+        live = ~np.asarray(ontology.obsolete)
+        usable = live & (np.diff(ontology.anc_indptr) >= MIN_ANCESTOR_DEPTH)
+        self._usable = usable.tolist()
+        synonyms, syn_indptr = ontology.synonyms.tolist(), ontology.syn_indptr.tolist()
+        phrases, terms = [], []
+        for row in np.flatnonzero(live).tolist():
+            phrases.append(self.names[row])
+            terms.append(row)
+            for syn in synonyms[syn_indptr[row]: syn_indptr[row + 1]]:
+                phrases.append(syn)
+                terms.append(row)
+        self._phrases = PhraseMatcher(phrases, terms)
+
+    @classmethod
+    def from_files(cls, obo_path: str, cache_dir: str, **kwargs) -> "OntologyQueryExpander":
+        """Expander over the compiled ontology; a no-op expander if neither hp.obo nor the artifact exists."""
+        if not os.path.exists(obo_path) and not os.path.exists(os.path.join(cache_dir, "meta.json")):
+            logger.warning("Neither %s nor a compiled ontology in %s found; query expansion disabled",
+                           obo_path, cache_dir)
+            return cls(None, **kwargs)
+        return cls(HpoOntology.open(obo_path, cache_dir), **kwargs)
+
+    def matched_rows(self, query: str) -> List[int]:
+        """Ontology rows named in the query: explicit HP ids, then name/synonym phrases."""
+        if self.ontology is None:
+            return []
+        found = {}
+        for digits in HPO_ID_RE.findall(query):
+            row = self.ontology.row(f"HP:{digits}")
+            if row is not None:
+                found[row] = None
+        found.update(dict.fromkeys(self._phrases.match(query)))
+        return list(found)
+
+    def expansion_rows(self, query: str) -> List[int]:
+        return self.neighbour_rows(self.matched_rows(query))
+
+    def neighbour_rows(self, matched: List[int]) -> List[int]:
+        """Children, then parents, of each matched row (nearest first); matched rows themselves excluded."""
+        out = {}
+        for row in matched:
+            for near in (self.ontology.descendant_rows(row, self.down).tolist(),
+                         self.ontology.ancestor_rows(row, self.up).tolist()):
+                out.update((r, None) for r in near if self._usable[r])
+        for row in matched:
+            out.pop(row, None)
+        return list(out)[: self.max_terms]
+
+    def expand(self, query: str) -> List[str]:
+        """Extra query texts (HPO term names) for the query; [] if it names no known term."""
+        return [self.names[r] for r in self.expansion_rows(query)]
@@ -0,0 +1,112 @@
+"""
+Optional second retrieval stage: re-score the top-N chunk hits with a small
+CPU cross-encoder before disease aggregation ("quality" mode).
+
+- (query, chunk) pairs are length-capped (chars before tokenization, tokens in
+  the model) and scored in batches.
+- A per-request time budget is enforced up front: the cost per pair is tracked
+  as a moving average, and the number of reranked pairs is reduced to fit the
+  remaining budget. If fewer than `min_pairs` fit, reranking is skipped and the
+  bi-encoder scores are used unchanged.
+"""
+
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.lazy import LazyResource
+from utils.vector_store import LocalHit
+
+
+def _returns_logits(model) -> bool:
+    """Whether a CrossEncoder's predict() output is unactivated (Identity), read from its config once."""
+    # sentence-transformers >= 4 calls it activation_fn, earlier versions default_activation_function
+    activation = getattr(model, "activation_fn", None) or getattr(model, "default_activation_function", None)
+    return activation is None or type(activation).__name__ == "Identity"
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str, top_n: int = 40, max_length: int = 256, max_chars: int = 1000,
+                 batch_size: int = 32, min_pairs: int = 8, ema_alpha: float = 0.2):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.max_length = max_length
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self.min_pairs = min_pairs
+        self.ema_alpha = ema_alpha
+        self.model = LazyResource(f"reranker ({model_name})", self._load)
+        self._sec_per_pair: Optional[float] = None
+        self._squash: Optional[bool] = None   # set from the model when it loads
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.skipped = 0
+
+    def _load(self):
+        from sentence_transformers import CrossEncoder
+
+        model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        self._squash = _returns_logits(model)
+        return model
+
+    @property
+    def sec_per_pair(self) -> Optional[float]:
+        return self._sec_per_pair
+
+    def _observe(self, seconds: float, pairs: int):
+        per_pair = seconds / max(pairs, 1)
+        with self._lock:
+            if self._sec_per_pair is None:
+                self._sec_per_pair = per_pair
+            else:
+                self._sec_per_pair += self.ema_alpha * (per_pair - self._sec_per_pair)
+
+    def pairs_within_budget(self, n_hits: int, remaining_s: Optional[float]) -> int:
+        """How many of the top hits can be reranked in the remaining budget (0 = skip)."""
+        n = min(n_hits, self.top_n)
+        if remaining_s is None or self._sec_per_pair is None:
+            return n  # no budget, or first call: run and calibrate
+        n = min(n, int(remaining_s / self._sec_per_pair))
+        return n if n >= self.min_pairs else 0
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        pairs = [(query, t[: self.max_chars]) for t in texts]
+        t0 = time.perf_counter()
+        scores = np.asarray(
+            self.model.get().predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+            dtype=np.float64,
+        ).reshape(-1)
+        self._observe(time.perf_counter() - t0, len(pairs))
+        # a model that returns raw logits is always squashed, so scores stay in [0, 1] like cosine
+        # and the same pair gets the same score whatever else is in the batch
+        if self._squash:
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+    def rerank(self, query: str, hits, deadline: Optional[float] = None) -> Tuple[list, bool]:
+        """
+        Re-score the best hits with the cross-encoder. `deadline` is a
+        time.perf_counter() value the rerank must finish by.
+        Returns (hits sorted by new score, reranked?); only reranked hits are
+        returned, because their scores are not comparable with the rest.
+        """
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        n = self.pairs_within_budget(len(hits), remaining)
+        if n == 0:
+            self.skipped += 1
+            return list(hits), False
+
+        top = list(hits)[:n]
+        scores = self.score(query, [h.entity.get("chunk_text") or "" for h in top])
+        order = np.argsort(-scores, kind="stable")
+        self.reranked += 1
+        return [LocalHit(top[i].id, float(scores[i]), top[i].entity) for i in order], True
+
+    def stats(self) -> dict:
+        return {
+            "reranked": self.reranked,
+            "skipped": self.skipped,
+            "ms_per_pair": None if self._sec_per_pair is None else self._sec_per_pair * 1000,
+        }
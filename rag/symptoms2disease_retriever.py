@@ -5,101 +5,435 @@ retrieve top-K matching chunks and then aggregate scores by disease_id
 to produce disease-ranked results.
 
 If index doesn't exist, create HNSW index automatically.
+With SYMPTOMS_VECTOR_BACKEND = "local" the same search runs against an
+in-process exact index instead (see utils/vector_store.py).
+
+The vector store and the embedder are loaded lazily on first use
+(or by warm_up() from the API lifespan), so importing this module is cheap.
+
+Modes: "fast" ranks diseases from bi-encoder scores only; "quality" re-scores
+the top chunk hits with a CPU cross-encoder (rag/reranker.py) before
+aggregation, within SYMPTOMS_RERANK_BUDGET_MS per request.
+
+Coarse-to-fine search (SYMPTOMS_COARSE_TO_FINE, or coarse_to_fine=True) first
+picks candidate diseases from the `disease_centroids` index built at ingest
+(one pooled vector per disease), then searches only those diseases' chunks with
+a `disease_id in [...]` filter.
+
+Hybrid search (SYMPTOMS_HYBRID_SEARCH): HPO terms named in the query (ids,
+names, synonyms) are looked up in an inverted index (rag/hpo_index.py) and
+scored with BM25; that disease ranking is fused with the vector ranking by
+reciprocal-rank fusion. Fused results are ordered by `rrf_score`; their
+`score` stays the aggregated vector score. Queries without phenotype terms are
+unaffected.
+
+Query expansion (SYMPTOMS_QUERY_EXPANSION): HPO terms named in the query are
+expanded to their ontology parents/children (rag/query_expansion.py); the query
+and its expansions are encoded in one batch, searched in one multi-vector
+request, and their chunk hits merged (expansion scores scaled by
+SYMPTOMS_EXPANSION_WEIGHT) before aggregation.
+
+Semantic response cache (RESPONSE_CACHE_SIZE > 0): single queries whose
+embedding is within RESPONSE_CACHE_THRESHOLD cosine of an earlier query with
+the same mode, search settings, expansions and HPO terms get that query's
+diseases back without searching (utils/response_cache.py). The cache is
+dropped when the ingestion script publishes a new collection version.
+
+Deferred chunk text (SYMPTOMS_DEFERRED_CHUNK_TEXT): searches return ids,
+scores, disease id/name and chunk index only; the texts of the few chunks that
+end up in the response (and of the hits the reranker scores) are read from the
+memory-mapped chunk text store the ingestion script writes
+(utils/chunk_text_store.py). Without that store, searches return chunk_text as before.
+Each query pins the collection's manifest version (ManifestVersion.pin): it
+searches the physical collection that version names and reads the texts of
+that version, even if a re-ingest publishes a new one in between.
 """
 
+import json
+import os
+import time
 from typing import List, Dict
-from collections import defaultdict
 import numpy as np
-from pymilvus import Collection
-from sentence_transformers import SentenceTransformer
-from utils.config import MILVUS_HOST, MILVUS_PORT, DIM
+from utils.config import DIM, CHUNK_TEXT_STORE_DIR, HPO_INDEX_PATH, HPO_TERMS_JSON, HPO_OBO, HPO_ONTOLOGY_DIR, SYMPTOMS_JSONL
+from utils.hpo_ontology import load_hpo_terms
 from utils.vector_utils import norm_vec
-from utils.milvus_utils import connect_to_milvus, get_or_create_collection
+from utils.milvus_utils import open_vector_store
 from utils.embedding_utils import load_embedder
-from utils.constants import SYMPTOMS_EMBEDDING_MODEL, SYMPTOMS_TOP_K_CHUNKS, SYMPTOMS_TOP_N_DISEASES, SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE
+from utils.async_utils import run_encode, run_search
+from utils.chunk_text_store import ChunkTextReader
+from utils.ingest_utils import ManifestVersion
+from utils.response_cache import SemanticResponseCache
+from utils.lazy import LazyResource
+from utils.vector_store import LocalHit
+from utils.metrics import GAUGES, SEARCH_HITS, stage, timed
+from rag.aggregation import aggregate_hits, merge_hits, reciprocal_rank_fusion
+from rag.hpo_index import HpoPhenotypeIndex
+from rag.query_expansion import OntologyQueryExpander
+from rag.reranker import CrossEncoderReranker
+from utils.constants import SYMPTOMS_EMBEDDING_MODEL, SYMPTOMS_TOP_K_CHUNKS, SYMPTOMS_TOP_N_DISEASES, SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE, SYMPTOMS_VECTOR_BACKEND, SYMPTOMS_AGGREGATOR, SYMPTOMS_AGGREGATOR_TOP_K
+from utils.constants import SYMPTOMS_INDEX_PARAMS, SYMPTOMS_SEARCH_PARAMS, SYMPTOMS_RESCORE_FACTOR
+from utils.constants import SYMPTOMS_COARSE_TO_FINE, SYMPTOMS_COARSE_TOP_DISEASES
+from utils.constants import SYMPTOMS_HYBRID_SEARCH, SYMPTOMS_HYBRID_LEXICAL_TOP_N, SYMPTOMS_RRF_K
+from utils.constants import SYMPTOMS_DEFERRED_CHUNK_TEXT
+from utils.constants import SYMPTOMS_QUERY_EXPANSION, SYMPTOMS_EXPANSION_UP, SYMPTOMS_EXPANSION_DOWN, SYMPTOMS_EXPANSION_MAX_TERMS, SYMPTOMS_EXPANSION_WEIGHT
+from utils.constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_VERSION_CHECK_SECONDS
+from utils.constants import SYMPTOMS_RERANK_ENABLED, SYMPTOMS_RERANK_MODEL, SYMPTOMS_RERANK_TOP_N, SYMPTOMS_RERANK_MAX_LENGTH, SYMPTOMS_RERANK_MAX_CHARS, SYMPTOMS_RERANK_BATCH_SIZE, SYMPTOMS_RERANK_MIN_PAIRS, SYMPTOMS_RERANK_BUDGET_MS
 
 # CONFIG
+COLLECTION_NAME = "disease_kb_chunks"
+CENTROID_COLLECTION_NAME = "disease_centroids"
+VECTOR_BACKEND = SYMPTOMS_VECTOR_BACKEND
 EMBEDDING_MODEL = SYMPTOMS_EMBEDDING_MODEL
 TOP_K_CHUNKS = SYMPTOMS_TOP_K_CHUNKS
 TOP_N_DISEASES = SYMPTOMS_TOP_N_DISEASES
 TOP_M_CHUNKS_PER_DISEASE = SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE
+AGGREGATOR = SYMPTOMS_AGGREGATOR
+AGGREGATOR_TOP_K = SYMPTOMS_AGGREGATOR_TOP_K
+COARSE_TO_FINE = SYMPTOMS_COARSE_TO_FINE
+COARSE_TOP_DISEASES = SYMPTOMS_COARSE_TOP_DISEASES
+HYBRID_SEARCH = SYMPTOMS_HYBRID_SEARCH
+HYBRID_LEXICAL_TOP_N = SYMPTOMS_HYBRID_LEXICAL_TOP_N
+RRF_K = SYMPTOMS_RRF_K
+QUERY_EXPANSION = SYMPTOMS_QUERY_EXPANSION
+EXPANSION_WEIGHT = SYMPTOMS_EXPANSION_WEIGHT
+DEFERRED_CHUNK_TEXT = SYMPTOMS_DEFERRED_CHUNK_TEXT
+RERANK_ENABLED = SYMPTOMS_RERANK_ENABLED
+RERANK_BUDGET_S = SYMPTOMS_RERANK_BUDGET_MS / 1000
+MODES = ("fast", "quality")
+
+# same index as the ingestion script builds; tuned by benchmarks/tune_index.py
+INDEX_PARAMS = SYMPTOMS_INDEX_PARAMS
+SEARCH_PARAMS = SYMPTOMS_SEARCH_PARAMS
+RESCORE_FACTOR = SYMPTOMS_RESCORE_FACTOR   # used only if the collection was ingested with --compression
+# one row per disease: exact search is cheap
+CENTROID_INDEX_PARAMS = {"metric_type": "IP", "index_type": "FLAT", "params": {}}
+CENTROID_SEARCH_PARAMS = {"metric_type": "IP", "params": {}}
+CHUNK_OUTPUT_FIELDS = ["disease_id", "disease_name", "chunk_index", "chunk_text"]
+# with deferred chunk text: everything but the (up to 64 KB) text
+CHUNK_SEARCH_FIELDS = ["disease_id", "disease_name", "chunk_index"]
+
+def _load_store():
+    # Milvus collection (connect + index + load) or local in-process index, per config
+    return open_vector_store(COLLECTION_NAME, VECTOR_BACKEND, DIM, INDEX_PARAMS, SEARCH_PARAMS, RESCORE_FACTOR,
+                             version=manifest_version)
+
+def _load_centroid_store():
+    # the centroids have no manifest of their own; they are rewritten by every ingest of the chunks
+    return open_vector_store(CENTROID_COLLECTION_NAME, VECTOR_BACKEND, DIM, CENTROID_INDEX_PARAMS,
+                             CENTROID_SEARCH_PARAMS, version=manifest_version)
+
+store = LazyResource(f"{COLLECTION_NAME} vector store ({VECTOR_BACKEND})", _load_store)
+centroid_store = LazyResource(f"{CENTROID_COLLECTION_NAME} vector store ({VECTOR_BACKEND})", _load_centroid_store)
+embedder = LazyResource(f"symptoms embedder ({EMBEDDING_MODEL})", lambda: load_embedder(EMBEDDING_MODEL))
+reranker = CrossEncoderReranker(SYMPTOMS_RERANK_MODEL, top_n=SYMPTOMS_RERANK_TOP_N,
+                                max_length=SYMPTOMS_RERANK_MAX_LENGTH, max_chars=SYMPTOMS_RERANK_MAX_CHARS,
+                                batch_size=SYMPTOMS_RERANK_BATCH_SIZE, min_pairs=SYMPTOMS_RERANK_MIN_PAIRS)
+for _field in ("reranked", "skipped", "ms_per_pair"):
+    GAUGES.set_function(lambda f=_field: reranker.stats()[f], component="reranker", field=_field)
+# published version of disease_kb_chunks: switches the searched collection and the chunk text store
+# together and invalidates the response cache; each query pins it, so its hits and texts agree
+manifest_version = ManifestVersion(COLLECTION_NAME, RESPONSE_CACHE_VERSION_CHECK_SECONDS)
+chunk_texts = LazyResource("chunk text store", lambda: ChunkTextReader(
+    os.path.join(CHUNK_TEXT_STORE_DIR, COLLECTION_NAME), manifest_version))
+response_cache = SemanticResponseCache(DIM, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_THRESHOLD,
+                                       version=manifest_version)
+for _field in ("size", "hits", "misses", "hit_rate", "saved_seconds", "invalidations"):
+    GAUGES.set_function(lambda f=_field: response_cache.stats()[f], component=f"response_cache:{COLLECTION_NAME}",
+                        field=_field)
+def _load_hpo_index():
+    return HpoPhenotypeIndex.from_files(HPO_INDEX_PATH, SYMPTOMS_JSONL,
+                                        lambda: load_hpo_terms(HPO_OBO, HPO_ONTOLOGY_DIR, HPO_TERMS_JSON))
+
+hpo_index = LazyResource("HPO term index", _load_hpo_index)
+expander = LazyResource("HPO query expander", lambda: OntologyQueryExpander.from_files(
+    HPO_OBO, HPO_ONTOLOGY_DIR, up=SYMPTOMS_EXPANSION_UP, down=SYMPTOMS_EXPANSION_DOWN,
+    max_terms=SYMPTOMS_EXPANSION_MAX_TERMS))
+resources = (store, embedder)
+if HYBRID_SEARCH:
+    resources += (hpo_index,)
+if QUERY_EXPANSION:
+    resources += (expander,)
+if COARSE_TO_FINE:
+    resources += (centroid_store,)
+if DEFERRED_CHUNK_TEXT:
+    resources += (chunk_texts,)
+if RERANK_ENABLED:
+    resources += (reranker.model,)
+
+def warm_up():
+    """Load the embedder and the vector store now instead of on the first query."""
+    for r in resources:
+        r.get()
+
+@timed("encode")
+def _encode_queries(query_texts: List[str]) -> List[List[float]]:
+    # one encode call for the whole list
+    q_vecs = embedder.get().encode(query_texts, convert_to_numpy=True)
+    return [norm_vec(v).astype(np.float32).tolist() for v in q_vecs]
+
+def _output_fields() -> List[str]:
+    # chunk_text only when it cannot come from the chunk text store
+    if DEFERRED_CHUNK_TEXT and chunk_texts.get().available:
+        return CHUNK_SEARCH_FIELDS
+    return CHUNK_OUTPUT_FIELDS
+
+def _fetch_texts(entities) -> List[str]:
+    """chunk_text of each hit entity: from the hit itself, else the chunk text store, else the vector store."""
+    texts = [e.get("chunk_text") for e in entities]
+    missing = [i for i, t in enumerate(texts) if t is None]
+    if missing and DEFERRED_CHUNK_TEXT:
+        with stage("fetch_text"):
+            found = chunk_texts.get().get_many([(entities[i].get("disease_id"), entities[i].get("chunk_index"))
+                                                for i in missing])
+        for i, text in zip(missing, found):
+            texts[i] = text
+        missing = [i for i in missing if texts[i] is None]
+    if missing:
+        # not in the store (e.g. hits from a collection swapped in after it was opened): ask the vector store
+        ids = sorted({entities[i].get("disease_id") for i in missing})
+        rows = store.get().query(expr=f"disease_id in {json.dumps(ids)}",
+                                 output_fields=["disease_id", "chunk_index", "chunk_text"])
+        by_key = {(r["disease_id"], int(r["chunk_index"])): r["chunk_text"] for r in rows}
+        for i in missing:
+            texts[i] = by_key.get((entities[i].get("disease_id"), int(entities[i].get("chunk_index"))), "")
+    return texts
+
+def _with_texts(hits, n: int) -> list:
+    """hits, with chunk_text filled in for the first n (the ones the reranker reads)."""
+    hits = list(hits)
+    head = hits[:n]
+    texts = _fetch_texts([h.entity for h in head])
+    return [LocalHit(h.id, h.distance, {**{f: h.entity.get(f) for f in CHUNK_SEARCH_FIELDS}, "chunk_text": text})
+            for h, text in zip(head, texts)] + hits[n:]
+
+def _coarse_candidates(q_vecs: List[List[float]]) -> List[List[str]]:
+    # one multi-vector request against the centroid index; candidate disease ids per query
+    results = centroid_store.get().search(data=q_vecs, limit=COARSE_TOP_DISEASES, output_fields=["disease_id"])
+    return [[hit.entity.get("disease_id") for hit in hits] for hits in results]
+
+@timed("search")
+def _search_many(q_vecs: List[List[float]], top_k_chunks: int, coarse_to_fine: bool = False):
+    if not coarse_to_fine:
+        # one multi-vector request; results[i] holds the hits for q_vecs[i]
+        results = store.get().search(data=q_vecs, limit=top_k_chunks, output_fields=_output_fields())
+    else:
+        # filters differ per query, so the fine stage is one filtered request per query
+        chunks = store.get()
+        fields = _output_fields()
+        results = []
+        for q_vec, candidates in zip(q_vecs, _coarse_candidates(q_vecs)):
+            expr = f"disease_id in {json.dumps(candidates)}" if candidates else None
+            results.append(chunks.search(data=[q_vec], limit=top_k_chunks, output_fields=fields,
+                                         expr=expr)[0])
+    for hits in results:
+        SEARCH_HITS.observe(len(hits), collection=COLLECTION_NAME)
+    return results
+
+def _expand(query_texts: List[str]) -> List[List[str]]:
+    """Each query followed by its ontology expansions (just the query when expansion is off)."""
+    if not QUERY_EXPANSION:
+        return [[q] for q in query_texts]
+    with stage("expand"):
+        exp = expander.get()
+        return [[q] + exp.expand(q) for q in query_texts]
+
+def _flatten(groups: List[List[str]]) -> List[str]:
+    return [text for group in groups for text in group]
+
+def _search_expanded(groups: List[List[str]], q_vecs: List[List[float]], top_k_chunks: int,
+                     coarse_to_fine: bool = False):
+    """
+    Search all query vectors of all groups in one request and merge each group's
+    hits. Returns (the original query's vector, merged hits) per group.
+    """
+    flat_hits = _search_many(q_vecs, top_k_chunks, coarse_to_fine)
+    out_vecs, out_hits, i = [], [], 0
+    for group in groups:
+        n = len(group)
+        out_vecs.append(q_vecs[i])
+        if n == 1:
+            out_hits.append(flat_hits[i])
+        else:
+            out_hits.append(merge_hits(flat_hits[i: i + n], [1.0] + [EXPANSION_WEIGHT] * (n - 1), top_k_chunks))
+        i += n
+    return out_vecs, out_hits
+
+def _no_texts(entities) -> List[str]:
+    return [""] * len(entities)
+
+def _aggregate(hits, top_n: int = TOP_N_DISEASES, with_texts: bool = True) -> List[Dict]:
+    # columnar group-by over the hits (see rag/aggregation.py)
+    return aggregate_hits(hits, top_n, TOP_M_CHUNKS_PER_DISEASE, AGGREGATOR, AGGREGATOR_TOP_K,
+                          fetch_texts=_fetch_texts if with_texts else _no_texts)
+
+def _hybrid(query_text: str, q_vec: List[float], hits) -> List[Dict]:
+    """Fuse the vector disease ranking with the HPO term (BM25) ranking by RRF."""
+    lexical = hpo_index.get().search(query_text, HYBRID_LEXICAL_TOP_N)
+    if not lexical:
+        return _aggregate(hits)
+    # full vector ranking of the diseases in the hits (texts only for the ones kept, below)
+    dense = _aggregate(hits, top_n=len(hits), with_texts=False)
+    fused = reciprocal_rank_fusion([[d["disease_id"] for d in dense], [d["disease_id"] for d in lexical]],
+                                   k=RRF_K)[:TOP_N_DISEASES]
+
+    # diseases are scored independently, so aggregating only the kept ones gives the same items
+    kept = {did for did, _ in fused} & {d["disease_id"] for d in dense}
+    kept_hits = [h for h in hits if h.entity.get("disease_id") in kept]
+    by_id = {d["disease_id"]: d for d in _aggregate(kept_hits, top_n=len(kept))}
+    missing = [did for did, _ in fused if did not in by_id]
+    if missing:
+        # term-only matches: fetch their best chunks so they carry context like the others
+        extra = store.get().search(data=[q_vec], limit=TOP_M_CHUNKS_PER_DISEASE * len(missing),
+                                   output_fields=_output_fields(), expr=f"disease_id in {json.dumps(missing)}")[0]
+        by_id.update((d["disease_id"], d) for d in _aggregate(extra, top_n=len(missing)))
+    lex_by_id = {d["disease_id"]: d for d in lexical}
+
+    out = []
+    for did, rrf in fused:
+        lex = lex_by_id.get(did)
+        item = dict(by_id.get(did) or {"disease_id": did, "name": lex["name"], "score": None,
+                                       "context": "", "top_chunks": []})
+        # "score" stays the vector score, comparable with non-hybrid results; the order is by rrf_score
+        item["rrf_score"] = rrf
+        item["lexical_score"] = lex["score"] if lex else None
+        item["matched_hpo"] = lex["matched_hpo"] if lex else []
+        out.append(item)
+    return out
+
+@timed("aggregate")
+def _rank(query_text: str, q_vec: List[float], hits) -> List[Dict]:
+    return _hybrid(query_text, q_vec, hits) if HYBRID_SEARCH else _aggregate(hits)
+
+def _check_mode(mode: str) -> bool:
+    """Validate mode; True if this request should be reranked."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; choose from {list(MODES)}")
+    return mode == "quality" and RERANK_ENABLED
+
+def _search_k(top_k_chunks: int, rerank: bool) -> int:
+    # the reranker needs at least its top-N candidates from the first stage
+    return max(top_k_chunks, reranker.top_n) if rerank else top_k_chunks
+
+@timed("rerank")
+def _rerank(query_text: str, hits, deadline=None):
+    # cross-encoder re-score of the best hits; unchanged if the budget can't fit it
+    reranked, _ = reranker.rerank(query_text, _with_texts(hits, reranker.top_n), deadline)
+    return reranked
+
+def _cache_scope(query_text: str, group: List[str], mode: str, top_k_chunks: int, coarse_to_fine: bool):
+    """Everything besides the query vector that changes the response; None when the cache is off."""
+    if not response_cache.enabled:
+        return None
+    terms = tuple(hpo_index.get().match_terms(query_text)) if HYBRID_SEARCH else ()
+    return (mode, top_k_chunks, coarse_to_fine, tuple(group[1:]), terms)
+
+@timed("response_cache")
+def _cache_get(scope, q_vec: List[float]):
+    return response_cache.get(scope, q_vec) if scope is not None else None
+
+def _cache_put(scope, q_vec: List[float], diseases: List[Dict], started: float):
+    if scope is not None:
+        response_cache.put(scope, q_vec, diseases, time.perf_counter() - started)
+
+def _expand_and_encode(query_texts: List[str]):
+    # ontology expansion + encoding: CPU work (and first-use index loads), kept together off the event loop
+    groups = _expand(query_texts)
+    return groups, _encode_queries(_flatten(groups))
+
+def _prepare(query_text: str, mode: str, top_k_chunks: int, coarse_to_fine: bool):
+    """(expansion groups, query vectors, cache scope) of one query."""
+    groups, q_vecs = _expand_and_encode([query_text])
+    return groups, q_vecs, _cache_scope(query_text, groups[0], mode, top_k_chunks, coarse_to_fine)
+
+@manifest_version.pin
+def query_and_aggregate(query_text: str, top_k_chunks: int = TOP_K_CHUNKS, mode: str = "fast",
+                        coarse_to_fine: bool = COARSE_TO_FINE):
+    rerank = _check_mode(mode)
+    deadline = time.perf_counter() + RERANK_BUDGET_S
+    groups, q_vecs, scope = _prepare(query_text, mode, top_k_chunks, coarse_to_fine)
+    cached = _cache_get(scope, q_vecs[0])
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    (q_vec,), (hits,) = _search_expanded(groups, q_vecs, _search_k(top_k_chunks, rerank), coarse_to_fine)
+    if rerank:
+        hits = _rerank(query_text, hits, deadline)
+    diseases = _rank(query_text, q_vec, hits)
+    _cache_put(scope, q_vec, diseases, started)
+    return diseases
+
+@manifest_version.pin
+async def aquery_and_aggregate(query_text: str, top_k_chunks: int = TOP_K_CHUNKS, mode: str = "fast",
+                               coarse_to_fine: bool = COARSE_TO_FINE):
+    """Async query_and_aggregate: encoding, Milvus search and reranking run on bounded executors."""
+    rerank = _check_mode(mode)
+    deadline = time.perf_counter() + RERANK_BUDGET_S
+    # expansion and HPO term matching run with the encode, not on the event loop
+    groups, q_vecs, scope = await run_encode(_prepare, query_text, mode, top_k_chunks, coarse_to_fine)
+    cached = _cache_get(scope, q_vecs[0])
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    (q_vec,), (hits,) = await run_search(_search_expanded, groups, q_vecs, _search_k(top_k_chunks, rerank),
+                                         coarse_to_fine)
+    if rerank:
+        hits = await run_encode(_rerank, query_text, hits, deadline)
+    # may issue one more (filtered) search for diseases found only by HPO terms
+    diseases = await run_search(_rank, query_text, q_vec, hits)
+    _cache_put(scope, q_vec, diseases, started)
+    return diseases
+
+def _split_batch(query_texts: List[str]):
+    """Return (results with per-item errors pre-filled, indices of valid queries)."""
+    results: List[Dict] = [None] * len(query_texts)
+    valid = []
+    for i, q in enumerate(query_texts):
+        if q and q.strip():
+            valid.append(i)
+        else:
+            results[i] = {"error": "Empty symptom description."}
+    return results, valid
+
+def _fill_batch(results: List[Dict], valid: List[int], query_texts: List[str], q_vecs, batch_hits,
+                rerank: bool = False) -> List[Dict]:
+    for i, q_vec, hits in zip(valid, q_vecs, batch_hits):
+        try:
+            if rerank:
+                hits = _rerank(query_texts[i], hits)
+            results[i] = {"diseases": _rank(query_texts[i], q_vec, hits)}
+        except Exception as e:
+            results[i] = {"error": str(e)}
+    return results
+
+@manifest_version.pin
+def query_and_aggregate_batch(query_texts: List[str], top_k_chunks: int = TOP_K_CHUNKS,
+                              mode: str = "fast", coarse_to_fine: bool = COARSE_TO_FINE) -> List[Dict]:
+    """
+    Batch version of query_and_aggregate: one encode call and one multi-vector
+    Milvus search for all queries (and their expansions). Returns one item per input, in input order,
+    either {"diseases": [...]} or {"error": "..."}.
+    Batches are offline work, so "quality" mode reranks every item with no time budget.
+    """
+    rerank = _check_mode(mode)
+    results, valid = _split_batch(query_texts)
+    if not valid:
+        return results
+    groups, q_vecs = _expand_and_encode([query_texts[i] for i in valid])
+    q_vecs, batch_hits = _search_expanded(groups, q_vecs, _search_k(top_k_chunks, rerank), coarse_to_fine)
+    return _fill_batch(results, valid, query_texts, q_vecs, batch_hits, rerank)
 
-# Connect to Milvus
-connect_to_milvus(MILVUS_HOST, MILVUS_PORT)
-
-# Load collection
-collection = get_or_create_collection(
-    collection_name="disease_kb_chunks",
-    dim=DIM,
-    index_params={
-        "index_type": "HNSW",
-        "metric_type": "IP",
-        "params": {"M": 48, "efConstruction": 200}
-    }
-)
-
-# Load embedder
-embedder = load_embedder(EMBEDDING_MODEL)
-
-def query_and_aggregate(query_text: str, top_k_chunks: int = TOP_K_CHUNKS):
-    # Encode query
-    q_vec = embedder.encode([query_text], convert_to_numpy=True)[0]
-    q_vec = norm_vec(q_vec).astype(np.float32).tolist()
-
-    # Run search
-    results = collection.search(
-        data=[q_vec],
-        anns_field="embedding",
-        param={"metric_type": "IP", "params": {"ef": 64}},  # ef controls recall
-        limit=top_k_chunks,
-        output_fields=["disease_id", "disease_name", "chunk_index", "chunk_text"],
-    )
-
-    hits = results[0]
-    agg = defaultdict(lambda: {"name": None, "scores": [], "chunks": []})
-
-    # Aggregate by disease
-    for hit in hits:
-        score = float(hit.distance)
-        ent = hit.entity
-        did = ent.get("disease_id")
-        name = ent.get("disease_name")
-        chunk_idx = ent.get("chunk_index")
-        text_snippet = ent.get("chunk_text")
-
-        agg[did]["name"] = name
-        agg[did]["scores"].append(score)
-        agg[did]["chunks"].append((score, chunk_idx, text_snippet))
-
-    disease_list = []
-    for did, info in agg.items():
-        # Sort chunks by score
-        info["chunks"].sort(key=lambda x: x[0], reverse=True)
-        sorted_scores = sorted(info["scores"], reverse=True)
-        top_scores = sorted_scores[: min(5, len(sorted_scores))]
-        agg_score = float(np.mean(top_scores))
-        disease_list.append((did, info["name"], agg_score, info["chunks"]))
-
-    # Sort by aggregated score
-    disease_list.sort(key=lambda x: x[2], reverse=True)
-
-    # Prepare final output
-    results_out = []
-    for did, name, score, chunks in disease_list[:TOP_N_DISEASES]:
-        top_chunks_texts = [c[2] for c in chunks[:TOP_M_CHUNKS_PER_DISEASE]]
-        combined_context = "\n---\n".join(top_chunks_texts)
-        results_out.append({
-            "disease_id": did,
-            "name": name,
-            "score": score,
-            "context": combined_context,
-            "top_chunks": [
-                {"score": float(c[0]), "chunk_index": int(c[1]), "text": c[2]}
-                for c in chunks[:TOP_M_CHUNKS_PER_DISEASE]
-            ],
-        })
-
-    return results_out
+@manifest_version.pin
+async def aquery_and_aggregate_batch(query_texts: List[str], top_k_chunks: int = TOP_K_CHUNKS,
+                                     mode: str = "fast", coarse_to_fine: bool = COARSE_TO_FINE) -> List[Dict]:
+    """Async query_and_aggregate_batch."""
+    rerank = _check_mode(mode)
+    results, valid = _split_batch(query_texts)
+    if not valid:
+        return results
+    groups, q_vecs = await run_encode(_expand_and_encode, [query_texts[i] for i in valid])
+    q_vecs, batch_hits = await run_search(_search_expanded, groups, q_vecs, _search_k(top_k_chunks, rerank),
+                                          coarse_to_fine)
+    return await run_search(_fill_batch, results, valid, query_texts, q_vecs, batch_hits, rerank)
 
 if __name__ == "__main__":
     q = input("Describe symptoms: ").strip()
@@ -0,0 +1,19 @@
+import time
+
+import pytest
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.monotonic, the clock the caches expire entries with."""
+    c = Clock()
+    monkeypatch.setattr(time, "monotonic", c)
+    return c
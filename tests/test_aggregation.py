@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_aggregation import legacy_aggregate, synthetic_hits
+from rag.aggregation import AGGREGATORS, aggregate_hits, reciprocal_rank_fusion
+from utils.vector_store import LocalHit
+
+
+def _hit(i, score, disease_id, chunk_index=0):
+    return LocalHit(i, score, {"disease_id": disease_id, "disease_name": disease_id.title(),
+                               "chunk_index": chunk_index, "chunk_text": f"text {i}"})
+
+
+@pytest.mark.parametrize("k", [1, 40, 400])
+def test_mean_top_k_matches_baseline_loop(k):
+    hits = synthetic_hits(k, 50, np.random.default_rng(k))
+    expected = legacy_aggregate(hits, top_n=10, top_m=3)
+    got = aggregate_hits(hits, top_n=10, top_m=3, aggregator="mean_top_k", k=5)
+    assert [d["disease_id"] for d in got] == [d["disease_id"] for d in expected]
+    for a, b in zip(got, expected):
+        assert a["score"] == pytest.approx(b["score"])
+        assert a["name"] == b["name"]
+        assert a["top_chunks"] == b["top_chunks"]
+        assert a["context"] == b["context"]
+
+
+def test_ties_keep_first_appearance():
+    hits = [_hit(0, 0.5, "b"), _hit(1, 0.5, "a"), _hit(2, 0.5, "c")]
+    assert [d["disease_id"] for d in aggregate_hits(hits, 3, 1)] == ["b", "a", "c"]
+
+
+def test_aggregators():
+    hits = [_hit(0, 0.9, "a"), _hit(1, 0.8, "b"), _hit(2, 0.7, "b"), _hit(3, 0.1, "a")]
+    by_id = lambda agg: {d["disease_id"]: d["score"] for d in aggregate_hits(hits, 5, 5, agg, k=2)}
+    assert by_id("mean_top_k") == pytest.approx({"a": 0.5, "b": 0.75})
+    assert by_id("max") == pytest.approx({"a": 0.9, "b": 0.8})
+    assert by_id("count_weighted") == pytest.approx({"a": 0.5, "b": 0.75})
+    t = 0.05
+    softmax = by_id("softmax_sum")
+    assert softmax["a"] == pytest.approx(t * np.log(np.exp(0.9 / t) + np.exp(0.1 / t)))
+    assert set(AGGREGATORS) == {"mean_top_k", "max", "softmax_sum", "count_weighted"}
+
+
+def test_fetch_texts_is_called_once_for_the_winning_chunks():
+    hits = [_hit(0, 0.9, "a", 3), _hit(1, 0.8, "b", 4), _hit(2, 0.7, "a", 5)]
+    calls = []
+
+    def fetch(entities):
+        calls.append([e["chunk_index"] for e in entities])
+        return [f"fetched {e['chunk_index']}" for e in entities]
+
+    out = aggregate_hits(hits, top_n=1, top_m=2, fetch_texts=fetch)
+    assert calls == [[3, 5]]
+    assert out[0]["context"] == "fetched 3\n---\nfetched 5"
+
+
+def test_empty_hits_and_unknown_aggregator():
+    assert aggregate_hits([], 5, 3) == []
+    with pytest.raises(ValueError):
+        aggregate_hits([_hit(0, 0.5, "a")], 5, 3, aggregator="median")
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    scores = dict(fused)
+    assert [did for did, _ in fused] == ["a", "c", "b"]
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_reciprocal_rank_fusion_ties_keep_first_appearance():
+    assert [did for did, _ in reciprocal_rank_fusion([["a"], ["b"]])] == ["a", "b"]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,66 @@
+import pytest
+
+from rag.disease_alias_index import DiseaseAliasIndex, normalize_disease_name
+
+ROWS = [
+    {"disease_id": "OMIM:261600", "name": "Phenylketonuria (PKU)", "treatments": ["Low-phenylalanine diet"]},
+    {"disease_id": "OMIM:222100", "name": "Diabetes mellitus, type 1", "treatments": ["Insulin"]},
+    {"disease_id": "OMIM:125853", "name": "Diabetes mellitus, type 2", "treatments": ["Metformin, oral"]},
+    {"disease_id": "OMIM:100001", "name": "Shared syndrome (SS)", "treatments": ["A"]},
+    {"disease_id": "OMIM:100002", "name": "Other syndrome (SS)", "treatments": ["B"]},
+    {"disease_id": "OMIM:100003", "name": "Marfan syndrome", "treatments": ["C"]},
+]
+
+
+@pytest.fixture
+def index():
+    aliases = {
+        "OMIM:222100": ["T1D", "juvenile diabetes"],
+        "OMIM:125853": ["T2D", "juvenile diabetes"],
+        "OMIM:100001": ["Marfan syndrome"],
+    }
+    return DiseaseAliasIndex(ROWS, aliases)
+
+
+def _id(index, query):
+    row = index.resolve(query)
+    return None if row is None else row["disease_id"]
+
+
+def test_normalize_disease_name():
+    assert normalize_disease_name("  Diabetes-Mellitus,  TYPE 1 ") == "diabetes mellitus type 1"
+    assert normalize_disease_name("OMIM:619340") == "omim 619340"
+
+
+def test_names_ids_and_parentheticals(index):
+    assert _id(index, "phenylketonuria (pku)") == "OMIM:261600"
+    assert _id(index, "Phenylketonuria") == "OMIM:261600"
+    assert _id(index, "PKU") == "OMIM:261600"
+    assert _id(index, "omim:222100") == "OMIM:222100"
+    assert _id(index, "diabetes mellitus type 2") == "OMIM:125853"
+    assert _id(index, "T1D") == "OMIM:222100"
+
+
+def test_ambiguous_aliases_are_dropped(index):
+    assert _id(index, "juvenile diabetes") is None   # listed for two diseases
+    assert _id(index, "SS") is None                  # parenthetical of two names
+
+
+def test_names_win_over_aliases(index):
+    assert _id(index, "Marfan syndrome") == "OMIM:100003"
+
+
+def test_lookup_format_keeps_treatments_intact(index):
+    assert index.lookup("T2D") == {"disease_id": "OMIM:125853", "name": "Diabetes mellitus, type 2",
+                                   "treatments": ["Metformin, oral"], "score": 1.0}
+    assert index.lookup("unknown disease") is None
+
+
+def test_lookup_id_is_not_normalized(index):
+    assert index.lookup_id("OMIM:261600")["name"] == "Phenylketonuria (PKU)"
+    assert index.lookup_id("omim 261600") is None
+
+
+def test_missing_treatments_file(tmp_path):
+    index = DiseaseAliasIndex.from_files(str(tmp_path / "missing.json"))
+    assert len(index) == 0 and index.resolve("PKU") is None
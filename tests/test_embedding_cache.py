@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.embedding_cache import EmbeddingCache
+
+
+def test_embedding_cache_lru_eviction():
+    cache = EmbeddingCache(max_size=2, ttl_seconds=None)
+    cache.put("a", np.ones(2))
+    cache.put("b", np.ones(2))
+    assert cache.get("a") is not None   # "a" is now the most recently used
+    cache.put("c", np.ones(2))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["size"] == 2
+
+
+def test_embedding_cache_ttl(clock):
+    cache = EmbeddingCache(max_size=10, ttl_seconds=60)
+    cache.put("a", np.ones(2))
+    clock.now += 59
+    assert cache.get("a") is not None
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_embedding_cache_values_are_read_only_copies():
+    cache = EmbeddingCache(max_size=10)
+    vec = np.zeros(2)
+    cache.put("a", vec)
+    vec[0] = 1.0
+    got = cache.get("a")
+    assert got[0] == 0.0
+    with pytest.raises(ValueError):
+        got[0] = 2.0
+
+
+def test_embedding_cache_disabled():
+    cache = EmbeddingCache(max_size=0)
+    cache.put("a", np.ones(2))
+    assert cache.get("a") is None
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from utils import hpo_ontology
+from utils.hpo_ontology import HpoOntology, _closure
+
+OBO = """format-version: 1.2
+
+[Term]
+id: HP:0000001
+name: All
+
+[Term]
+id: HP:0000118
+name: Phenotypic abnormality
+def: "A phenotypic \\"abnormality\\"." [HPO:probinson]
+synonym: "Organ abnormality" EXACT []
+is_a: HP:0000001 ! All
+
+[Term]
+id: HP:0001250
+name: Seizure
+alt_id: HP:0002279
+synonym: "Seizures" EXACT []
+synonym: "Epileptic seizure" RELATED []
+is_a: HP:0000118 ! Phenotypic abnormality
+
+[Typedef]
+id: part_of
+name: part of
+"""
+
+
+def _write_obo(tmp_path, text=OBO):
+    path = tmp_path / "hp.obo"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_compiled_terms(tmp_path):
+    onto = HpoOntology.open(_write_obo(tmp_path), str(tmp_path / "compiled"))
+    assert len(onto) == 3
+    assert onto.name("HP:0001250") == "Seizure"
+    assert onto.name("HP:0002279") == "Seizure"   # alt_id
+    assert onto.definition("HP:0000118") == 'A phenotypic "abnormality".'
+    assert onto.definition("HP:0001250") is None
+    assert onto.term_synonyms("HP:0001250") == ["Seizures", "Epileptic seizure"]
+    assert onto.parents("HP:0001250") == ["HP:0000118"]
+    assert "HP:9999999" not in onto and "part_of" not in onto
+
+
+def test_recompiles_only_when_the_obo_content_changes(tmp_path, monkeypatch):
+    obo, cache = _write_obo(tmp_path), str(tmp_path / "compiled")
+    compiled = []
+    compile_obo = hpo_ontology.compile_obo
+    monkeypatch.setattr(hpo_ontology, "compile_obo", lambda *a: compiled.append(1) or compile_obo(*a))
+    HpoOntology.open(obo, cache)
+    st = os.stat(obo)
+    os.utime(obo, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))   # touched, same content
+    HpoOntology.open(obo, cache)
+    assert len(compiled) == 1
+    _write_obo(tmp_path, OBO.replace("name: Seizure", "name: Seizures (any)"))
+    assert HpoOntology.open(obo, cache).name("HP:0001250") == "Seizures (any)"
+    assert len(compiled) == 2
+
+
+def _ancestors(closure, term):
+    indptr, rows, dist = closure
+    s, e = indptr[term], indptr[term + 1]
+    return list(zip(rows[s:e].tolist(), dist[s:e].tolist()))
+
+
+def test_closure_of_a_chain():
+    # 0 <- 1 <- 2 <- 3
+    closure = _closure([[], [0], [1], [2]])
+    assert _ancestors(closure, 0) == []
+    assert _ancestors(closure, 1) == [(0, 1)]
+    assert _ancestors(closure, 3) == [(2, 1), (1, 2), (0, 3)]
+
+
+def test_closure_keeps_the_shortest_distance_in_a_diamond():
+    # 0 is reached from 4 through 1 (distance 2) and through 2 -> 3 (distance 3)
+    parents = [[], [0], [0], [2], [1, 3]]
+    closure = _closure(parents)
+    assert _ancestors(closure, 4) == [(1, 1), (3, 1), (0, 2), (2, 2)]
+
+
+def test_closure_does_not_depend_on_term_order():
+    # children listed before their parents
+    closure = _closure([[1], [2], []])
+    assert _ancestors(closure, 0) == [(1, 1), (2, 2)]
+    assert _ancestors(closure, 2) == []
+
+
+def test_closure_csr_shape():
+    indptr, rows, dist = _closure([[], [0], [0], [1, 2]])
+    assert indptr.tolist() == [0, 0, 1, 2, 5]
+    assert rows.dtype == np.int32 and dist.dtype == np.uint8
+    assert len(rows) == len(dist) == indptr[-1]
@@ -0,0 +1,80 @@
+import numpy as np
+
+from utils.response_cache import ExactResponseCache, SemanticResponseCache
+
+
+def _unit(*xs):
+    v = np.asarray(xs, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+# ---------- SemanticResponseCache ----------
+def test_semantic_cache_threshold_and_scope():
+    cache = SemanticResponseCache(dim=2, max_size=4, ttl_seconds=None, threshold=0.99)
+    cache.put("fast", _unit(1, 0), ["response"])
+    assert cache.get("fast", _unit(1, 0.01)) == ["response"]   # cosine ~0.99995
+    assert cache.get("fast", _unit(1, 1)) is None              # cosine ~0.71
+    assert cache.get("quality", _unit(1, 0)) is None
+
+
+def test_semantic_cache_returns_copies():
+    cache = SemanticResponseCache(dim=2, max_size=4, ttl_seconds=None)
+    cache.put("s", _unit(1, 0), [{"score": 1.0}])
+    cache.get("s", _unit(1, 0))[0]["score"] = 0.0
+    assert cache.get("s", _unit(1, 0)) == [{"score": 1.0}]
+
+
+def test_semantic_cache_lru_eviction():
+    cache = SemanticResponseCache(dim=2, max_size=2, ttl_seconds=None)
+    cache.put("s", _unit(1, 0), "a")
+    cache.put("s", _unit(0, 1), "b")
+    assert cache.get("s", _unit(1, 0)) == "a"
+    cache.put("s", _unit(-1, 0), "c")
+    assert cache.get("s", _unit(0, 1)) is None
+    assert cache.get("s", _unit(1, 0)) == "a"
+    assert cache.get("s", _unit(-1, 0)) == "c"
+
+
+def test_semantic_cache_ttl(clock):
+    cache = SemanticResponseCache(dim=2, max_size=2, ttl_seconds=10)
+    cache.put("s", _unit(1, 0), "a")
+    clock.now += 11
+    assert cache.get("s", _unit(1, 0)) is None
+    assert len(cache) == 0
+
+
+def test_semantic_cache_version_invalidation():
+    version = [1]
+    cache = SemanticResponseCache(dim=2, max_size=2, ttl_seconds=None, version=lambda: version[0])
+    cache.put("s", _unit(1, 0), "a")
+    assert cache.get("s", _unit(1, 0)) == "a"
+    version[0] = 2
+    assert cache.get("s", _unit(1, 0)) is None
+    assert cache.stats()["invalidations"] == 1
+    cache.put("s", _unit(1, 0), "b")
+    assert cache.get("s", _unit(1, 0)) == "b"
+
+
+# ---------- ExactResponseCache ----------
+def test_exact_cache_keys_exactly():
+    cache = ExactResponseCache(max_size=2, ttl_seconds=None)
+    cache.put(1, "diabetes mellitus type 1", "t1")
+    assert cache.get(1, "diabetes mellitus type 1") == "t1"
+    assert cache.get(1, "diabetes mellitus type 2") is None
+    assert cache.get(3, "diabetes mellitus type 1") is None
+
+
+def test_exact_cache_lru_ttl_and_version(clock):
+    version = [1]
+    cache = ExactResponseCache(max_size=2, ttl_seconds=10, version=lambda: version[0])
+    cache.put(1, "a", "A")
+    cache.put(1, "b", "B")
+    cache.get(1, "a")
+    cache.put(1, "c", "C")
+    assert cache.get(1, "b") is None
+    clock.now += 11
+    assert cache.get(1, "a") is None
+    cache.put(1, "d", "D")
+    version[0] = 2
+    assert cache.get(1, "d") is None
+    assert cache.stats()["invalidations"] == 1
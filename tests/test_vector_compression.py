@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from utils.vector_compression import (BinaryCodec, FloatRows, Int8Codec, ivf_nlist, milvus_index_params, rescore,
+                                      resolve_nlist)
+
+
+def _unit_rows(n, dim, seed=0):
+    x = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_int8_round_trip():
+    x = _unit_rows(200, 64)
+    codec = Int8Codec.fit(x)
+    codes = codec.encode(x)
+    assert codes.dtype == np.int8 and codes.shape == (200, 64)
+    # reconstruction error is at most half a quantization step per dimension
+    assert np.all(np.abs(codes * codec.scale - x) <= codec.scale / 2 + 1e-6)
+
+
+def test_int8_scores_approximate_inner_products():
+    x = _unit_rows(200, 64)
+    q = _unit_rows(5, 64, seed=1)
+    codec = Int8Codec.fit(x)
+    assert np.allclose(codec.scores(q, codec.encode(x)), q @ x.T, atol=0.02)
+
+
+def test_binary_round_trip():
+    x = _unit_rows(100, 60)   # not a multiple of 8: the last byte is padded
+    codec = BinaryCodec.fit(x)
+    codes = codec.encode(x)
+    assert codes.shape == (100, BinaryCodec.code_shape(60)[0]) == (100, 8)
+    bits = np.unpackbits(codes, axis=1)[:, :60].astype(bool)
+    assert np.array_equal(bits, x - codec.mean > 0)
+
+
+def test_binary_scores_are_negative_hamming_distances():
+    x = _unit_rows(50, 32)
+    codec = BinaryCodec.fit(x)
+    codes = codec.encode(x)
+    scores = codec.scores(x[:3], codes)
+    bits = np.unpackbits(codes, axis=1).astype(int)
+    expected = -np.abs(bits[:3, None, :] - bits[None, :, :]).sum(axis=2)
+    assert np.array_equal(scores, expected)
+    assert np.all(scores[np.arange(3), np.arange(3)] == 0)
+
+
+@pytest.mark.parametrize("codec_cls", [Int8Codec, BinaryCodec])
+def test_codec_save_load(tmp_path, codec_cls):
+    x = _unit_rows(20, 16)
+    codec = codec_cls.fit(x)
+    codec.save(str(tmp_path))
+    assert np.array_equal(codec_cls.load(str(tmp_path)).encode(x), codec.encode(x))
+
+
+def test_rescore_orders_candidates_by_exact_score():
+    x = _unit_rows(100, 16)
+    q = _unit_rows(2, 16, seed=3)
+    candidates = np.array([[5, 50, 7, 90], [1, 2, 3, 4]])
+    rows, scores = rescore(x, q, candidates, limit=3)
+    for qi in range(2):
+        exact = x[candidates[qi]] @ q[qi]
+        order = np.argsort(-exact)[:3]
+        assert rows[qi].tolist() == candidates[qi][order].tolist()
+        assert np.allclose(scores[qi], exact[order])
+
+
+def test_rescore_reads_float_rows_from_disk(tmp_path):
+    x = _unit_rows(30, 8)
+    path = tmp_path / "embeddings.f32"
+    x.tofile(path)
+    q = _unit_rows(1, 8, seed=4)
+    candidates = np.array([[3, 29, 0, 12]])
+    from_disk = rescore(FloatRows(str(path), 8), q, candidates, limit=4)
+    in_memory = rescore(x, q, candidates, limit=4)
+    assert from_disk[0][0].tolist() == in_memory[0][0].tolist()
+    assert np.allclose(from_disk[1][0], in_memory[1][0])
+
+
+def test_ivf_nlist_bounds():
+    assert ivf_nlist(0) == 16
+    assert ivf_nlist(10_000) == 400
+    assert ivf_nlist(10 ** 12) == 65536
+
+
+def test_resolve_nlist_sizes_only_unset_nlist():
+    tuned = {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": None}}
+    assert resolve_nlist(tuned, 10_000)["params"] == {"nlist": 400}
+    assert tuned["params"] == {"nlist": None}   # stored settings stay unresolved
+    fixed = {"index_type": "IVF_FLAT", "metric_type": "IP", "params": {"nlist": 128}}
+    assert resolve_nlist(fixed, 10_000) == fixed
+    hnsw = {"index_type": "HNSW", "metric_type": "IP", "params": {"M": 16}}
+    assert resolve_nlist(hnsw, 10_000) == hnsw
+    assert milvus_index_params("none", tuned, 40_000)["params"] == {"nlist": 800}
+    assert milvus_index_params("none", tuned) == tuned
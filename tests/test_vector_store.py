@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from utils.vector_store import LocalVectorStore, LocalVectorStoreWriter, VersionedVectorStore, _parse_expr
+
+
+def _write_store(path, vecs, disease_ids, compression="none"):
+    writer = LocalVectorStoreWriter(path, vecs.shape[1], ["embedding", "disease_id"], compression)
+    writer.insert([vecs.tolist(), disease_ids])
+    writer.close()
+
+
+def _top_disease(store, vec):
+    (hits,) = store.search(data=[vec.tolist()], limit=1, output_fields=["disease_id"])
+    return hits[0].entity["disease_id"]
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ('disease_id in ["OMIM:1", "OMIM:2"]', ("disease_id", {"OMIM:1", "OMIM:2"})),
+    ("chunk_index in [0, 3]", ("chunk_index", {0, 3})),
+    ('disease_id in []', ("disease_id", set())),
+    ('disease_id == "OMIM:1"', ("disease_id", {"OMIM:1"})),
+    ("  chunk_index==2 ", ("chunk_index", {2})),
+    ('disease_id in [\n  "a",\n  "b"\n]', ("disease_id", {"a", "b"})),
+])
+def test_parse_expr(expr, expected):
+    assert _parse_expr(expr) == expected
+
+
+@pytest.mark.parametrize("expr", ["chunk_index > 2", 'disease_id != "a"', "a in [1] and b in [2]", "x == foo"])
+def test_parse_expr_rejects_unsupported_filters(expr):
+    with pytest.raises((ValueError, SyntaxError)):
+        _parse_expr(expr)
+
+
+@pytest.mark.parametrize("compression", ["none", "int8", "binary"])
+def test_local_store_filtered_search(tmp_path, compression):
+    vecs = np.eye(4, dtype=np.float32)
+    _write_store(str(tmp_path / "store"), vecs, ["a", "a", "b", "b"], compression)
+    store = LocalVectorStore(str(tmp_path / "store"), rescore_factor=4)
+    (hits,) = store.search(data=[vecs[0].tolist()], limit=1, output_fields=["disease_id"],
+                           expr='disease_id in ["b"]')
+    assert hits[0].entity["disease_id"] == "b"
+    (hits,) = store.search(data=[vecs[3].tolist()], limit=1, output_fields=["disease_id"])
+    assert hits[0].id == 3 and hits[0].distance == pytest.approx(1.0)
+
+
+def test_store_is_reopened_when_the_manifest_version_changes(tmp_path):
+    path = str(tmp_path / "store")
+    vecs = np.eye(2, dtype=np.float32)
+    _write_store(path, vecs, ["a", "b"])
+    version = [1]
+    store = VersionedVectorStore(lambda: LocalVectorStore(path), lambda: version[0])
+    _write_store(path, vecs, ["c", "d"])   # re-ingest replaces the directory
+    assert _top_disease(store, vecs[0]) == "a"
+    version[0] = 2
+    assert _top_disease(store, vecs[0]) == "c"
+
+
+def test_previous_version_stays_open_for_pinned_requests(tmp_path):
+    path = str(tmp_path / "store")
+    vecs = np.eye(2, dtype=np.float32)
+    _write_store(path, vecs, ["a", "b"])
+    version = [1]
+    opened = []
+    store = VersionedVectorStore(lambda: opened.append(1) or LocalVectorStore(path), lambda: version[0])
+    _write_store(path, vecs, ["c", "d"])
+    version[0] = 2
+    assert _top_disease(store, vecs[0]) == "c"
+    version[0] = 1   # a request that pinned version 1 before the switch
+    assert _top_disease(store, vecs[0]) == "a"
+    version[0] = 2
+    assert _top_disease(store, vecs[0]) == "c"
+    assert len(opened) == 2
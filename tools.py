@@ -1,20 +1,26 @@
 # tools.py
-from rag.symptoms2disease_retriever import query_and_aggregate
-from rag.disease2treatement_retriever import retrieve_treatments
+from rag.symptoms2disease_retriever import query_and_aggregate, aquery_and_aggregate, aquery_and_aggregate_batch
+from rag.disease2treatement_retriever import (retrieve_treatments, aretrieve_treatments, aretrieve_treatments_batch,
+                                              treatments_for_diseases, atreatments_for_diseases)
 from langchain_core.tools import tool
 
 # --- Tool 1: Symptoms → Disease ---
-def symptom_to_disease_tool(query: str) -> str:
+def symptom_to_disease_tool(query: str, mode: str = "fast") -> str:
     """
     Given a natural language symptom description,
     retrieve possible matching diseases with supporting evidence.
+    mode="quality" adds a cross-encoder rerank of the top chunks.
     """
-    results = query_and_aggregate(query)
+    results = query_and_aggregate(query, mode=mode)
     # output = "Top disease candidates:\n"
     # for r in results:
     #     output += f"- {r['name']} ({r['disease_id']}) score={r['score']:.4f}\n"
     return results
 
+async def asymptom_to_disease_tool(query: str, mode: str = "fast") -> str:
+    """Async variant of symptom_to_disease_tool."""
+    return await aquery_and_aggregate(query, mode=mode)
+
 # --- Tool 2: Disease → Treatment ---
 def disease_to_treatment_tool(disease_query: str) -> str:
     results = retrieve_treatments(disease_query)
@@ -24,4 +30,32 @@ def disease_to_treatment_tool(disease_query: str) -> str:
     # response = f"Possible treatments for **{results[0]['name']}**:\n"
     # for t in results[0]["treatments"]:
     #     response += f"- {t}\n"
-    return results
\ No newline at end of file
+    return results
+
+async def adisease_to_treatment_tool(disease_query: str) -> str:
+    """Async variant of disease_to_treatment_tool."""
+    results = await aretrieve_treatments(disease_query)
+    if not results:
+        return f"No treatments found for {disease_query}."
+    return results
+
+# --- Batch tools (one encode + one multi-vector search per batch) ---
+async def asymptom_to_disease_batch_tool(queries: list, mode: str = "fast") -> list:
+    """Per-query {"diseases": [...]} or {"error": "..."}, in input order."""
+    return await aquery_and_aggregate_batch(queries, mode=mode)
+
+async def adisease_to_treatment_batch_tool(disease_queries: list) -> list:
+    """Per-query {"treatments": [...]} or {"error": "..."}, in input order."""
+    return await aretrieve_treatments_batch(disease_queries)
+
+# --- Tool 3: Diseases → Treatments (diagnose pipeline) ---
+def diseases_to_treatments_tool(diseases: list) -> list:
+    """
+    Treatments for every disease the symptom tool returned: joined on disease_id,
+    with one batched search for the rest. Per-disease {"treatments": [...]} or {"error": "..."}.
+    """
+    return treatments_for_diseases(diseases)
+
+async def adiseases_to_treatments_tool(diseases: list) -> list:
+    """Async variant of diseases_to_treatments_tool."""
+    return await atreatments_for_diseases(diseases)
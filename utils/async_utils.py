@@ -0,0 +1,31 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.constants import ASYNC_ENCODE_WORKERS, ASYNC_SEARCH_WORKERS
+
+# Separate pools so slow Milvus round trips never starve query encoding (and vice versa).
+encode_executor = ThreadPoolExecutor(max_workers=ASYNC_ENCODE_WORKERS, thread_name_prefix="encode")
+search_executor = ThreadPoolExecutor(max_workers=ASYNC_SEARCH_WORKERS, thread_name_prefix="search")
+
+async def _run_in(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run in a copy of the caller's context (as asyncio.to_thread does), so
+    # contextvars such as the request trace (utils/metrics.py) reach the worker
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+async def run_encode(fn, *args, **kwargs):
+    """Run CPU-bound embedding work on the bounded encode executor."""
+    return await _run_in(encode_executor, fn, *args, **kwargs)
+
+async def run_search(fn, *args, **kwargs):
+    """Run a blocking vector-store call on the bounded search executor."""
+    return await _run_in(search_executor, fn, *args, **kwargs)
+
+async def aload(resource):
+    """LazyResource.get() that never runs the resource's first load (file reads, index builds) on the event loop."""
+    if resource.loaded:
+        return resource.get()
+    return await asyncio.to_thread(resource.get)
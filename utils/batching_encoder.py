@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+
+from utils.metrics import ENCODE_BATCH_TEXTS
+
+# encode() options that do not change the embeddings and may be dropped when coalescing
+_BATCHABLE_KWARGS = frozenset({"show_progress_bar", "batch_size"})
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "normalize_embeddings", "future")
+
+    def __init__(self, texts: List[str], normalize_embeddings: bool):
+        self.texts = texts
+        self.normalize_embeddings = normalize_embeddings
+        self.future: Future = Future()
+
+
+class MicroBatchEncoder:
+    """
+    Coalesces concurrent encode calls into a single model forward pass.
+
+    Callers block on their own request while a background thread collects
+    requests for up to `max_wait_ms` (or until `max_batch_size` texts are queued),
+    encodes them in one call and hands each caller back its own rows.
+    Calls that are already as large as a batch, or that pass encode options
+    other than normalize_embeddings (precision, output_value, ...), go
+    straight to the model, so options are never dropped or mixed across callers.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.batched_texts = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batch-encoder", daemon=True)
+                self._worker.start()
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            empty = np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            return empty if convert_to_numpy else []
+        if len(texts) >= self.max_batch_size or not _BATCHABLE_KWARGS.issuperset(kwargs):
+            return self.model.encode(sentences, convert_to_numpy=convert_to_numpy,
+                                     normalize_embeddings=normalize_embeddings, **kwargs)
+
+        self._ensure_worker()
+        req = _EncodeRequest(texts, normalize_embeddings)
+        self._queue.put(req)
+        vecs = req.future.result()
+
+        if single:
+            return vecs[0] if convert_to_numpy else vecs[0].tolist()
+        return vecs if convert_to_numpy else list(vecs)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.batched_texts,
+            "avg_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _collect(self) -> List[_EncodeRequest]:
+        pending = [self._queue.get()]
+        n_texts = len(pending[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while n_texts < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(req)
+            n_texts += len(req.texts)
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            # requests asking for different normalization cannot share a forward pass
+            for flag in (False, True):
+                group = [r for r in pending if r.normalize_embeddings == flag]
+                if group:
+                    self._encode_group(group, flag)
+
+    def _encode_group(self, group: List[_EncodeRequest], normalize_embeddings: bool):
+        texts = [t for r in group for t in r.texts]
+        try:
+            vecs = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                     normalize_embeddings=normalize_embeddings, show_progress_bar=False)
+        except Exception as e:
+            for r in group:
+                r.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_texts += len(texts)
+        ENCODE_BATCH_TEXTS.observe(len(texts))
+        vecs = np.asarray(vecs)
+        start = 0
+        for r in group:
+            r.future.set_result(vecs[start:start + len(r.texts)])
+            start += len(r.texts)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
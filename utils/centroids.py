@@ -0,0 +1,93 @@
+"""
+Disease-level centroid vectors for coarse-to-fine symptom search.
+
+Ingestion wraps its chunk sink in CentroidTrackingSink, so every inserted chunk
+row (re-embedded or copied from the previous collection) is pooled into its
+disease's centroid in the same pass, without re-reading the collection.
+Centroids are the L2-normalized mean ("mean") or element-wise max ("max") of a
+disease's normalized chunk embeddings.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.vector_store import EMBEDDING_FIELD
+
+POOLINGS = ("mean", "max")
+
+
+class CentroidAccumulator:
+    """Running per-disease sum/max of chunk vectors, grown as new diseases appear."""
+
+    def __init__(self, dim: int, pooling: str = "mean"):
+        if pooling not in POOLINGS:
+            raise ValueError(f"Unknown centroid pooling {pooling!r}; choose from {list(POOLINGS)}")
+        self.dim = dim
+        self.pooling = pooling
+        self._index: Dict[str, int] = {}
+        self.names: List[str] = []
+        self._pooled = np.zeros((0, dim), dtype=np.float64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, n: int):
+        fill = -np.inf if self.pooling == "max" else 0.0
+        extra = n - len(self.counts)
+        self._pooled = np.vstack([self._pooled, np.full((extra, self.dim), fill)])
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+
+    def add(self, disease_ids: List[str], disease_names: List[str], vecs) -> None:
+        vecs = np.asarray(vecs, dtype=np.float64).reshape(-1, self.dim)
+        rows = np.empty(len(disease_ids), dtype=np.int64)
+        for i, (did, name) in enumerate(zip(disease_ids, disease_names)):
+            row = self._index.get(did)
+            if row is None:
+                row = self._index[did] = len(self.names)
+                self.names.append(name)
+            rows[i] = row
+        if len(self.names) > len(self.counts):
+            self._grow(len(self.names))
+        if not len(rows):
+            return
+        # segmented reduction per disease (rows of one disease are mostly contiguous)
+        order = np.argsort(rows, kind="stable")
+        uniq, starts = np.unique(rows[order], return_index=True)
+        if self.pooling == "max":
+            self._pooled[uniq] = np.maximum(self._pooled[uniq], np.maximum.reduceat(vecs[order], starts))
+        else:
+            self._pooled[uniq] += np.add.reduceat(vecs[order], starts)
+        self.counts += np.bincount(rows, minlength=len(self.counts))
+
+    def __len__(self):
+        return len(self.names)
+
+    def finalize(self) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+        """(disease_ids, names, normalized centroid matrix float32, chunk counts)."""
+        pooled = self._pooled
+        if self.pooling == "mean":
+            pooled = pooled / np.maximum(self.counts, 1)[:, None]
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        centroids = (pooled / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+        return list(self._index), list(self.names), centroids, self.counts.copy()
+
+
+class CentroidTrackingSink:
+    """
+    Pass-through for a Milvus-style chunk sink (`insert(columns)` in
+    `field_names` order) that pools every inserted row into an accumulator.
+    """
+
+    def __init__(self, sink, field_names: List[str], accumulator: CentroidAccumulator,
+                 id_field: str = "disease_id", name_field: str = "disease_name"):
+        self.sink = sink
+        self.accumulator = accumulator
+        self._emb = field_names.index(EMBEDDING_FIELD)
+        self._id = field_names.index(id_field)
+        self._name = field_names.index(name_field)
+
+    def insert(self, columns: List[list]):
+        self.accumulator.add(columns[self._id], columns[self._name], columns[self._emb])
+        return self.sink.insert(columns)
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
@@ -0,0 +1,208 @@
+"""
+Local, memory-mapped store of chunk texts, written by the symptoms ingestion
+script next to the vectors so searches can skip returning `chunk_text`.
+
+Chunks are keyed by (disease_id, chunk_index): Milvus' auto-generated
+chunk_id changes every time a disease's rows are copied into a new shadow
+collection (and local store ids are row numbers), while this pair is stable and
+is already returned by every search. The key is hashed to a uint64.
+
+Each ingest version gets its own directory, `<root>/v<version>`, and a
+published store is never modified or deleted while it can be served: the
+reader picks the directory of the collection's current manifest version, which
+also names the collection the retriever searches, so the texts switch over
+together with the searched vectors (and the response cache). Ingestion prunes
+only versions older than the one it replaced.
+
+On-disk layout of a store directory:
+  meta.json         collection, manifest version, count
+  keys.npy          uint64 key hashes, sorted
+  rows.npy          int64, row (insertion order) of each sorted key
+  offsets.npy       int64 (count + 1,) byte offsets into texts.blob
+  texts.blob        UTF-8 texts back to back (utils/packed_strings.py layout)
+All files are memory-mapped; a lookup is one np.searchsorted over the keys and
+only the requested texts are decoded.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.packed_strings import PackedStrings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+_VERSION_DIR = re.compile(r"^v(\d+)(\.tmp)?$")
+
+
+def chunk_key(disease_id: str, chunk_index: int) -> int:
+    digest = hashlib.blake2b(f"{disease_id}\x1f{int(chunk_index)}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def version_dir(root: str, version: int) -> str:
+    """Store directory of one ingest version."""
+    return os.path.join(root, f"v{int(version)}")
+
+
+def prune_versions(root: str, keep: Sequence[int]):
+    """Delete the version directories under root (and leftover .tmp ones) other than `keep`."""
+    if not os.path.isdir(root):
+        return
+    keep = {int(v) for v in keep}
+    for name in os.listdir(root):
+        m = _VERSION_DIR.match(name)
+        if m and (int(m.group(1)) not in keep or m.group(2)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class ChunkTextStoreWriter:
+    """Streams texts to `<root>/v<version>.tmp`; close() sorts the keys and moves the store into place."""
+
+    def __init__(self, root: str, collection: str, version: int):
+        self.path = version_dir(root, version)
+        self.collection = collection
+        self.version = version
+        self._tmp = self.path + ".tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._blob = open(os.path.join(self._tmp, "texts.blob"), "wb")
+        self._keys: List[int] = []
+        self._offsets: List[int] = [0]
+
+    def add(self, disease_ids: Sequence[str], chunk_indexes: Sequence[int], texts: Sequence[str]):
+        for did, idx, text in zip(disease_ids, chunk_indexes, texts):
+            data = (text or "").encode("utf-8")
+            self._blob.write(data)
+            self._keys.append(chunk_key(did, idx))
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        self._blob.close()
+        keys = np.array(self._keys, dtype=np.uint64)
+        rows = np.argsort(keys, kind="stable").astype(np.int64)
+        np.save(os.path.join(self._tmp, "keys.npy"), keys[rows])
+        np.save(os.path.join(self._tmp, "rows.npy"), rows)
+        np.save(os.path.join(self._tmp, "offsets.npy"), np.array(self._offsets, dtype=np.int64))
+        meta = {"format": FORMAT_VERSION, "collection": self.collection, "version": self.version,
+                "count": len(self._keys)}
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # a new version's directory; only a leftover from an interrupted run can exist, never a served store
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+
+
+class ChunkTextTrackingSink:
+    """
+    Pass-through for a Milvus-style chunk sink (`insert(columns)` in
+    `field_names` order) that also writes every inserted chunk's text to a
+    ChunkTextStoreWriter.
+    """
+
+    def __init__(self, sink, field_names: List[str], writer: ChunkTextStoreWriter):
+        self.sink = sink
+        self.writer = writer
+        self._id = field_names.index("disease_id")
+        self._index = field_names.index("chunk_index")
+        self._text = field_names.index("chunk_text")
+
+    def insert(self, columns: List[list]):
+        self.writer.add(columns[self._id], columns[self._index], columns[self._text])
+        return self.sink.insert(columns)
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+
+class ChunkTextStore:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk text store format in {path}: {self.meta.get('format')}")
+        self.version = self.meta["version"]
+        # plain ndarray views: slicing np.memmap objects is several times slower
+        self.keys = np.asarray(np.load(os.path.join(path, "keys.npy"), mmap_mode="r"))
+        self.rows = np.asarray(np.load(os.path.join(path, "rows.npy"), mmap_mode="r"))
+        offsets = np.asarray(np.load(os.path.join(path, "offsets.npy"), mmap_mode="r"))
+        blob_path = os.path.join(path, "texts.blob")
+        blob = (np.asarray(np.memmap(blob_path, dtype=np.uint8, mode="r")) if os.path.getsize(blob_path)
+                else np.empty(0, dtype=np.uint8))
+        self.texts = PackedStrings(blob, offsets)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_many(self, keys: Sequence[Tuple[str, int]]) -> List[Optional[str]]:
+        """Text of each (disease_id, chunk_index), None where the store has no such chunk."""
+        if not keys or not len(self.keys):
+            return [None] * len(keys)
+        hashed = np.fromiter((chunk_key(d, i) for d, i in keys), dtype=np.uint64, count=len(keys))
+        pos = np.minimum(np.searchsorted(self.keys, hashed), len(self.keys) - 1)
+        found = self.keys[pos] == hashed
+        return [self.texts[int(self.rows[p])] if ok else None for p, ok in zip(pos.tolist(), found.tolist())]
+
+
+class ChunkTextReader:
+    """
+    The store of the collection's current manifest version (`version()`) under
+    `root`, switched to the new version's directory when the manifest moves on.
+    The previous version's store stays open for requests that pinned it
+    (ManifestVersion.pinned) before the switch, like the vector store they
+    searched (utils/vector_store.py VersionedVectorStore).
+    A missing store is reported by `available` so callers can ask the vector
+    store for texts instead.
+    """
+
+    def __init__(self, root: str, version: Callable[[], int]):
+        self.root = root
+        self._version_fn = version
+        self._lock = threading.Lock()
+        self._opened_for = self._version_fn()
+        self._store: Optional[ChunkTextStore] = self._open(self._opened_for)
+        self._previous: Optional[tuple] = None   # (version, store)
+
+    def _open(self, version) -> Optional[ChunkTextStore]:
+        path = version_dir(self.root, version)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            logger.warning("No chunk text store at %s; chunk texts will come from the vector store", path)
+            return None
+        return ChunkTextStore(path)
+
+    def _current(self) -> Optional[ChunkTextStore]:
+        version = self._version_fn()
+        if version == self._opened_for:
+            return self._store
+        with self._lock:
+            if self._previous is not None and version == self._previous[0]:
+                return self._previous[1]
+            if version != self._opened_for:
+                store = self._open(version)
+                self._previous = (self._opened_for, self._store)
+                self._store, self._opened_for = store, version
+            return self._store
+
+    @property
+    def available(self) -> bool:
+        return self._current() is not None
+
+    @property
+    def version(self):
+        return self._store.version if self._store is not None else None
+
+    def get_many(self, keys: Sequence[Tuple[str, int]]) -> List[Optional[str]]:
+        store = self._current()
+        return store.get_many(keys) if store is not None else [None] * len(keys)
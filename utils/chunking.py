@@ -0,0 +1,57 @@
+"""
+Token-aware sliding-window chunking used by the symptoms ingestion pipeline.
+
+Lives in an importable module (not the hyphen-named ingestion script) so the
+functions can be shipped to multiprocessing workers under any start method.
+"""
+
+import json
+from typing import List, Tuple
+
+_tokenizer = None
+
+
+def init_worker(tokenizer_name: str):
+    """Pool initializer: load one fast tokenizer per worker process."""
+    global _tokenizer
+    from transformers import AutoTokenizer
+
+    _tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
+
+
+def token_windows(token_ids: List[int], max_tokens: int, overlap: int) -> List[List[int]]:
+    """Sliding windows of at most max_tokens ids, consecutive windows overlapping by `overlap`."""
+    if len(token_ids) <= max_tokens:
+        return [token_ids]
+    stride = max_tokens - overlap
+    return [token_ids[i: i + max_tokens] for i in range(0, len(token_ids), stride)]
+
+
+def record_text(obj: dict) -> str:
+    """Text to embed for one JSONL disease record."""
+    return obj.get("text", "") or obj.get("description", "") or " ".join(obj.get("symptoms", []))
+
+
+def chunk_text(text: str, max_tokens: int, overlap: int) -> List[str]:
+    """Chunk one text with the worker's tokenizer; all windows are decoded in one batch call."""
+    if not text:
+        return []
+    token_ids = _tokenizer.encode(text, add_special_tokens=False)
+    if not token_ids:
+        return []
+    windows = token_windows(token_ids, max_tokens, overlap)
+    return _tokenizer.batch_decode(windows, skip_special_tokens=True, clean_up_tokenization_spaces=True)
+
+
+def chunk_record(line: str, max_tokens: int, overlap: int, max_chars: int) -> List[Tuple[str, str, int, str]]:
+    """
+    Chunk one JSONL line into (disease_id, disease_name, chunk_index, chunk_text) rows.
+    chunk_text is truncated to max_chars (the Milvus VARCHAR limit).
+    """
+    obj = json.loads(line)
+    disease_id = obj.get("disease_id", "UNKNOWN")
+    disease_name = obj.get("name", "") or ""
+    return [
+        (disease_id, disease_name, idx, text[:max_chars])
+        for idx, text in enumerate(chunk_text(record_text(obj), max_tokens, overlap))
+    ]
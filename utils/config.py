@@ -1,5 +1,39 @@
 # Configuration file for shared constants
+import os
 
 MILVUS_HOST = "127.0.0.1"
 MILVUS_PORT = "19530"
 DIM = 384  # Embedding dimension, must match the model
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local (in-process) vector store, used when a retriever's backend is "local"
+LOCAL_VECTOR_STORE_DIR = os.path.join(REPO_ROOT, "data-files", "vector-store")
+
+# Memory-mapped chunk texts keyed by (disease_id, chunk_index), written at ingest (utils/chunk_text_store.py)
+CHUNK_TEXT_STORE_DIR = os.path.join(REPO_ROOT, "data-files", "chunk-texts")
+
+# Disease -> treatments source data (also backs the exact-name fast path)
+TREATMENTS_JSON = os.path.join(REPO_ROOT, "data-files", "disease-treatement", "disease2treatements.json")
+# Optional {disease_id: [alias, ...]} file for extra exact-match aliases
+DISEASE_ALIASES_JSON = os.path.join(REPO_ROOT, "data-files", "disease-treatement", "disease_aliases.json")
+
+# Tuned index type / search params / top-K per collection (benchmarks/tune_index.py)
+INDEX_TUNING_JSON = os.path.join(REPO_ROOT, "data-files", "index-tuning.json")
+
+# Per-collection ingest manifests (content hashes + version) for incremental re-ingestion
+INGEST_MANIFEST_DIR = os.path.join(REPO_ROOT, "data-files", "manifests")
+
+# Persistent (model, chunk-hash) -> embedding store used by the ingestion scripts
+EMBEDDING_STORE_PATH = os.path.join(REPO_ROOT, "data-files", "embedding-store.sqlite")
+
+# Exported (and int8-quantized) ONNX query embedders, one directory per model (utils/onnx_embedder.py)
+ONNX_MODEL_DIR = os.path.join(REPO_ROOT, "data-files", "onnx-models")
+
+# Symptoms -> diseases source data and the HPO term index built from it
+SYMPTOMS_JSONL = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "symptoms2disease.jsonl")
+HPO_TERMS_JSON = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "hpo_terms.json")
+HPO_INDEX_PATH = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "hpo_index.npz")
+# HPO ontology source and its compiled, memory-mappable form (utils/hpo_ontology.py)
+HPO_OBO = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "hp.obo")
+HPO_ONTOLOGY_DIR = os.path.join(REPO_ROOT, "data-files", "symptoms-disease", "hpo-ontology")
@@ -5,7 +5,90 @@ SYMPTOMS_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 SYMPTOMS_TOP_K_CHUNKS = 40
 SYMPTOMS_TOP_N_DISEASES = 2
 SYMPTOMS_TOP_M_CHUNKS_PER_DISEASE = 4
+SYMPTOMS_VECTOR_BACKEND = "milvus"   # "milvus" or "local" (in-process NumPy index)
+SYMPTOMS_AGGREGATOR = "mean_top_k"   # chunk -> disease score: mean_top_k, max, softmax_sum, count_weighted
+SYMPTOMS_AGGREGATOR_TOP_K = 5        # k for mean_top_k / count_weighted
+SYMPTOMS_CENTROID_POOLING = "mean"   # disease_centroids built at ingest: "mean" or "max" of chunk embeddings
+SYMPTOMS_COARSE_TO_FINE = False      # pick candidate diseases from disease_centroids, then search only their chunks
+SYMPTOMS_COARSE_TOP_DISEASES = 20    # candidate diseases kept by the coarse stage
+SYMPTOMS_HYBRID_SEARCH = True        # fuse HPO term matches (BM25 over the HPO index) with vector ranking
+SYMPTOMS_HYBRID_LEXICAL_TOP_N = 50   # diseases taken from the HPO term ranking
+SYMPTOMS_RRF_K = 60                  # reciprocal-rank fusion constant
+SYMPTOMS_QUERY_EXPANSION = False     # also search the HPO parents/children of terms named in the query
+SYMPTOMS_EXPANSION_UP = 1            # is_a steps up (1 = parents)
+SYMPTOMS_EXPANSION_DOWN = 1          # is_a steps down (1 = children)
+SYMPTOMS_EXPANSION_MAX_TERMS = 8     # extra queries per request
+SYMPTOMS_EXPANSION_WEIGHT = 0.9      # chunk scores from expanded queries are scaled by this
+SYMPTOMS_DEFERRED_CHUNK_TEXT = True  # search returns ids only; winning chunk texts come from the local chunk text store
+
+# Symptoms Reranker Constants ("quality" mode: cross-encoder second stage on CPU)
+SYMPTOMS_RERANK_ENABLED = True       # False makes "quality" behave like "fast" (model never loaded)
+SYMPTOMS_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+SYMPTOMS_RERANK_TOP_N = 40           # chunk hits re-scored per query
+SYMPTOMS_RERANK_MAX_LENGTH = 256     # tokens per (query, chunk) pair
+SYMPTOMS_RERANK_MAX_CHARS = 1000     # chunk text is cut to this before tokenization
+SYMPTOMS_RERANK_BATCH_SIZE = 32
+SYMPTOMS_RERANK_MIN_PAIRS = 8        # skip reranking if fewer pairs fit in the budget
+SYMPTOMS_RERANK_BUDGET_MS = 300      # per-request budget for encode + search + rerank
 
 # Disease to Treatment Retriever Constants
 TREATMENT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
 TREATMENT_TOP_K = 1
+TREATMENT_VECTOR_BACKEND = "milvus"  # "milvus" or "local" (in-process NumPy index)
+TREATMENT_EXACT_MATCH = True         # answer exact names/aliases/IDs from memory before vector search
+
+# Vector Index Constants (Milvus; used both to build the index at ingest and to search it)
+# defaults, replaced per collection by the tuned values in INDEX_TUNING_JSON (see end of file)
+SYMPTOMS_INDEX_PARAMS = {"index_type": "HNSW", "metric_type": "IP", "params": {"M": 48, "efConstruction": 200}}
+SYMPTOMS_SEARCH_PARAMS = {"metric_type": "IP", "params": {"ef": 64}}   # ef controls recall
+TREATMENT_INDEX_PARAMS = {"index_type": "HNSW", "metric_type": "IP", "params": {"M": 48, "efConstruction": 200}}
+TREATMENT_SEARCH_PARAMS = {"metric_type": "IP", "params": {"ef": 64}}
+INDEX_TUNING_TARGET_RECALL = 0.98    # disease-level recall vs exact search the tuner must reach
+# compressed first pass + exact float re-scoring (utils/vector_compression.py); applied at ingest time
+SYMPTOMS_VECTOR_COMPRESSION = "none" # "none"; "int8" or "pq" on Milvus (IVF_SQ8 / IVF_PQ); "int8" or "binary" locally
+SYMPTOMS_RESCORE_FACTOR = 4          # compressed candidates re-scored per requested hit
+
+# Query Embedding Cache Constants (shared by both retrievers)
+EMBEDDING_CACHE_SIZE = 10000         # max cached query embeddings (0 disables caching)
+EMBEDDING_CACHE_TTL_SECONDS = 3600   # None keeps entries until evicted by size
+
+# Response Cache Constants (each retriever; symptoms keyed on the query embedding, treatments on the name)
+RESPONSE_CACHE_SIZE = 2000           # max cached responses per retriever (0 disables the cache)
+RESPONSE_CACHE_TTL_SECONDS = 600     # None keeps entries until evicted by size or a new collection version
+RESPONSE_CACHE_THRESHOLD = 0.97      # symptoms: min cosine similarity to a cached query for its response to be reused
+                                     # (treatments are cached on the exact normalized disease name)
+RESPONSE_CACHE_VERSION_CHECK_SECONDS = 5   # how often the ingest manifest is checked for a new version
+
+# Query Embedder Inference Constants (CPU)
+EMBEDDING_BACKEND = "torch"          # "torch" (SentenceTransformer) or "onnx" (ONNX Runtime; falls back to torch)
+EMBEDDING_ONNX_QUANTIZE = True       # run the dynamically int8-quantized graph
+EMBEDDING_ONNX_THREADS = 0           # intra-op threads per session; 0 = ONNX Runtime default (all cores)
+
+# Query Micro-Batching Constants (coalesces concurrent encode calls into one forward pass)
+EMBEDDING_MICRO_BATCHING = True
+EMBEDDING_MAX_BATCH_SIZE = 32        # encode as soon as this many queries are waiting
+EMBEDDING_MAX_WAIT_MS = 5            # or after this long, whichever comes first
+
+# Async Serving Constants
+# encode threads mostly wait on the micro-batcher, so size the pool to fill one batch
+ASYNC_ENCODE_WORKERS = EMBEDDING_MAX_BATCH_SIZE   # bounded executor for CPU-bound query encoding
+ASYNC_SEARCH_WORKERS = 64    # bounded executor for Milvus search round trips
+
+# Batch Endpoint Constants
+BATCH_MAX_QUERIES = 1024     # max items per /get_diseases:batch or /get_treatments:batch call
+
+# Startup Constants
+STARTUP_TIME_BUDGET_SECONDS = 30   # warm-up (models + Milvus) should finish within this budget
+
+# Tuned Index Settings (written by benchmarks/tune_index.py; absent file = defaults above)
+from utils.config import INDEX_TUNING_JSON
+from utils.index_tuning import load_index_tuning
+
+_tuned = load_index_tuning(INDEX_TUNING_JSON)
+_symptoms = _tuned.get("disease_kb_chunks", {})
+SYMPTOMS_INDEX_PARAMS = _symptoms.get("index_params", SYMPTOMS_INDEX_PARAMS)
+SYMPTOMS_SEARCH_PARAMS = _symptoms.get("search_params", SYMPTOMS_SEARCH_PARAMS)
+SYMPTOMS_TOP_K_CHUNKS = _symptoms.get("top_k", SYMPTOMS_TOP_K_CHUNKS)
+_treatments = _tuned.get("disease_treatments", {})
+TREATMENT_INDEX_PARAMS = _treatments.get("index_params", TREATMENT_INDEX_PARAMS)
+TREATMENT_SEARCH_PARAMS = _treatments.get("search_params", TREATMENT_SEARCH_PARAMS)
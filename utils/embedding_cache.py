@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys (collapse whitespace, lowercase).
+
+    Both query models use uncased tokenizers, so case folding does not change
+    the resulting embedding.
+    """
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Bounded, thread-safe LRU cache of query embeddings with TTL eviction."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: Optional[float] = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            created, vec = item
+            if self.ttl_seconds is not None and time.monotonic() - created > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: Hashable, vec: np.ndarray):
+        if self.max_size <= 0:
+            return
+        # cached vectors are shared between callers, so make them read-only
+        vec = np.array(vec, copy=True)
+        vec.setflags(write=False)
+        with self._lock:
+            self._data[key] = (time.monotonic(), vec)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class CachedEmbedder:
+    """
+    Wraps a SentenceTransformer-like model and serves repeated queries from an
+    EmbeddingCache keyed on (model name, normalized query text).
+    Only cache misses are sent to the underlying model, in a single encode call.
+    """
+
+    def __init__(self, model, model_name: str, cache: EmbeddingCache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, text: str, normalize_embeddings: bool) -> Tuple[str, bool, str]:
+        return (self.model_name, normalize_embeddings, normalize_query(text))
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts: List[str] = [sentences] if single else list(sentences)
+
+        keys = [self._key(text, normalize_embeddings) for text in texts]
+        vecs: List[Optional[np.ndarray]] = []
+        missing = {}  # key -> positions, so duplicates in one call are encoded once
+        for i, key in enumerate(keys):
+            vec = self.cache.get(key) if key not in missing else None
+            vecs.append(vec)
+            if vec is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            first_positions = [positions[0] for positions in missing.values()]
+            encoded = self.model.encode(
+                [texts[i] for i in first_positions],
+                convert_to_numpy=True,
+                normalize_embeddings=normalize_embeddings,
+                **kwargs,
+            )
+            for (key, positions), vec in zip(missing.items(), encoded):
+                self.cache.put(key, vec)
+                for i in positions:
+                    vecs[i] = vec
+
+        if single:
+            return vecs[0] if convert_to_numpy else vecs[0].tolist()
+        if not vecs:
+            return np.empty((0, 0), dtype=np.float32)
+        out = np.vstack(vecs)
+        return out if convert_to_numpy else list(out)
+
+    def __getattr__(self, name):
+        # delegate everything else (tokenizer, max_seq_length, ...) to the model
+        return getattr(self.model, name)
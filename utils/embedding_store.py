@@ -0,0 +1,128 @@
+"""
+Persistent on-disk embedding store keyed by (model, text hash), backed by sqlite.
+
+Ingestion wraps its SentenceTransformer in StoreBackedEmbedder, so any chunk
+that was already embedded with the same model (and normalization) is read from
+disk instead of re-encoded. Re-ingesting an unchanged corpus, or re-running with
+chunking settings that reproduce existing chunks, becomes I/O-bound.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.lazy import LazyResource
+
+_SQL_BATCH = 500  # host parameters per SELECT (sqlite's limit is 999 on old builds)
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash BLOB NOT NULL, vec BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Stored vector per text (float32), None where missing."""
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(hashes), _SQL_BATCH):
+                chunk = hashes[i: i + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vec FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return [found.get(h) for h in hashes]
+
+    def put_many(self, model: str, texts: List[str], vecs: np.ndarray):
+        vecs = np.asarray(vecs, dtype=np.float32)
+        rows = [(model, text_hash(t), v.tobytes()) for t, v in zip(texts, vecs)]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (model, text_hash, vec) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def count(self, model: Optional[str] = None) -> int:
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class StoreBackedEmbedder:
+    """
+    SentenceTransformer wrapper that serves already-embedded texts from an
+    EmbeddingStore and encodes (then stores) only the misses, in one call.
+    `load_model` is only called on the first miss, so a fully cached run never
+    loads the model at all.
+    """
+
+    def __init__(self, load_model, model_name: str, store: EmbeddingStore):
+        self._model = LazyResource(model_name, load_model)
+        self.model_name = model_name
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model(self):
+        return self._model.get()
+
+    def _key(self, normalize_embeddings: bool) -> str:
+        # normalized and raw vectors of the same text are different entries
+        return f"{self.model_name}|norm" if normalize_embeddings else self.model_name
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        key = self._key(normalize_embeddings)
+        vecs = self.store.get_many(key, texts)
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+            encoded = np.asarray(self.model.encode(miss_texts, convert_to_numpy=True,
+                                                   normalize_embeddings=normalize_embeddings, **kwargs),
+                                 dtype=np.float32)
+            self.store.put_many(key, miss_texts, encoded)
+            for i, v in zip(missing, encoded):
+                vecs[i] = v
+
+        out = np.vstack(vecs) if vecs else np.empty((0, 0), dtype=np.float32)
+        if isinstance(sentences, str):
+            return out[0]
+        return out if convert_to_numpy else list(out)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
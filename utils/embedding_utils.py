@@ -1,5 +1,61 @@
-from sentence_transformers import SentenceTransformer
+import logging
+
+from utils.config import ONNX_MODEL_DIR
+from utils.constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_QUANTIZE,
+    EMBEDDING_ONNX_THREADS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_MICRO_BATCHING,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_WAIT_MS,
+)
+from utils.batching_encoder import MicroBatchEncoder
+from utils.embedding_cache import CachedEmbedder, EmbeddingCache
+from utils.metrics import GAUGES
+
+logger = logging.getLogger(__name__)
+
+# Single process-wide cache shared by every embedder; keys include the model name.
+query_embedding_cache = EmbeddingCache(max_size=EMBEDDING_CACHE_SIZE, ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS)
+for _field in ("size", "hits", "misses", "hit_rate"):
+    GAUGES.set_function(lambda f=_field: query_embedding_cache.stats()[f], component="embedding_cache", field=_field)
+
+def load_model(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """
+    The bare encoder for a model: an ONNX Runtime session (backend "onnx",
+    exported on first use) or a SentenceTransformer. If the ONNX backend cannot
+    be loaded (onnxruntime missing, export failed), falls back to the latter.
+    """
+    if backend == "onnx":
+        try:
+            from utils.onnx_embedder import OnnxEmbedder
+
+            return OnnxEmbedder.open(model_name, ONNX_MODEL_DIR, quantized=EMBEDDING_ONNX_QUANTIZE,
+                                     threads=EMBEDDING_ONNX_THREADS)
+        except Exception as e:
+            logger.warning("ONNX backend unavailable for %s (%s: %s); using SentenceTransformer",
+                           model_name, type(e).__name__, e)
+    elif backend != "torch":
+        raise ValueError(f"Unknown embedding backend: {backend!r}")
+    # imported here so that importing this module does not pull in torch
+    from sentence_transformers import SentenceTransformer
 
-def load_embedder(model_name: str):
-    """Load a SentenceTransformer model."""
     return SentenceTransformer(model_name)
+
+def load_embedder(model_name: str, use_cache: bool = True, micro_batching: bool = EMBEDDING_MICRO_BATCHING):
+    """
+    Load the query encoder for a model (EMBEDDING_BACKEND, see load_model()).
+    Cache hits are served first; misses from concurrent callers are coalesced
+    into one forward pass by the micro-batching encoder.
+    """
+    model = load_model(model_name)
+    if micro_batching:
+        model = MicroBatchEncoder(model, max_batch_size=EMBEDDING_MAX_BATCH_SIZE, max_wait_ms=EMBEDDING_MAX_WAIT_MS)
+        for field in ("batches", "avg_batch_size", "queued"):
+            GAUGES.set_function(lambda m=model, f=field: m.stats()[f], component=f"micro_batch:{model_name}",
+                                field=field)
+    if not use_cache:
+        return model
+    return CachedEmbedder(model, model_name, query_embedding_cache)
@@ -0,0 +1,342 @@
+"""
+Compiled, memory-mappable HPO ontology.
+
+hp.obo is parsed once (a small streaming OBO reader, no pronto) and compiled
+into a directory of .npy arrays:
+
+  meta.json              source checksum (sha256, size, mtime), term count
+  term_num.npy           int32 numeric part of each HP id, sorted (row = term)
+  names / definitions    packed UTF-8 strings (utils/packed_strings.py)
+  syn_indptr.npy         CSR over the packed `synonyms` strings
+  parent_indptr.npy,     CSR is_a graph: term i's parents are
+  parent_idx.npy         parent_idx[parent_indptr[i]:parent_indptr[i+1]]
+  obsolete.npy           bool per term
+  alt_num / alt_target   alt_id numbers (sorted) -> term row
+  anc_indptr, anc_idx,   transitive is_a closure: term i's ancestors and their
+  anc_dist               shortest is_a distance, sorted by (distance, row)
+  desc_indptr, desc_idx, the same closure inverted (descendants)
+  desc_dist
+
+Every array is opened with mmap_mode="r", so loading takes milliseconds and
+processes share pages. HpoOntology.open() only recompiles when the .obo
+checksum changes (size + mtime are checked first, so an unchanged file is not
+even hashed).
+
+The closure is computed at compile time and ordered by distance, so "all
+ancestors/descendants within k steps" (query expansion, rag/query_expansion.py)
+is one binary search and a slice rather than a graph walk.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from utils.packed_strings import PackedStrings, pack_strings
+
+FORMAT_VERSION = 2  # 2: is_a closure added
+_STRING_COLUMNS = ("names", "definitions", "synonyms")
+_ARRAYS = ("term_num", "syn_indptr", "parent_indptr", "parent_idx", "obsolete", "alt_num", "alt_target",
+           "anc_indptr", "anc_idx", "anc_dist", "desc_indptr", "desc_idx", "desc_dist")
+MAX_DIST = 255  # distances are stored as uint8
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _hp_num(hpo_id: str) -> Optional[int]:
+    if hpo_id.startswith("HP:") and hpo_id[3:].isdigit():
+        return int(hpo_id[3:])
+    return None
+
+
+def _quoted(value: str) -> str:
+    """Text of an OBO quoted string ('"..." [xrefs]'), with escapes resolved."""
+    if not value.startswith('"'):
+        return value
+    out, i = [], 1
+    while i < len(value):
+        c = value[i]
+        if c == "\\" and i + 1 < len(value):
+            out.append({"n": "\n", "t": "\t"}.get(value[i + 1], value[i + 1]))
+            i += 2
+            continue
+        if c == '"':
+            break
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def parse_obo(path: str) -> Iterator[dict]:
+    """Yield HP [Term] stanzas as dicts: id, name, definition, synonyms, is_a, alt_ids, obsolete."""
+    term = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith("["):
+                if term and _hp_num(term.get("id", "")) is not None:
+                    yield term
+                term = {"synonyms": [], "is_a": [], "alt_ids": [], "obsolete": False} if line == "[Term]" else None
+                continue
+            if term is None or not line or line.startswith("!"):
+                continue
+            tag, _, value = line.partition(": ")
+            if tag == "id":
+                term["id"] = value.strip()
+            elif tag == "name":
+                term["name"] = value.strip()
+            elif tag == "def":
+                term["definition"] = _quoted(value)
+            elif tag == "synonym":
+                term["synonyms"].append(_quoted(value))
+            elif tag == "is_a":
+                term["is_a"].append(value.split("!")[0].split()[0])
+            elif tag == "alt_id":
+                term["alt_ids"].append(value.strip())
+            elif tag == "is_obsolete":
+                term["obsolete"] = value.strip() == "true"
+    if term and _hp_num(term.get("id", "")) is not None:
+        yield term
+
+
+def _closure(parents: List[List[int]]):
+    """Ancestor closure as CSR (indptr, rows, distances), sorted by (distance, row) within each term."""
+    n = len(parents)
+    children: List[List[int]] = [[] for _ in range(n)]
+    pending = [len(ps) for ps in parents]
+    for c, ps in enumerate(parents):
+        for p in ps:
+            children[p].append(c)
+    order = [i for i in range(n) if pending[i] == 0]
+    for i in order:  # topological: every parent is settled before its children
+        for c in children[i]:
+            pending[c] -= 1
+            if pending[c] == 0:
+                order.append(c)
+
+    anc: List[Dict[int, int]] = [{} for _ in range(n)]
+    for t in order:
+        dists = anc[t]
+        for p in parents[t]:
+            dists[p] = 1
+        for p in parents[t]:
+            for a, d in anc[p].items():
+                if d + 1 < dists.get(a, MAX_DIST + 1):
+                    dists[a] = d + 1
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in anc], out=indptr[1:])
+    rows = np.fromiter((a for d in anc for a in d), dtype=np.int32, count=int(indptr[-1]))
+    dist = np.fromiter((min(k, MAX_DIST) for d in anc for k in d.values()), dtype=np.uint8, count=int(indptr[-1]))
+    return _sort_segments(indptr, rows, dist)
+
+
+def _sort_segments(indptr: np.ndarray, rows: np.ndarray, dist: np.ndarray):
+    term = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.lexsort((rows, dist, term))
+    return indptr, rows[order], dist[order]
+
+
+def _invert(indptr: np.ndarray, rows: np.ndarray, dist: np.ndarray):
+    """Transpose a closure CSR (ancestors -> descendants), sorted by (distance, row) within each term."""
+    n = len(indptr) - 1
+    src = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+    order = np.lexsort((src, dist, rows))
+    out_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=out_indptr[1:])
+    return out_indptr, src[order], dist[order]
+
+
+def compile_obo(obo_path: str, out_dir: str, sha256: Optional[str] = None):
+    """Parse hp.obo and write the compiled arrays to out_dir (atomically, via <out_dir>.tmp)."""
+    terms = sorted(parse_obo(obo_path), key=lambda t: _hp_num(t["id"]))
+    row_of = {t["id"]: i for i, t in enumerate(terms)}
+
+    parents = [[row_of[p] for p in t["is_a"] if p in row_of] for t in terms]
+    synonyms = [t["synonyms"] for t in terms]
+    alts = sorted((_hp_num(a), row_of[t["id"]]) for t in terms for a in t["alt_ids"] if _hp_num(a) is not None)
+
+    def indptr(lists: List[list]) -> np.ndarray:
+        out = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in lists], out=out[1:])
+        return out
+
+    anc_indptr, anc_idx, anc_dist = _closure(parents)
+    desc_indptr, desc_idx, desc_dist = _invert(anc_indptr, anc_idx, anc_dist)
+
+    arrays = {
+        "term_num": np.asarray([_hp_num(t["id"]) for t in terms], dtype=np.int32),
+        "syn_indptr": indptr(synonyms),
+        "parent_indptr": indptr(parents),
+        "parent_idx": np.asarray([p for ps in parents for p in ps], dtype=np.int32),
+        "obsolete": np.asarray([t["obsolete"] for t in terms], dtype=bool),
+        "alt_num": np.asarray([a for a, _ in alts], dtype=np.int32),
+        "alt_target": np.asarray([r for _, r in alts], dtype=np.int32),
+        "anc_indptr": anc_indptr, "anc_idx": anc_idx, "anc_dist": anc_dist,
+        "desc_indptr": desc_indptr, "desc_idx": desc_idx, "desc_dist": desc_dist,
+    }
+    strings = {
+        "names": [t.get("name", "") for t in terms],
+        "definitions": [t.get("definition", "") for t in terms],
+        "synonyms": [s for syns in synonyms for s in syns],
+    }
+
+    tmp = out_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    for name, values in strings.items():
+        blob, offsets = pack_strings(values)
+        np.save(os.path.join(tmp, f"{name}.blob.npy"), blob)
+        np.save(os.path.join(tmp, f"{name}.offsets.npy"), offsets)
+    st = os.stat(obo_path)
+    meta = {"format": FORMAT_VERSION, "terms": len(terms), "obo_sha256": sha256 or file_sha256(obo_path),
+            "obo_size": st.st_size, "obo_mtime_ns": st.st_mtime_ns}
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+
+
+class HpoOntology:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name in _ARRAYS:
+            # plain ndarray views of the maps: slicing np.memmap objects is several times slower
+            setattr(self, name, np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")))
+        for name in _STRING_COLUMNS:
+            setattr(self, name, PackedStrings(np.load(os.path.join(path, f"{name}.blob.npy"), mmap_mode="r"),
+                                              np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode="r")))
+
+    @classmethod
+    def open(cls, obo_path: str, cache_dir: str) -> "HpoOntology":
+        """Compiled ontology for obo_path, recompiling only if the .obo content changed."""
+        meta_path = os.path.join(cache_dir, "meta.json")
+        meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if not os.path.exists(obo_path):
+            if meta is None:
+                raise FileNotFoundError(f"Neither {obo_path} nor a compiled ontology in {cache_dir}")
+            return cls(cache_dir)  # shipped artifact without the source
+
+        st = os.stat(obo_path)
+        if meta and meta.get("format") == FORMAT_VERSION:
+            if meta["obo_size"] == st.st_size and meta["obo_mtime_ns"] == st.st_mtime_ns:
+                return cls(cache_dir)
+            digest = file_sha256(obo_path)
+            if meta["obo_sha256"] == digest:
+                # touched but unchanged: remember the new mtime so it isn't hashed again
+                meta.update(obo_size=st.st_size, obo_mtime_ns=st.st_mtime_ns)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                return cls(cache_dir)
+        else:
+            digest = None
+        compile_obo(obo_path, cache_dir, digest)
+        return cls(cache_dir)
+
+    def __len__(self):
+        return len(self.term_num)
+
+    # ---------- lookups ----------
+    def row(self, hpo_id: str) -> Optional[int]:
+        """Row of a term id (alt_ids resolve to their primary term), None if unknown."""
+        num = _hp_num(hpo_id)
+        if num is None:
+            return None
+        i = int(np.searchsorted(self.term_num, num))
+        if i < len(self.term_num) and self.term_num[i] == num:
+            return i
+        j = int(np.searchsorted(self.alt_num, num))
+        if j < len(self.alt_num) and self.alt_num[j] == num:
+            return int(self.alt_target[j])
+        return None
+
+    def __contains__(self, hpo_id: str) -> bool:
+        return self.row(hpo_id) is not None
+
+    def term_id(self, row: int) -> str:
+        return f"HP:{int(self.term_num[row]):07d}"
+
+    def name(self, hpo_id: str) -> Optional[str]:
+        r = self.row(hpo_id)
+        return None if r is None else self.names[r]
+
+    def definition(self, hpo_id: str) -> Optional[str]:
+        r = self.row(hpo_id)
+        return None if r is None else (self.definitions[r] or None)
+
+    def term_synonyms(self, hpo_id: str) -> List[str]:
+        r = self.row(hpo_id)
+        if r is None:
+            return []
+        return [self.synonyms[k] for k in range(int(self.syn_indptr[r]), int(self.syn_indptr[r + 1]))]
+
+    def parent_rows(self, row: int) -> np.ndarray:
+        return self.parent_idx[self.parent_indptr[row]: self.parent_indptr[row + 1]]
+
+    def parents(self, hpo_id: str) -> List[str]:
+        r = self.row(hpo_id)
+        return [] if r is None else [self.term_id(p) for p in self.parent_rows(r)]
+
+    @staticmethod
+    def _within(indptr: np.ndarray, idx: np.ndarray, dist: np.ndarray, row: int,
+                max_dist: Optional[int]) -> np.ndarray:
+        s, e = int(indptr[row]), int(indptr[row + 1])
+        if max_dist is not None:
+            # segments are sorted by distance: the terms within max_dist are a prefix
+            e = s + int(np.searchsorted(dist[s:e], max_dist, side="right"))
+        return idx[s:e]
+
+    def ancestor_rows(self, row: int, max_dist: Optional[int] = None) -> np.ndarray:
+        """Rows of the is_a ancestors of a term (excluding itself), nearest first, optionally within max_dist steps."""
+        return self._within(self.anc_indptr, self.anc_idx, self.anc_dist, row, max_dist)
+
+    def descendant_rows(self, row: int, max_dist: Optional[int] = None) -> np.ndarray:
+        """Rows of the is_a descendants of a term (excluding itself), nearest first, optionally within max_dist steps."""
+        return self._within(self.desc_indptr, self.desc_idx, self.desc_dist, row, max_dist)
+
+    def is_ancestor(self, ancestor_row: int, row: int) -> bool:
+        return bool(np.any(self.ancestor_rows(row) == ancestor_row))
+
+    def ancestors(self, hpo_id: str) -> List[str]:
+        r = self.row(hpo_id)
+        return [] if r is None else sorted(self.term_id(a) for a in self.ancestor_rows(r))
+
+    def descendants(self, hpo_id: str) -> List[str]:
+        r = self.row(hpo_id)
+        return [] if r is None else sorted(self.term_id(d) for d in self.descendant_rows(r))
+
+    def term_dict(self) -> Dict[str, dict]:
+        """{id: {name, definition, synonyms}}, the hpo_terms.json shape (plus synonyms)."""
+        names, defs, syns = self.names.tolist(), self.definitions.tolist(), self.synonyms.tolist()
+        syn_indptr = self.syn_indptr.tolist()
+        return {
+            f"HP:{num:07d}": {"name": names[i], "definition": defs[i] or None,
+                              "synonyms": syns[syn_indptr[i]: syn_indptr[i + 1]]}
+            for i, num in enumerate(self.term_num.tolist())
+        }
+
+
+def load_hpo_terms(obo_path: str, cache_dir: str, terms_json: str) -> Dict[str, dict]:
+    """Term details from the compiled ontology if hp.obo (or its artifact) is available, else hpo_terms.json."""
+    if os.path.exists(obo_path) or os.path.exists(os.path.join(cache_dir, "meta.json")):
+        return HpoOntology.open(obo_path, cache_dir).term_dict()
+    if os.path.exists(terms_json):
+        with open(terms_json, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
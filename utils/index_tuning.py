@@ -0,0 +1,51 @@
+"""
+Tuned vector-index settings, written by benchmarks/tune_index.py.
+
+The file (INDEX_TUNING_JSON) holds one entry per collection:
+  {"disease_kb_chunks": {"index_params": {...}, "search_params": {...}, "top_k": 30,
+                         "recall": 0.991, "p50_ms": 1.8, ...}, ...}
+utils/constants.py reads it at import time, so the ingestion scripts (index
+build) and the retrievers (search) pick up the same index type and parameters.
+An IVF "nlist" is stored as null and sized to the collection's row count when
+the index is built (utils.vector_compression.resolve_nlist).
+Collections without an entry keep the defaults in utils/constants.py.
+"""
+
+import json
+import logging
+import os
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# search-time knob of each Milvus index type (FLAT has none)
+SEARCH_PARAM_NAMES = {"HNSW": "ef", "IVF_FLAT": "nprobe", "IVF_SQ8": "nprobe", "IVF_PQ": "nprobe", "FLAT": None}
+
+
+def search_params_for(index_type: str, value=None, metric_type: str = "IP") -> dict:
+    """Milvus search params for an index type, e.g. ("HNSW", 64) -> {"metric_type": "IP", "params": {"ef": 64}}."""
+    name = SEARCH_PARAM_NAMES.get(index_type)
+    return {"metric_type": metric_type, "params": {name: value} if name and value is not None else {}}
+
+
+def load_index_tuning(path: str) -> Dict[str, dict]:
+    """Per-collection tuned settings; {} if the file is missing or unreadable (defaults apply)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tuned = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable index tuning file %s: %s", path, e)
+        return {}
+    return tuned if isinstance(tuned, dict) else {}
+
+
+def save_index_tuning(path: str, collection: str, entry: dict):
+    """Replace one collection's entry, keeping the others."""
+    tuned = load_index_tuning(path)
+    tuned[collection] = entry
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(tuned, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
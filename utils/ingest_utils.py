@@ -0,0 +1,244 @@
+"""
+Helpers for incremental, content-hashed re-ingestion.
+
+Each collection has a manifest (JSON) recording, per disease, a hash of the
+content that was embedded, plus a fingerprint of everything else that affects
+the vectors (model, chunking params, backend). A re-ingest then:
+  1. hashes the current corpus and diffs it against the manifest,
+  2. builds a new *shadow* collection `<name>_v<N>`: rows of unchanged diseases
+     are copied over (no re-embedding), changed/new diseases are re-embedded,
+     removed diseases are simply not copied,
+  3. writes the new manifest (its `version` is what caches and the chunk text
+     store key on, and its `physical_collection` is what the retrievers search),
+  4. atomically points the serving alias `<name>` at the shadow collection, so
+     other clients never see a half-built index either, and drops the shadow
+     collections older than the previous one. The previous one stays for
+     servers that have not seen the new manifest yet.
+The manifest also records the Milvus index params the collection was built
+with; when they change (utils/constants.py, benchmarks/tune_index.py), an
+unchanged corpus is still copied into a new shadow collection to build the
+new index. It also records the compressed vector representation the
+collection was ingested with (utils/vector_compression.py), which is what the
+retriever reads to decide whether to re-score its searches.
+"""
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from utils.config import INGEST_MANIFEST_DIR
+
+ID_BATCH = 1000  # disease ids per filter expression when copying rows
+
+
+def content_hash(*parts) -> str:
+    """Stable sha256 over JSON-serializable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def manifest_path(collection_name: str) -> str:
+    return os.path.join(INGEST_MANIFEST_DIR, f"{collection_name}.json")
+
+
+class IngestManifest:
+    def __init__(self, collection: str, version: int = 0, physical_collection: Optional[str] = None,
+                 fingerprint: Optional[dict] = None, diseases: Optional[Dict[str, str]] = None,
+                 index_params: Optional[dict] = None, compression: str = "none"):
+        self.collection = collection
+        self.version = version
+        self.physical_collection = physical_collection
+        self.fingerprint = fingerprint or {}
+        self.diseases = diseases or {}
+        self.index_params = index_params
+        self.compression = compression
+
+    @classmethod
+    def load(cls, collection_name: str) -> "IngestManifest":
+        path = manifest_path(collection_name)
+        if not os.path.exists(path):
+            return cls(collection_name)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self):
+        path = manifest_path(self.collection)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.__dict__, f, indent=1)
+        os.replace(tmp, path)
+
+
+class ManifestVersion:
+    """
+    Callable returning a collection's published manifest version (0 if never
+    ingested), for serving-side caches. The file is stat'ed at most every
+    check_seconds and re-read only when it changed.
+    """
+
+    def __init__(self, collection_name: str, check_seconds: float = 5.0):
+        self.collection_name = collection_name
+        self.check_seconds = check_seconds
+        self._checked = None
+        self._stat = None
+        self._version = 0
+        self._pinned: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+            f"manifest_version:{collection_name}", default=None)
+
+    def __call__(self) -> int:
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return pinned
+        return self._read()
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """
+        Within the block (and contexts copied from it, e.g. utils/async_utils.py
+        executors) every call returns the version read on entry, so one request
+        searches and reads chunk texts of the same ingest version.
+        """
+        if self._pinned.get() is not None:
+            yield
+            return
+        token = self._pinned.set(self._read())
+        try:
+            yield
+        finally:
+            self._pinned.reset(token)
+
+    def pin(self, fn):
+        """Decorator form of pinned(), for plain and async functions."""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def ainner(*args, **kwargs):
+                with self.pinned():
+                    return await fn(*args, **kwargs)
+            return ainner
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with self.pinned():
+                return fn(*args, **kwargs)
+        return inner
+
+    def _read(self) -> int:
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_seconds:
+            return self._version
+        self._checked = now
+        try:
+            st = os.stat(manifest_path(self.collection_name))
+            stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat = None
+        if stat != self._stat:
+            self._stat = stat
+            self._version = IngestManifest.load(self.collection_name).version if stat else 0
+        return self._version
+
+
+class IngestPlan:
+    """Which diseases to re-embed, copy or drop for one run."""
+
+    def __init__(self, changed: Set[str], unchanged: Set[str], removed: Set[str], full_rebuild: bool):
+        self.changed = changed
+        self.unchanged = unchanged
+        self.removed = removed
+        self.full_rebuild = full_rebuild
+
+    def __str__(self):
+        mode = "full rebuild" if self.full_rebuild else "incremental"
+        return (f"{mode}: {len(self.changed)} changed/new, {len(self.unchanged)} unchanged, "
+                f"{len(self.removed)} removed")
+
+
+def plan_ingest(manifest: IngestManifest, fingerprint: dict, hashes: Dict[str, str]) -> IngestPlan:
+    """Diff current per-disease hashes against the manifest."""
+    if manifest.version == 0 or manifest.fingerprint != fingerprint:
+        return IngestPlan(set(hashes), set(), set(manifest.diseases) - set(hashes), True)
+    changed = {d for d, h in hashes.items() if manifest.diseases.get(d) != h}
+    unchanged = set(hashes) - changed
+    removed = set(manifest.diseases) - set(hashes)
+    return IngestPlan(changed, unchanged, removed, False)
+
+
+def shadow_collection_name(collection_name: str, version: int) -> str:
+    return f"{collection_name}_v{version}"
+
+
+def _batched(items: List[str], n: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), n):
+        yield items[i: i + n]
+
+
+def iter_disease_rows(source, disease_ids: Iterable[str], output_fields: List[str],
+                      id_field: str = "disease_id") -> Iterator[List[dict]]:
+    """
+    Yield batches of row dicts (including "embedding") for the given diseases from
+    a Milvus Collection or a LocalVectorStore.
+    """
+    ids = sorted(disease_ids)
+    for chunk in _batched(ids, ID_BATCH):
+        expr = f"{id_field} in {json.dumps(chunk)}"
+        if hasattr(source, "query_iterator"):
+            it = source.query_iterator(batch_size=ID_BATCH, expr=expr, output_fields=output_fields)
+            try:
+                while True:
+                    rows = it.next()
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                it.close()
+        else:
+            yield source.query(expr, output_fields)
+
+
+def copy_disease_rows(source, sink, insert_fields: List[str], disease_ids: Iterable[str]) -> int:
+    """Copy stored rows (vectors included) of unchanged diseases into the shadow sink."""
+    total = 0
+    for rows in iter_disease_rows(source, disease_ids, insert_fields):
+        sink.insert([[r[f] for r in rows] for f in insert_fields])
+        total += len(rows)
+    return total
+
+
+def swap_alias(alias: str, new_collection: str, old_collection: Optional[str], drop_old: bool = True):
+    """
+    Point the serving alias at new_collection, then drop the previous collection
+    (unless drop_old is False: retrievers that search the manifest's physical
+    collection may still be on it; see prune_shadow_collections).
+    A pre-manifest deployment has a real collection named `alias`; it is dropped
+    first (a short gap, once) so the alias can take its name.
+    """
+    from pymilvus import utility
+
+    if old_collection is None:
+        if utility.has_collection(alias):
+            utility.drop_collection(alias)
+        utility.create_alias(new_collection, alias)
+        return
+    utility.alter_alias(new_collection, alias)
+    if drop_old and old_collection != new_collection and utility.has_collection(old_collection):
+        utility.drop_collection(old_collection)
+
+
+def prune_shadow_collections(alias: str, keep: Sequence[int]):
+    """Drop the shadow collections `<alias>_v<N>` whose version is not in `keep`."""
+    from pymilvus import utility
+
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    keep = {int(v) for v in keep}
+    for name in utility.list_collections():
+        m = pattern.match(name)
+        if m and int(m.group(1)) not in keep:
+            utility.drop_collection(name)
@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """
+    Thread-safe, load-once holder for an expensive resource (model, collection, ...).
+    The factory runs on the first get(); concurrent callers wait for that load.
+    A failed load is not cached, so the next get() retries (e.g. once Milvus is back).
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                t0 = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = time.perf_counter() - t0
+                self.last_error = None
+                self._loaded = True
+        return self._value
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "loaded": self._loaded,
+            "load_seconds": self.load_seconds,
+            "error": self.last_error,
+        }
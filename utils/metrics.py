@@ -0,0 +1,256 @@
+"""
+Prometheus-style metrics and per-request stage timing.
+
+A small in-process registry (counters, gauges, histograms, all with optional
+labels) rendered in the Prometheus text exposition format by GET /metrics, so
+no client library is needed. Gauges can also be backed by a function that is
+read at scrape time (cache sizes, hit rates, average batch sizes).
+
+Stage timing: `with stage("search"):` (or the @timed("search") decorator)
+observes the block's duration in disease_agent_stage_seconds{stage="search"}.
+If a trace is open for the current request (start_trace(), opened by main.py
+when the request carries X-Debug-Timing), the duration is also added to that
+request's breakdown. The trace lives in a contextvar, so it follows the request
+into LangGraph nodes and, via utils/async_utils.py, onto executor threads.
+"""
+
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 40, 80, 160, 320, 640)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+LabelKey = Tuple[str, ...]
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {list(self.labelnames)}, got {sorted(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, object] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Read the value from fn() at scrape time."""
+        with self._lock:
+            self._values[self._key(labels)] = fn
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        out = []
+        for key, v in items:
+            try:
+                value = v() if callable(v) else v
+            except Exception:
+                continue  # a broken callback must not break the scrape
+            if value is None:
+                continue  # not measured yet
+            out.append(f"{self.name}{self._labels(key)} {_fmt(value)}")
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelKey, List[float]] = {}  # per-bucket counts, then sum, then count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(self._key(labels))
+        return int(row[-1]) if row else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        out = []
+        for key, row in items:
+            cumulative = 0.0
+            for upper, n in zip(self.buckets, row):
+                cumulative += n
+                out.append(f"{self.name}_bucket{self._labels(key, ('le', _fmt(upper)))} {_fmt(cumulative)}")
+            out.append(f"{self.name}_sum{self._labels(key)} {_fmt(row[-2])}")
+            out.append(f"{self.name}_count{self._labels(key)} {_fmt(row[-1])}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # module reloads re-declare metrics; keep the first one
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram("disease_agent_request_seconds", "End-to-end HTTP request latency.",
+                                     ("endpoint", "status"))
+STAGE_SECONDS = REGISTRY.histogram("disease_agent_stage_seconds",
+                                   "Time spent per request stage (encode, search, rerank, aggregate, ...).",
+                                   ("stage",))
+SEARCH_HITS = REGISTRY.histogram("disease_agent_search_hits", "Hits returned per query vector.",
+                                 ("collection",), COUNT_BUCKETS)
+RESULT_ITEMS = REGISTRY.histogram("disease_agent_result_items", "Items (diseases, treatments) per response.",
+                                  ("endpoint",), COUNT_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram("disease_agent_response_bytes", "Serialized JSON response size.",
+                                    ("endpoint",), SIZE_BUCKETS)
+ENCODE_BATCH_TEXTS = REGISTRY.histogram("disease_agent_encode_batch_texts",
+                                        "Texts per micro-batched encoder forward pass.", (), COUNT_BUCKETS)
+GAUGES = REGISTRY.gauge("disease_agent_component", "Point-in-time component state (caches, batching, reranker).",
+                        ("component", "field"))
+
+# ---------- per-request tracing ----------
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_trace", default=None)
+
+
+def start_trace():
+    """Open a stage breakdown for the current request; returns the token for end_trace()."""
+    return _trace.set({})
+
+
+def end_trace(token) -> Dict[str, float]:
+    trace = _trace.get() or {}
+    _trace.reset(token)
+    return trace
+
+
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        trace[name] = trace.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def timed(name: str):
+    """Decorator form of stage(name)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def format_trace(trace: Dict[str, float]) -> str:
+    """Stage breakdown as a Server-Timing style header value: "encode;dur=12.3, search;dur=4.1"."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace.items())
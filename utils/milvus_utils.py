@@ -1,4 +1,14 @@
+import os
+from typing import Callable, Optional
+import numpy as np
 from pymilvus import connections, Collection
+from utils.config import MILVUS_HOST, MILVUS_PORT, LOCAL_VECTOR_STORE_DIR
+from utils.index_tuning import SEARCH_PARAM_NAMES
+from utils.ingest_utils import IngestManifest, ManifestVersion
+from utils.vector_compression import compressed_search_params, milvus_index_params, rescore, resolve_nlist
+from utils.vector_store import EMBEDDING_FIELD, VectorStore, LocalHit, LocalVectorStore, VersionedVectorStore
+
+MAX_SEARCH_LIMIT = 16384   # Milvus' topk cap
 
 def connect_to_milvus(host: str, port: str, alias: str = "default"):
     """Connect to Milvus server."""
@@ -9,7 +19,114 @@ def get_or_create_collection(collection_name: str, dim: int, index_params: dict)
     collection = Collection(collection_name)
     if not collection.has_index():
         print(f"[INFO] No index found for '{collection_name}'. Creating index...")
-        collection.create_index(field_name="embedding", index_params=index_params)
+        collection.create_index(field_name="embedding",
+                                index_params=resolve_nlist(index_params, collection.num_entities))
         print("[INFO] Index created successfully.")
+    else:
+        built = collection.index().params.get("index_type")
+        if built != index_params.get("index_type"):
+            # search params are for the configured type; re-running ingestion rebuilds the index
+            print(f"[WARN] '{collection_name}' has a {built} index but {index_params.get('index_type')} is "
+                  f"configured; re-run its ingestion script to rebuild it.")
     collection.load()
     return collection
+
+class MilvusVectorStore(VectorStore):
+    """
+    VectorStore backed by a loaded Milvus collection. With rescore_factor > 1
+    (compressed IVF_SQ8 / IVF_PQ indexes) each search over-fetches
+    `limit * rescore_factor` hits with their stored float vectors and keeps the
+    top `limit` by exact inner product.
+    """
+
+    def __init__(self, collection: Collection, search_params: dict, rescore_factor: int = 1):
+        self.collection = collection
+        self.search_params = search_params
+        self.rescore_factor = rescore_factor
+
+    def search(self, data, limit, output_fields, expr=None):
+        if self.rescore_factor > 1:
+            return self._search_rescored(data, limit, output_fields, expr)
+        return self.collection.search(
+            data=data,
+            anns_field="embedding",
+            param=self.search_params,
+            limit=limit,
+            output_fields=output_fields,
+            expr=expr,
+        )
+
+    def _search_rescored(self, data, limit, output_fields, expr):
+        queries = np.asarray(data, dtype=np.float32).reshape(len(data), -1)
+        fields = list(dict.fromkeys(list(output_fields) + [EMBEDDING_FIELD]))
+        results = self.collection.search(
+            data=queries.tolist(),
+            anns_field="embedding",
+            param=self.search_params,
+            limit=min(limit * self.rescore_factor, MAX_SEARCH_LIMIT),
+            output_fields=fields,
+            expr=expr,
+        )
+        out = []
+        for q, hits in zip(queries, results):
+            hits = list(hits)
+            if not hits:
+                out.append([])
+                continue
+            vectors = np.asarray([h.entity.get(EMBEDDING_FIELD) for h in hits], dtype=np.float32)
+            (top,), (scores,) = rescore(vectors, q[None], np.arange(len(hits))[None], limit)
+            out.append([LocalHit(hits[i].id, float(s), {f: hits[i].entity.get(f) for f in output_fields})
+                        for i, s in zip(top.tolist(), scores)])
+        return out
+
+    def query(self, expr, output_fields):
+        return self.collection.query(expr=expr, output_fields=output_fields)
+
+def local_store_path(collection_name: str) -> str:
+    """Directory of the local vector store for a collection."""
+    return os.path.join(LOCAL_VECTOR_STORE_DIR, collection_name)
+
+def _search_params_for_index(index_params: dict, search_params: dict) -> dict:
+    # the configured search params are for the configured (float) index; a collection ingested
+    # with --compression has a different index type, whose own param (e.g. nprobe) they may lack
+    name = SEARCH_PARAM_NAMES.get(index_params["index_type"])
+    if name is None or name in search_params.get("params", {}):
+        return search_params
+    return compressed_search_params(index_params["index_type"], index_params.get("metric_type", "IP"))
+
+def _open_milvus_store(collection_name: str, dim: int, index_params: dict, search_params: dict,
+                       rescore_factor: int) -> MilvusVectorStore:
+    manifest = IngestManifest.load(collection_name)
+    # the physical collection the manifest names rather than the alias: ingestion saves the
+    # manifest before it swaps the alias, so searches and chunk texts switch versions together
+    name = manifest.physical_collection or collection_name
+    compression = manifest.compression
+    if compression != "none":
+        # the index ingestion built for this mode, not the configured float index
+        index_params = milvus_index_params(compression, index_params)
+        search_params = _search_params_for_index(index_params, search_params)
+    connect_to_milvus(MILVUS_HOST, MILVUS_PORT)
+    collection = get_or_create_collection(name, dim, index_params)
+    if compression != "none" and rescore_factor > 1:
+        return MilvusVectorStore(collection, search_params, rescore_factor)
+    return MilvusVectorStore(collection, search_params)
+
+def open_vector_store(collection_name: str, backend: str, dim: int, index_params: dict, search_params: dict,
+                      rescore_factor: int = 1, version: Optional[Callable[[], int]] = None) -> VectorStore:
+    """
+    Open the vector store for a collection on the configured backend ("milvus" or "local").
+    If the collection's manifest records a compressed ingest (`--compression`,
+    see utils/vector_compression.py) and rescore_factor > 1, searches over-fetch
+    `rescore_factor` times as many candidates and re-score them with the float vectors.
+    The store is reopened when `version()` changes (default: the collection's
+    ManifestVersion): the local store directory is replaced by a re-ingest, and
+    on Milvus the manifest names the new physical collection.
+    """
+    if backend == "local":
+        path = local_store_path(collection_name)
+        open_store = lambda: LocalVectorStore(path, rescore_factor)
+    elif backend == "milvus":
+        open_store = lambda: _open_milvus_store(collection_name, dim, index_params, search_params, rescore_factor)
+    else:
+        raise ValueError(f"Unknown vector store backend: {backend!r}")
+    return VersionedVectorStore(open_store, version or ManifestVersion(collection_name))
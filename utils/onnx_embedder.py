@@ -0,0 +1,179 @@
+"""
+ONNX Runtime inference backend for the query embedders (EMBEDDING_BACKEND = "onnx").
+
+The SentenceTransformer's transformer is exported once to
+`<ONNX_MODEL_DIR>/<model>/model.onnx` (plus a dynamically int8-quantized
+`model.int8.onnx`), with its tokenizer and a meta.json recording the pooling
+(mean or CLS), whether the model normalizes, and the max sequence length.
+Later loads only open the ONNX Runtime session, so neither torch nor
+sentence-transformers is imported at serving time.
+
+OnnxEmbedder.encode() matches the SentenceTransformer.encode() calls the
+retrievers make, so it plugs in under the micro-batcher and the query cache
+unchanged. Texts are sorted by length before batching to keep padding small.
+
+Exporting needs torch, transformers, onnx and onnxruntime (`pip install .[onnx]`);
+serving an exported model needs only onnxruntime and transformers' tokenizer.
+"""
+
+import json
+import os
+import shutil
+from typing import List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+OPSET = 14
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def model_dir(root: str, model_name: str) -> str:
+    return os.path.join(root, model_name.replace("/", "__"))
+
+
+def _pooling_of(st_model) -> str:
+    for module in st_model:
+        if type(module).__name__ == "Pooling":
+            if getattr(module, "pooling_mode_cls_token", False):
+                return "cls"
+            if getattr(module, "pooling_mode_mean_tokens", False):
+                return "mean"
+            raise ValueError(f"Unsupported pooling for ONNX export: {module.get_pooling_mode_str()}")
+    return "mean"
+
+
+def export_onnx(model_name: str, out_dir: str):
+    """Export a SentenceTransformer's transformer + tokenizer to out_dir (written to .tmp, then moved)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0]
+    tokenizer = transformer.tokenizer
+    normalize = any(type(m).__name__ == "Normalize" for m in st)
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids=None):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["an example query", "a second, longer example query"], padding=True,
+                       return_tensors="pt")
+    names = [n for n in INPUT_NAMES if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    tmp = out_dir + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    with torch.no_grad():
+        torch.onnx.export(_LastHiddenState(transformer.auto_model.eval()), tuple(sample[n] for n in names),
+                          os.path.join(tmp, "model.onnx"), input_names=names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic, opset_version=OPSET, do_constant_folding=True)
+    tokenizer.save_pretrained(tmp)
+    meta = {
+        "format": FORMAT_VERSION,
+        "model": model_name,
+        "pooling": _pooling_of(st),
+        "normalize": normalize,
+        "max_seq_length": int(st.max_seq_length),
+        "dim": int(st.get_sentence_embedding_dimension()),
+        "inputs": names,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+
+
+def quantize_int8(out_dir: str):
+    """Dynamic int8 quantization of the exported weights (activations stay float)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = os.path.join(out_dir, "model.int8.onnx.tmp")
+    quantize_dynamic(os.path.join(out_dir, "model.onnx"), tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, os.path.join(out_dir, "model.int8.onnx"))
+
+
+def _is_current(out_dir: str, model_name: str) -> bool:
+    path = os.path.join(out_dir, "meta.json")
+    if not os.path.exists(path) or not os.path.exists(os.path.join(out_dir, "model.onnx")):
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("format") == FORMAT_VERSION and meta.get("model") == model_name
+
+
+class OnnxEmbedder:
+    def __init__(self, path: str, quantized: bool = True, threads: int = 0, batch_size: int = 32):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.model_name = self.meta["model"]
+        self.pooling = self.meta["pooling"]
+        self.normalize = self.meta["normalize"]
+        self.max_seq_length = self.meta["max_seq_length"]
+        self.batch_size = batch_size
+        self.quantized = quantized
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        # one request's forward pass at a time per session; parallelism is within the op
+        options.inter_op_num_threads = 1
+        model_file = "model.int8.onnx" if quantized else "model.onnx"
+        self.session = ort.InferenceSession(os.path.join(path, model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self.session.get_inputs()]
+
+    @classmethod
+    def open(cls, model_name: str, root: str, quantized: bool = True, threads: int = 0) -> "OnnxEmbedder":
+        """Embedder over the exported model, exporting (and quantizing) it first if missing or stale."""
+        path = model_dir(root, model_name)
+        if not _is_current(path, model_name):
+            export_onnx(model_name, path)
+        if quantized and not os.path.exists(os.path.join(path, "model.int8.onnx")):
+            quantize_int8(path)
+        return cls(path, quantized=quantized, threads=threads)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                             return_tensors="np")
+        feeds = {name: enc[name].astype(np.int64) for name in self._inputs if name in enc}
+        if "token_type_ids" in self._inputs and "token_type_ids" not in feeds:
+            feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+        hidden = self.session.run(None, feeds)[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = enc["attention_mask"][..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               batch_size: Optional[int] = None, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batch_size = batch_size or self.batch_size
+        out = np.empty((len(texts), self.meta["dim"]), dtype=np.float32)
+        # similar lengths per batch, so little of each forward pass is padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            idx = order[start: start + batch_size]
+            out[idx] = self._forward([texts[i] for i in idx])
+        if self.normalize or normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.where(norms > 0, norms, 1.0)
+        if single:
+            return out[0] if convert_to_numpy else out[0].tolist()
+        return out if convert_to_numpy else list(out)
@@ -0,0 +1,36 @@
+"""
+Compact string columns for NumPy artifacts: all strings UTF-8 encoded into one
+uint8 blob plus an int64 offsets array (string i is blob[offsets[i]:offsets[i+1]]).
+Both arrays can be saved with np.save / np.savez and memory-mapped back, and
+strings are only decoded when accessed.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def pack_strings(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class PackedStrings:
+    """Read-only sequence view over a (blob, offsets) pair."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]: self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def tolist(self) -> List[str]:
+        raw = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [raw[offsets[i]: offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
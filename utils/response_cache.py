@@ -0,0 +1,246 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Bounded, thread-safe cache of retriever responses keyed on the query embedding.
+
+    A lookup returns the response of the most similar cached query with the same
+    scope (mode, top-k, ... anything besides the embedding that changes the
+    response) if their cosine similarity is at least `threshold`, so paraphrases
+    of an earlier query skip search and aggregation. Query vectors must be
+    L2-normalized. The keys live in one preallocated matrix, so a lookup is a
+    single matrix-vector product over at most max_size rows (exact nearest
+    neighbour; at this size that is cheaper than maintaining an ANN graph).
+
+    Entries are evicted by LRU and TTL, and all of them are dropped when
+    `version()` (e.g. the ingest manifest version) changes, so a re-ingested
+    collection is never answered from responses of the previous one.
+    """
+
+    def __init__(self, dim: int, max_size: int = 2000, ttl_seconds: Optional[float] = 600.0,
+                 threshold: float = 0.97, version: Optional[Callable[[], Hashable]] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._version_fn = version
+        self._keys = np.zeros((max(max_size, 0), dim), dtype=np.float32)
+        self._scopes = np.full(max(max_size, 0), -1, dtype=np.int64)   # -1 = free slot
+        self._entries: Dict[int, tuple] = {}   # slot -> (created, response, compute_seconds)
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._free = list(range(max_size - 1, -1, -1))
+        self._scope_codes: Dict[Hashable, int] = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _check_version(self):
+        # called with the lock held
+        if self._version_fn is None:
+            return
+        version = self._version_fn()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._drop_all()
+            self._version = version
+
+    def _drop_all(self):
+        self._scopes[:] = -1
+        self._entries.clear()
+        self._lru.clear()
+        self._free = list(range(self.max_size - 1, -1, -1))
+        self._scope_codes.clear()
+
+    def _release(self, slot: int):
+        self._scopes[slot] = -1
+        del self._entries[slot]
+        self._lru.pop(slot, None)
+        self._free.append(slot)
+
+    def _scope_code(self, scope: Hashable) -> int:
+        code = self._scope_codes.get(scope)
+        if code is None:
+            if len(self._scope_codes) >= 4 * self.max_size:
+                # forget scopes no cached entry uses any more
+                live = set(self._scopes[self._scopes >= 0].tolist())
+                self._scope_codes = {s: c for s, c in self._scope_codes.items() if c in live}
+            code = max(self._scope_codes.values(), default=-1) + 1
+            self._scope_codes[scope] = code
+        return code
+
+    def get(self, scope: Hashable, vec) -> Optional[Any]:
+        """A copy of the cached response for the nearest query within the threshold, else None."""
+        if not self.enabled:
+            return None
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self._check_version()
+            code = self._scope_codes.get(scope)
+            if code is None or not self._entries:
+                self.misses += 1
+                return None
+            sims = self._keys @ vec
+            sims[self._scopes != code] = -np.inf
+            slot = int(np.argmax(sims))
+            if sims[slot] < self.threshold:
+                self.misses += 1
+                return None
+            created, response, compute_seconds = self._entries[slot]
+            if self.ttl_seconds is not None and time.monotonic() - created > self.ttl_seconds:
+                self._release(slot)
+                self.misses += 1
+                return None
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            self.saved_seconds += compute_seconds
+        # responses are shared between callers; hand out copies
+        return copy.deepcopy(response)
+
+    def put(self, scope: Hashable, vec, response: Any, compute_seconds: float = 0.0):
+        """Cache a response; compute_seconds (what a hit saves) feeds the saved-latency counter."""
+        if not self.enabled:
+            return
+        vec = np.asarray(vec, dtype=np.float32)
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._check_version()
+            if not self._free:
+                oldest, _ = self._lru.popitem(last=False)
+                self._release(oldest)
+            slot = self._free.pop()
+            self._keys[slot] = vec
+            self._scopes[slot] = self._scope_code(scope)
+            self._entries[slot] = (time.monotonic(), response, compute_seconds)
+            self._lru[slot] = None
+
+    def clear(self):
+        with self._lock:
+            self._drop_all()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.saved_seconds = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "invalidations": self.invalidations,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ExactResponseCache:
+    """
+    Bounded, thread-safe cache of responses keyed exactly on (scope, key), with
+    the same LRU / TTL / version invalidation and stats as SemanticResponseCache.
+    For queries where near neighbours in embedding space are different answers
+    (disease names differing only by a subtype number or letter).
+    """
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: Optional[float] = 600.0,
+                 version: Optional[Callable[[], Hashable]] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._version_fn = version
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()   # (scope, key) -> (created, response, seconds)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _check_version(self):
+        # called with the lock held
+        if self._version_fn is None:
+            return
+        version = self._version_fn()
+        if version != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = version
+
+    def get(self, scope: Hashable, key: Hashable) -> Optional[Any]:
+        """A copy of the response cached for exactly (scope, key), else None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_version()
+            item = self._data.get((scope, key))
+            if item is None:
+                self.misses += 1
+                return None
+            created, response, compute_seconds = item
+            if self.ttl_seconds is not None and time.monotonic() - created > self.ttl_seconds:
+                del self._data[(scope, key)]
+                self.misses += 1
+                return None
+            self._data.move_to_end((scope, key))
+            self.hits += 1
+            self.saved_seconds += compute_seconds
+        return copy.deepcopy(response)
+
+    def put(self, scope: Hashable, key: Hashable, response: Any, compute_seconds: float = 0.0):
+        if not self.enabled:
+            return
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._check_version()
+            self._data[(scope, key)] = (time.monotonic(), response, compute_seconds)
+            self._data.move_to_end((scope, key))
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.saved_seconds = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "invalidations": self.invalidations,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,239 @@
+"""
+Compressed vector representations for large chunk collections, chosen at
+ingest time (SYMPTOMS_VECTOR_COMPRESSION, or `--compression` on the symptoms
+ingestion script):
+
+  none    float32 vectors, the configured index (SYMPTOMS_INDEX_PARAMS)
+  int8    Milvus: IVF_SQ8. Local: per-dimension scalar-quantized int8 codes
+          (DIM bytes per vector, 4x smaller than float32)
+  pq      Milvus only: IVF_PQ, PQ_M sub-quantizers x 8 bits (PQ_M bytes per vector)
+  binary  Local only: sign bits of the mean-centred vector (DIM / 8 bytes per
+          vector, 32x smaller), compared by Hamming distance
+
+Every compressed first pass returns `limit * rescore_factor` candidates, which
+are re-scored with exact float32 inner products before the top `limit` are
+kept, so scores stay comparable with the float index. The local float matrix
+stays on disk and only the shortlisted rows are read (FloatRows): faulting
+them in through the memory map would also map their neighbours (readahead,
+large page-cache folios), which ends up mapping most of the matrix.
+
+Milvus' BIN_IVF_FLAT would need a second, BINARY_VECTOR field, and Milvus
+keeps the float field loaded for re-scoring, so binary mode is local-only; on
+Milvus use int8 or pq.
+"""
+
+import math
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.index_tuning import search_params_for
+
+COMPRESSION_MODES = ("none", "int8", "pq", "binary")
+LOCAL_MODES = ("none", "int8", "binary")
+MILVUS_MODES = ("none", "int8", "pq")
+MILVUS_INDEX_TYPES = {"int8": "IVF_SQ8", "pq": "IVF_PQ"}
+PQ_M = 48             # sub-quantizers; must divide DIM (384 = 48 x 8)
+IVF_NPROBE = 32       # clusters searched per query by the compressed IVF indexes
+BLOCK_ROWS = 65536    # rows encoded / Hamming-scored per block (bounds temporaries)
+INT8_BLOCK_ROWS = 1024   # int8 rows widened to float32 per block; cache-sized blocks keep the widening cheap
+
+
+def check_mode(compression: str, backend: str):
+    modes = LOCAL_MODES if backend == "local" else MILVUS_MODES
+    if compression not in modes:
+        raise ValueError(f"Compression {compression!r} is not available on the {backend} backend; "
+                         f"choose from {list(modes)}")
+
+
+def ivf_nlist(n_rows: int) -> int:
+    """About 4 * sqrt(rows) clusters, the usual IVF starting point."""
+    return int(min(max(4 * math.sqrt(max(n_rows, 1)), 16), 65536))
+
+
+def resolve_nlist(index_params: dict, n_rows: int) -> dict:
+    """
+    `index_params` with an unset IVF nlist ("nlist": None, as tuned settings
+    store it) sized to `n_rows`; an explicit nlist is kept.
+    """
+    params = index_params.get("params", {})
+    if "nlist" not in params or params["nlist"] is not None:
+        return index_params
+    return dict(index_params, params=dict(params, nlist=ivf_nlist(n_rows)))
+
+
+def milvus_index_params(compression: str, default: dict, n_rows: Optional[int] = None) -> dict:
+    """
+    Index params the ingestion script builds for a compression mode ("none"
+    keeps `default`). nlist depends on the row count, so it is only filled in
+    when `n_rows` is given (at index build time, not in the manifest).
+    """
+    check_mode(compression, "milvus")
+    if compression == "none":
+        return default if n_rows is None else resolve_nlist(default, n_rows)
+    params = {} if n_rows is None else {"nlist": ivf_nlist(n_rows)}
+    if compression == "pq":
+        params.update(m=PQ_M, nbits=8)
+    return {"index_type": MILVUS_INDEX_TYPES[compression], "metric_type": "IP", "params": params}
+
+
+def compressed_search_params(index_type: str, metric_type: str = "IP") -> dict:
+    return search_params_for(index_type, IVF_NPROBE, metric_type)
+
+
+class FloatRows:
+    """Rows of a raw float32 matrix file (embeddings.f32), read with pread on demand."""
+
+    def __init__(self, path: str, dim: int):
+        self.dim = dim
+        self._row_bytes = dim * 4
+        self._file = open(path, "rb", buffering=0)
+        self._lock = threading.Lock()   # only for the seek + read fallback
+
+    def __getitem__(self, rows: np.ndarray) -> np.ndarray:
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        buf = memoryview(out).cast("B")
+        w = self._row_bytes
+        fd = self._file.fileno()
+        for i, row in enumerate(np.asarray(rows).tolist()):
+            if hasattr(os, "preadv"):
+                os.preadv(fd, [buf[i * w: (i + 1) * w]], row * w)
+            else:
+                with self._lock:
+                    self._file.seek(row * w)
+                    self._file.readinto(buf[i * w: (i + 1) * w])
+        return out
+
+    def close(self):
+        self._file.close()
+
+
+def rescore(embeddings: np.ndarray, queries: np.ndarray, candidates: np.ndarray, limit: int
+            ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """
+    Exact float re-scoring of each query's candidate rows; returns per query
+    (rows, scores) of at most `limit`, best first. Only the candidate rows of
+    `embeddings` (an array or FloatRows) are read.
+    """
+    rows_out, scores_out = [], []
+    for q, cand in zip(queries, candidates):
+        cand = np.sort(cand)  # sequential reads from the memory map
+        scores = np.asarray(embeddings[cand], dtype=np.float32) @ q
+        order = np.argsort(-scores, kind="stable")[:limit]
+        rows_out.append(cand[order])
+        scores_out.append(scores[order])
+    return rows_out, scores_out
+
+
+# ---------- local codecs ----------
+class Int8Codec:
+    """Symmetric per-dimension int8 quantization: code = round(x / scale), scale = max|x_d| / 127."""
+
+    name = "int8"
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray) -> "Int8Codec":
+        peak = np.zeros(embeddings.shape[1], dtype=np.float32)
+        for start in range(0, len(embeddings), BLOCK_ROWS):
+            np.maximum(peak, np.abs(embeddings[start: start + BLOCK_ROWS]).max(axis=0), out=peak)
+        return cls(np.where(peak > 0, peak / 127.0, 1.0))
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(x / self.scale), -127, 127).astype(np.int8)
+
+    @staticmethod
+    def code_shape(dim: int) -> Tuple[int, np.dtype]:
+        return dim, np.int8
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q . (code * scale) == (q * scale) . code
+        scaled = queries * self.scale
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for s in range(0, len(codes), INT8_BLOCK_ROWS):
+            block = codes[s: s + INT8_BLOCK_ROWS]
+            out[:, s: s + len(block)] = scaled @ block.astype(np.float32).T
+        return out
+
+    def save(self, path: str):
+        np.save(os.path.join(path, "int8_scale.npy"), self.scale)
+
+    @classmethod
+    def load(cls, path: str) -> "Int8Codec":
+        return cls(np.load(os.path.join(path, "int8_scale.npy")))
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(a: np.ndarray) -> np.ndarray:
+    # np.bitwise_count is NumPy >= 2.0
+    return np.bitwise_count(a) if hasattr(np, "bitwise_count") else _POPCOUNT[a]
+
+
+class BinaryCodec:
+    """One bit per dimension: (x - mean) > 0, packed 8 per byte; first-pass score = -Hamming distance."""
+
+    name = "binary"
+
+    def __init__(self, mean: np.ndarray):
+        self.mean = np.asarray(mean, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray) -> "BinaryCodec":
+        total = np.zeros(embeddings.shape[1], dtype=np.float64)
+        for start in range(0, len(embeddings), BLOCK_ROWS):
+            total += embeddings[start: start + BLOCK_ROWS].sum(axis=0, dtype=np.float64)
+        return cls(total / max(len(embeddings), 1))
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        return np.packbits(x - self.mean > 0, axis=1)
+
+    @staticmethod
+    def code_shape(dim: int) -> Tuple[int, np.dtype]:
+        return (dim + 7) // 8, np.uint8
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        q_bits = self.encode(queries)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for s in range(0, len(codes), BLOCK_ROWS):
+            block = codes[s: s + BLOCK_ROWS]
+            for qi, bits in enumerate(q_bits):
+                out[qi, s: s + len(block)] = -_popcount(block ^ bits).sum(axis=1, dtype=np.int32)
+        return out
+
+    def save(self, path: str):
+        np.save(os.path.join(path, "binary_mean.npy"), self.mean)
+
+    @classmethod
+    def load(cls, path: str) -> "BinaryCodec":
+        return cls(np.load(os.path.join(path, "binary_mean.npy")))
+
+
+CODECS = {"int8": Int8Codec, "binary": BinaryCodec}
+
+
+def write_codes(path: str, compression: str, embeddings: np.ndarray):
+    """Fit the codec on a store's float matrix and write `codes.npy` (+ codec params) next to it."""
+    codec = CODECS[compression].fit(embeddings)
+    width, dtype = codec.code_shape(embeddings.shape[1])
+    codec.save(path)
+    if not len(embeddings):
+        np.save(os.path.join(path, "codes.npy"), np.empty((0, width), dtype=dtype))
+        return
+    codes = np.lib.format.open_memmap(os.path.join(path, "codes.npy"), mode="w+", dtype=dtype,
+                                      shape=(len(embeddings), width))
+    for start in range(0, len(embeddings), BLOCK_ROWS):
+        codes[start: start + BLOCK_ROWS] = codec.encode(np.asarray(embeddings[start: start + BLOCK_ROWS]))
+    codes.flush()
+    del codes
+
+
+def load_codes(path: str, compression: str):
+    """(codec, codes) of a compressed local store; the codes are memory-mapped."""
+    codec = CODECS[compression].load(path)
+    return codec, np.asarray(np.load(os.path.join(path, "codes.npy"), mmap_mode="r"))
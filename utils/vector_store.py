@@ -0,0 +1,280 @@
+"""
+Vector-store interface shared by the retrievers, plus a local in-process backend.
+
+The local backend keeps L2-normalized float32 embeddings in a memory-mapped
+matrix on disk and answers top-k by a vectorized matrix product + argpartition
+(exact search). Its results mirror pymilvus hits (`hit.id`, `hit.distance`,
+`hit.entity.get(...)`), so retriever code works unchanged on either backend.
+
+On-disk layout of a local store directory:
+  meta.json        dim, count, field names, compression
+  embeddings.f32   raw float32 matrix, shape (count, dim), row i = id i
+  fields.json      scalar fields, column-wise: {field: [value per row]}
+  codes.npy        compressed stores only: int8 or packed-bit codes, row i = id i,
+                   plus the codec's parameters (utils/vector_compression.py)
+
+A compressed store scans the codes instead of the float matrix and re-scores
+the best `limit * rescore_factor` rows exactly; only those rows of
+embeddings.f32 are read (with pread, so the matrix is never mapped in).
+"""
+
+import ast
+import json
+import os
+import re
+import shutil
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.vector_compression import FloatRows, check_mode, load_codes, rescore, write_codes
+
+EMBEDDING_FIELD = "embedding"
+
+
+class VectorStore:
+    """Minimal search interface implemented by every backend."""
+
+    def search(self, data: Sequence[Sequence[float]], limit: int, output_fields: List[str],
+               expr: Optional[str] = None) -> List[List["LocalHit"]]:
+        """Top-`limit` hits for every query vector in `data`, best first."""
+        raise NotImplementedError
+
+
+class LocalHit:
+    """Search hit with the same attributes the retrievers read from pymilvus hits."""
+
+    __slots__ = ("id", "distance", "entity")
+
+    def __init__(self, id: int, distance: float, entity: dict):
+        self.id = id
+        self.distance = distance
+        self.entity = entity
+
+
+_IN_EXPR = re.compile(r"^\s*(\w+)\s+in\s+(\[.*\])\s*$", re.S)
+_EQ_EXPR = re.compile(r"^\s*(\w+)\s*==\s*(.+?)\s*$", re.S)
+
+
+def _parse_expr(expr: str):
+    """Parse the Milvus filter subset the local backend supports: `f in [...]` and `f == v`."""
+    m = _IN_EXPR.match(expr)
+    if m:
+        return m.group(1), set(ast.literal_eval(m.group(2)))
+    m = _EQ_EXPR.match(expr)
+    if m:
+        return m.group(1), {ast.literal_eval(m.group(2))}
+    raise ValueError(f"Unsupported filter expression for local vector store: {expr!r}")
+
+
+def topk_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores per row (rows of a 2-D array), sorted best first."""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(n), (scores.shape[0], 1))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class LocalVectorStore(VectorStore):
+    """Exact inner-product search over a memory-mapped float32 matrix (or compressed codes + float re-scoring)."""
+
+    def __init__(self, path: str, rescore_factor: int = 1):
+        self.path = path
+        self.rescore_factor = rescore_factor
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dim = int(self.meta["dim"])
+        self.count = int(self.meta["count"])
+        if self.count:
+            self.embeddings = np.memmap(os.path.join(path, "embeddings.f32"), dtype=np.float32,
+                                        mode="r", shape=(self.count, self.dim))
+        else:
+            self.embeddings = np.empty((0, self.dim), dtype=np.float32)
+        with open(os.path.join(path, "fields.json"), "r", encoding="utf-8") as f:
+            self.fields: Dict[str, list] = json.load(f)
+        self._field_arrays: Dict[str, np.ndarray] = {}
+        self._field_indexes: Dict[str, Dict[object, np.ndarray]] = {}
+        self.compression = self.meta.get("compression", "none")
+        self.codec, self.codes = (None, None) if self.compression == "none" else load_codes(path, self.compression)
+        # re-scoring reads only the shortlisted rows, without faulting the matrix into memory
+        self._float_rows = (FloatRows(os.path.join(path, "embeddings.f32"), self.dim)
+                            if self.codec is not None and self.count else None)
+
+    def __len__(self):
+        return self.count
+
+    def _field_array(self, name: str) -> np.ndarray:
+        arr = self._field_arrays.get(name)
+        if arr is None:
+            arr = np.asarray(self.fields[name], dtype=object)
+            self._field_arrays[name] = arr
+        return arr
+
+    def filter_rows(self, expr: Optional[str]) -> Optional[np.ndarray]:
+        """Row ids matching `expr`, or None for no filter."""
+        if not expr:
+            return None
+        field, values = _parse_expr(expr)
+        if field == "id":
+            ids = np.fromiter((v for v in values if 0 <= v < self.count), dtype=np.int64)
+            return np.sort(ids)
+        postings = self._field_index(field)
+        parts = [postings[v] for v in values if v in postings]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(parts))
+
+    def _field_index(self, name: str) -> Dict[object, np.ndarray]:
+        """value -> row ids of a scalar field, built once so filters don't scan the column."""
+        index = self._field_indexes.get(name)
+        if index is None:
+            col = self._field_array(name)
+            order = np.argsort(col, kind="stable")
+            values, starts = np.unique(col[order], return_index=True)
+            index = dict(zip(values.tolist(), np.split(order, starts[1:])))
+            self._field_indexes[name] = index
+        return index
+
+    def _entity(self, row: int, output_fields: List[str]) -> dict:
+        return {
+            f: (np.array(self.embeddings[row]) if f == EMBEDDING_FIELD else self.fields[f][row])
+            for f in output_fields
+        }
+
+    def search(self, data, limit, output_fields, expr=None):
+        queries = np.asarray(data, dtype=np.float32).reshape(-1, self.dim)
+        rows = self.filter_rows(expr)
+        if self.codec is not None:
+            return self._search_compressed(queries, rows, limit, output_fields)
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        scores = queries @ matrix.T  # (nq, n) inner products == cosine for normalized vectors
+        top = topk_indices(scores, limit)
+        out = []
+        for qi in range(queries.shape[0]):
+            hits = []
+            for j in top[qi]:
+                row = int(j) if rows is None else int(rows[j])
+                hits.append(LocalHit(row, float(scores[qi, j]), self._entity(row, output_fields)))
+            out.append(hits)
+        return out
+
+    def _search_compressed(self, queries: np.ndarray, rows: Optional[np.ndarray], limit: int,
+                           output_fields: List[str]):
+        codes = self.codes if rows is None else self.codes[rows]
+        shortlist = topk_indices(self.codec.scores(queries, codes), limit * max(self.rescore_factor, 1))
+        if rows is not None:
+            shortlist = rows[shortlist]
+        out = []
+        for top, scores in zip(*rescore(self._float_rows, queries, shortlist, limit)):
+            out.append([LocalHit(int(r), float(s), self._entity(int(r), output_fields)) for r, s in zip(top, scores)])
+        return out
+
+    def query(self, expr: str, output_fields: List[str]) -> List[dict]:
+        """Row lookup by filter, like `Collection.query` (include "embedding" to get vectors)."""
+        rows = self.filter_rows(expr)
+        if rows is None:
+            rows = np.arange(self.count)
+        return [{"id": int(r), **self._entity(int(r), output_fields)} for r in rows]
+
+
+class VersionedVectorStore(VectorStore):
+    """
+    A vector store reopened with `open_store()` whenever `version()` (the
+    collection's manifest version) moves on: after a re-ingest a local store's
+    memory map still holds the replaced files, and a Milvus store the previous
+    physical collection. The previous version's store stays open for requests
+    that pinned that version (ManifestVersion.pinned) before the switch, so their
+    hits match the chunk texts they read.
+    """
+
+    def __init__(self, open_store: Callable[[], VectorStore], version: Callable[[], int]):
+        self._open = open_store
+        self._version_fn = version
+        self._lock = threading.Lock()
+        self._opened_for = version()
+        self._store = open_store()
+        self._previous: Optional[tuple] = None   # (version, store)
+
+    def current(self) -> VectorStore:
+        version = self._version_fn()
+        if version == self._opened_for:
+            return self._store
+        with self._lock:
+            if self._previous is not None and version == self._previous[0]:
+                return self._previous[1]
+            if version != self._opened_for:
+                store = self._open()
+                self._previous = (self._opened_for, self._store)
+                self._store, self._opened_for = store, version
+            return self._store
+
+    def __len__(self):
+        return len(self.current())
+
+    def search(self, data, limit, output_fields, expr=None):
+        return self.current().search(data, limit, output_fields, expr)
+
+    def query(self, expr: str, output_fields: List[str]) -> List[dict]:
+        return self.current().query(expr, output_fields)
+
+
+class LocalVectorStoreWriter:
+    """
+    Builds a LocalVectorStore directory. Drop-in for the `insert`/`flush` calls the
+    ingestion scripts make on a Milvus collection: `insert` takes column lists in
+    `field_names` order (one of them named "embedding").
+    The store is written to `<path>.tmp` and moved into place on close(); with
+    `compression` ("int8" or "binary") close() also writes the compressed codes.
+    """
+
+    def __init__(self, path: str, dim: int, field_names: List[str], compression: str = "none"):
+        check_mode(compression, "local")
+        self.path = path
+        self.dim = dim
+        self.field_names = field_names
+        self.compression = compression
+        self._tmp = path.rstrip("/\\") + ".tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._emb_file = open(os.path.join(self._tmp, "embeddings.f32"), "wb")
+        self._fields: Dict[str, list] = {f: [] for f in field_names if f != EMBEDDING_FIELD}
+        self.count = 0
+
+    def insert(self, columns: List[list]) -> List[int]:
+        start = self.count
+        n = None
+        for name, col in zip(self.field_names, columns):
+            if name == EMBEDDING_FIELD:
+                vecs = np.asarray(col, dtype=np.float32).reshape(-1, self.dim)
+                self._emb_file.write(np.ascontiguousarray(vecs).tobytes())
+                n = vecs.shape[0]
+            else:
+                self._fields[name].extend(col)
+        self.count += n
+        return list(range(start, self.count))
+
+    def flush(self):
+        self._emb_file.flush()
+
+    def close(self):
+        self._emb_file.close()
+        with open(os.path.join(self._tmp, "fields.json"), "w", encoding="utf-8") as f:
+            json.dump(self._fields, f)
+        if self.compression != "none":
+            matrix = (np.memmap(os.path.join(self._tmp, "embeddings.f32"), dtype=np.float32, mode="r",
+                                shape=(self.count, self.dim)) if self.count else np.empty((0, self.dim), np.float32))
+            write_codes(self._tmp, self.compression, matrix)
+            del matrix
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "fields": self.field_names,
+                       "compression": self.compression}, f)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)